@@ -0,0 +1,379 @@
+"""
+Local Animation Engine
+CPU-only zoom / pan / wiggle animation of a still image, rendered with NumPy
+"""
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
+import multiprocessing
+import math
+import shutil
+import subprocess
+import threading
+import sys
+import os
+
+import numpy as np
+from PIL import Image, ImageOps, ExifTags, GifImagePlugin
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.settings import VIDEO_RENDER_WORKERS, FFMPEG_PATH
+
+EFFECTS = ("zoom", "pan", "wiggle")
+
+# Working copy of the source is this much larger than the output, so
+# zoomed-in frames still have real detail to sample
+SOURCE_OVERSAMPLE = 1.3
+
+# ffmpeg arguments per container (input is raw RGB on stdin)
+FFMPEG_OUTPUT_ARGS = {
+    "mp4": ["-c:v", "libx264", "-pix_fmt", "yuv420p", "-preset", "veryfast",
+            "-crf", "23", "-movflags", "+faststart", "-f", "mp4"],
+    "webp": ["-c:v", "libwebp_anim", "-lossless", "0", "-quality", "80",
+             "-loop", "0", "-f", "webp"],
+}
+
+
+def output_size(width: int, height: int, max_side: int) -> Tuple[int, int]:
+    """
+    Fit the source into max_side x max_side, keeping the aspect ratio and
+    even dimensions (required by yuv420p video)
+    """
+    scale = min(1.0, max_side / max(width, height))
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+
+def oriented_size(image: Image.Image) -> Tuple[int, int]:
+    """
+    Size of the image as displayed (EXIF rotation applied), from the header
+    """
+    width, height = image.size
+    if image.getexif().get(ExifTags.Base.Orientation) in (5, 6, 7, 8):
+        return height, width
+    return width, height
+
+
+def frame_params(t: float, effects: List[str]) -> Tuple[float, float, float, float]:
+    """
+    Camera for one frame of a seamless loop
+
+    Args:
+        t: Position in the loop, 0 <= t < 1
+        effects: Any of 'zoom', 'pan', 'wiggle'
+
+    Returns:
+        Tuple of (scale, dx, dy, angle): zoom factor (>= 1), offsets as a
+        fraction of the image size, rotation in radians
+    """
+    phase = 2 * math.pi * t
+    scale, dx, dy, angle = 1.0, 0.0, 0.0, 0.0
+    if "zoom" in effects:
+        # Ease in and back out over the loop
+        scale *= 1.0 + 0.15 * (1 - math.cos(phase)) / 2
+    if "pan" in effects:
+        # Zoom in a little so the pan never shows the image edge
+        scale *= 1.12
+        dx += 0.05 * math.sin(phase)
+        dy += 0.02 * math.sin(2 * phase)
+    if "wiggle" in effects:
+        scale *= 1.06
+        angle += math.radians(3) * math.sin(3 * phase)
+        dy += 0.01 * math.sin(6 * phase)
+    return scale, dx, dy, angle
+
+
+def pack_rgb(image: np.ndarray) -> np.ndarray:
+    """
+    Pack an HxWx3 uint8 image into HxW uint32 (RGBX) so that sampling a
+    neighbour is one gather instead of three
+    """
+    height, width = image.shape[:2]
+    padded = np.dstack([image, np.zeros((height, width, 1), dtype=np.uint8)])
+    return padded.view(np.uint32).reshape(height, width)
+
+
+def bilinear_sample(source: np.ndarray, sx: np.ndarray, sy: np.ndarray) -> np.ndarray:
+    """
+    Sample a packed (see pack_rgb) image at float coordinates (pixel centers
+    at +0.5)
+
+    Returns:
+        Array of sx's shape plus a trailing RGB axis, uint8
+    """
+    height, width = source.shape
+    sx = np.clip(sx - 0.5, 0, width - 1.001)
+    sy = np.clip(sy - 0.5, 0, height - 1.001)
+    x0 = sx.astype(np.int32)
+    y0 = sy.astype(np.int32)
+    fx = (sx - x0)[..., None]
+    fy = (sy - y0)[..., None]
+
+    flat = source.ravel()
+    index = y0 * width + x0
+
+    def gather(offset: int) -> np.ndarray:
+        return flat[index + offset].view(np.uint8).reshape(index.shape + (4,))[..., :3]
+
+    top_left, top_right = gather(0), gather(1)
+    bottom_left, bottom_right = gather(width), gather(width + 1)
+    top = top_left + (top_right.astype(np.float32) - top_left) * fx
+    bottom = bottom_left + (bottom_right.astype(np.float32) - bottom_left) * fx
+    return (top + (bottom - top) * fy + 0.5).astype(np.uint8)
+
+
+def render_frame(source: np.ndarray, out_width: int, out_height: int,
+                 params: Tuple[float, float, float, float]) -> np.ndarray:
+    """
+    Render one frame: every output pixel is mapped back into the source
+    (packed, from load_source) through the inverse camera transform in one
+    vectorized pass
+
+    Returns:
+        out_height x out_width x 3 uint8 array
+    """
+    scale, dx, dy, angle = params
+    height, width = source.shape
+    xs = ((np.arange(out_width, dtype=np.float32) + 0.5) * (width / out_width) - width / 2)[None, :]
+    ys = ((np.arange(out_height, dtype=np.float32) + 0.5) * (height / out_height) - height / 2)[:, None]
+    cos = np.float32(math.cos(angle) / scale)
+    sin = np.float32(math.sin(angle) / scale)
+    sx = xs * cos - ys * sin + np.float32(width / 2 + dx * width)
+    sy = xs * sin + ys * cos + np.float32(height / 2 + dy * height)
+    return bilinear_sample(source, sx, sy)
+
+
+def load_source(path: str, out_width: int, out_height: int) -> np.ndarray:
+    """
+    Decode the source image once, downscaled to what the frames need
+
+    Returns:
+        The image packed for bilinear_sample
+    """
+    target = (int(out_width * SOURCE_OVERSAMPLE), int(out_height * SOURCE_OVERSAMPLE))
+    with Image.open(path) as image:
+        # JPEGs decode straight at a reduced scale when that is still enough
+        image.draft("RGB", (max(target), max(target)))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        if image.width > target[0] and image.height > target[1]:
+            image = image.resize(target, Image.Resampling.LANCZOS)
+        return pack_rgb(np.asarray(image, dtype=np.uint8))
+
+
+# Per-process cache of decoded sources, so each pool worker decodes an image
+# once per clip rather than once per frame
+_sources: Dict[Tuple[str, int, int], np.ndarray] = {}
+
+
+def _render_task(path: str, out_width: int, out_height: int,
+                 params: Tuple[float, float, float, float]) -> np.ndarray:
+    key = (path, out_width, out_height)
+    source = _sources.get(key)
+    if source is None:
+        _sources.clear()
+        source = _sources[key] = load_source(path, out_width, out_height)
+    return render_frame(source, out_width, out_height, params)
+
+
+_pool: Optional[Executor] = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+
+
+def get_render_pool() -> Optional[Executor]:
+    """
+    Return this process's frame-rendering pool (None renders inline)
+
+    Workers are spawned rather than forked, since forking a threaded web
+    worker is unsafe.
+    """
+    global _pool, _pool_pid
+    if VIDEO_RENDER_WORKERS <= 0:
+        return None
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ProcessPoolExecutor(
+                    max_workers=VIDEO_RENDER_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def discard_render_pool(pool: Executor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def render_frames(path: str, effects: List[str], frame_count: int,
+                  out_width: int, out_height: int) -> Iterator[np.ndarray]:
+    """
+    Render the clip's frames in order across the process pool
+
+    At most two frames per worker are in flight or waiting to be encoded,
+    so memory stays flat however long the clip is.
+
+    Yields:
+        Frames as out_height x out_width x 3 uint8 arrays
+    """
+    pool = get_render_pool()
+    if pool is None:
+        source = load_source(path, out_width, out_height)
+        for i in range(frame_count):
+            yield render_frame(source, out_width, out_height, frame_params(i / frame_count, effects))
+        return
+
+    window = max(2, 2 * VIDEO_RENDER_WORKERS)
+    pending = deque()
+    try:
+        for i in range(frame_count):
+            pending.append(pool.submit(_render_task, path, out_width, out_height,
+                                       frame_params(i / frame_count, effects)))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a fresh pool next time
+        discard_render_pool(pool)
+        raise
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def encode_gif(frames: Iterator[np.ndarray], fp, fps: int, palette_image: Image.Image) -> None:
+    """
+    Write an animated GIF frame by frame
+
+    Every frame is mapped to one global palette taken from the source, which
+    keeps colors stable between frames and lets each frame be written as
+    soon as it is rendered.
+    """
+    duration = int(round(1000 / fps))
+    header_written = False
+    for frame in frames:
+        indexed = Image.fromarray(frame).quantize(palette=palette_image, dither=Image.Dither.NONE)
+        if not header_written:
+            header, _ = GifImagePlugin.getheader(indexed, None, {"loop": 0, "duration": duration})
+            for block in header:
+                fp.write(block)
+            header_written = True
+        for block in GifImagePlugin.getdata(indexed, duration=duration):
+            fp.write(block)
+    fp.write(b";")
+
+
+def encode_webp(frames: Iterator[np.ndarray], fp, fps: int) -> None:
+    """
+    Write an animated WebP with Pillow
+
+    Pillow's WebP encoder takes the frames as one list, so this path holds
+    the whole clip in memory; encode_with_ffmpeg streams instead.
+    """
+    images = [Image.fromarray(frame) for frame in frames]
+    images[0].save(fp, format="WEBP", save_all=True, append_images=images[1:],
+                   duration=int(round(1000 / fps)), loop=0, quality=80, method=4)
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which(FFMPEG_PATH) is not None
+
+
+def encode_with_ffmpeg(frames: Iterator[np.ndarray], output_path: str, fps: int,
+                       width: int, height: int, container: str) -> None:
+    """
+    Pipe raw frames into ffmpeg as they are rendered
+
+    Raises:
+        RuntimeError: If ffmpeg exits with an error
+        Exception: Whatever rendering the frames raised (ffmpeg is killed)
+    """
+    command = [
+        FFMPEG_PATH, "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(fps),
+        "-i", "-",
+        *FFMPEG_OUTPUT_ARGS[container],
+        output_path
+    ]
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        for frame in frames:
+            process.stdin.write(frame.tobytes())
+    except BrokenPipeError:
+        # ffmpeg exited early; its stderr says why
+        pass
+    except BaseException:
+        # Rendering failed: stop ffmpeg instead of leaving it waiting on stdin
+        process.kill()
+        raise
+    finally:
+        # stdin has to be closed before reading stderr, or a still running
+        # ffmpeg never exits and the read blocks forever
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        stderr = process.stderr.read()
+        process.wait()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {stderr.decode(errors='replace').strip()}")
+
+
+class LocalAnimationEngine:
+    """
+    Turns a still image into a short looping clip
+
+    Frames are rendered in a process pool and handed to the encoder one at
+    a time, so a clip is never held in memory as a whole (except for WebP
+    without ffmpeg).
+    """
+
+    def formats(self) -> List[str]:
+        """Output formats available on this machine"""
+        return ["gif", "webp", "mp4"] if ffmpeg_available() else ["gif", "webp"]
+
+    def animate(self, image_path: str, output_path: str, output_format: str,
+                effects: List[str], frame_count: int, fps: int, max_side: int) -> Dict[str, Any]:
+        """
+        Render and encode a clip
+
+        Args:
+            image_path: Source image
+            output_path: File to write
+            output_format: 'gif', 'webp' or 'mp4'
+            effects: Any of EFFECTS
+            frame_count: Frames in the loop
+            fps: Frames per second
+            max_side: Longest side of the output in pixels
+
+        Returns:
+            Dictionary with the output width and height
+
+        Raises:
+            ValueError: If the format is not available here
+        """
+        if output_format not in self.formats():
+            raise ValueError(f"Unsupported video format: {output_format}")
+
+        with Image.open(image_path) as image:
+            width, height = output_size(*oriented_size(image), max_side)
+            palette_image = None
+            if output_format == "gif":
+                image.draft("RGB", (max(width, height), max(width, height)))
+                palette_image = ImageOps.exif_transpose(image).convert("RGB").resize((width, height)).quantize(256)
+
+        frames = render_frames(image_path, effects, frame_count, width, height)
+        if output_format == "gif":
+            with open(output_path, "wb") as fp:
+                encode_gif(frames, fp, fps, palette_image)
+        elif ffmpeg_available():
+            encode_with_ffmpeg(frames, output_path, fps, width, height, output_format)
+        else:
+            with open(output_path, "wb") as fp:
+                encode_webp(frames, fp, fps)
+        return {"width": width, "height": height}
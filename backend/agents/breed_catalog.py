@@ -0,0 +1,439 @@
+"""
+Breed Catalog
+Compact in-memory breed table with a feature index for fast local matching
+"""
+from typing import Dict, Any, List, Set, Tuple
+import math
+import re
+
+# Description phrases that signal each feature. Longer phrases win over
+# shorter ones at the same position ("blue eyes" is an eye color, not a coat).
+# A phrase listed under several features signals all of them ("athletic").
+FEATURE_PHRASES: Dict[str, List[str]] = {
+    "coat_long": ["long-haired", "long haired", "longhair", "long hair", "long fur", "fluffy",
+                  "floofy", "shaggy", "fluff", "furry", "mane", "ruff"],
+    "coat_short": ["short-haired", "short haired", "shorthair", "short hair", "short fur",
+                   "short coat", "sleek"],
+    "coat_hairless": ["hairless", "bald", "no fur", "naked"],
+    "coat_curly": ["curly", "wavy", "curls", "curly coat", "rex"],
+    "coat_dense": ["dense", "plush", "thick fur", "thick coat", "double coat", "woolly"],
+    "size_large": ["big", "large", "huge", "giant", "massive", "enormous"],
+    "size_small": ["small", "tiny", "petite", "little"],
+    "build_muscular": ["muscular", "athletic", "stocky", "cobby", "sturdy", "chunky", "heavy", "round"],
+    "build_slender": ["slender", "slim", "lean", "elegant", "svelte", "lithe", "long legs", "long-legged"],
+    "ears_tufted": ["tufted ears", "ear tufts", "tufts", "tufted", "lynx tips", "lynx-like"],
+    "ears_folded": ["folded ears", "fold", "folded", "ears folded", "owl-like"],
+    "ears_curled": ["curled ears", "curled back ears", "ears curl back", "curled-back ears"],
+    "ears_large": ["big ears", "large ears", "bat ears", "huge ears"],
+    "tail_short": ["bobtail", "bob tail", "no tail", "tailless", "stubby tail", "short tail", "stumpy"],
+    "tail_bushy": ["bushy tail", "plumed tail", "fluffy tail"],
+    "face_flat": ["flat face", "flat-faced", "flat faced", "squashed face", "pushed-in face",
+                  "smushed face", "brachycephalic", "pug"],
+    "face_round": ["round face", "chubby cheeks", "chubby", "round cheeks", "teddy bear face"],
+    "face_wedge": ["wedge-shaped head", "wedge head", "triangular face", "pointy face", "long face"],
+    "skin_wrinkled": ["wrinkly", "wrinkled", "wrinkles"],
+    "eyes_blue": ["blue eyes", "blue-eyed", "blue eyed", "sapphire eyes"],
+    "eyes_green": ["green eyes", "green-eyed", "green eyed", "emerald eyes"],
+    "eyes_gold": ["gold eyes", "golden eyes", "amber eyes", "copper eyes", "orange eyes",
+                  "yellow eyes"],
+    "eyes_odd": ["odd eyes", "odd-eyed", "different colored eyes", "heterochromia"],
+    "pattern_pointed": ["pointed", "color point", "colour point", "colorpoint", "colourpoint",
+                        "dark points", "dark face", "dark ears", "dark paws"],
+    "pattern_spotted": ["spotted", "spots", "leopard", "cheetah", "rosettes", "wild-looking",
+                        "wild looking"],
+    "pattern_ticked": ["ticked", "agouti"],
+    "pattern_tabby": ["tabby", "stripes", "striped", "mackerel"],
+    "color_blue_gray": ["gray", "grey", "blue-gray", "blue-grey", "silver-blue", "blue coat",
+                        "slate"],
+    "color_white": ["white", "snow white", "all white"],
+    "color_orange": ["orange", "ginger", "marmalade", "red tabby"],
+    "color_calico": ["calico", "tortoiseshell", "tortie"],
+    "color_black": ["black"],
+    "color_tuxedo": ["tuxedo"],
+    "color_silver": ["silver"],
+    "color_cream": ["cream", "fawn", "beige"],
+    "color_brown": ["brown", "sable", "chocolate", "bronze"],
+    "gloves": ["white paws", "white feet", "white gloves", "mittens", "white socks"],
+    "temper_vocal": ["talkative", "vocal", "chatty", "loud", "meows a lot", "noisy"],
+    "temper_floppy": ["floppy", "goes limp", "limp when held", "limp when picked up"],
+    "temper_active": ["active", "energetic", "playful", "hyper", "athletic", "curious"],
+    "temper_calm": ["calm", "laid back", "laid-back", "gentle", "docile", "lazy", "relaxed",
+                    "mellow", "quiet"],
+    "temper_affectionate": ["affectionate", "cuddly", "lap cat", "clingy", "velcro"],
+    "temper_water": ["likes water", "loves water", "swims", "plays in water"],
+    "temper_doglike": ["dog-like", "doglike", "like a dog", "follows me", "fetch", "leash"],
+}
+
+# Features where a cat can only have one value; describing a value the breed
+# does not have counts against it
+EXCLUSIVE_GROUPS = [
+    {"coat_long", "coat_short", "coat_hairless", "coat_curly"},
+    {"size_large", "size_small"},
+    {"build_muscular", "build_slender"},
+    {"eyes_blue", "eyes_green", "eyes_gold", "eyes_odd"},
+]
+
+# name, popularity (0-1, breaks ties between equally good matches), aliases,
+# features, signature (optional: the hallmark features that set the breed
+# apart from look-alikes sharing its other features), description,
+# personality, care
+BREEDS: List[Dict[str, Any]] = [
+    {"name": "Maine Coon", "popularity": 0.9, "aliases": ["maine coon", "coon cat"],
+     "features": {"coat_long", "size_large", "build_muscular", "ears_tufted", "tail_bushy",
+                  "pattern_tabby", "color_brown", "color_orange", "eyes_green", "eyes_gold",
+                  "temper_calm", "temper_affectionate", "temper_water", "temper_doglike", "coat_dense"},
+     "signature": {"size_large", "ears_tufted"},
+     "description": "One of the largest domestic breeds, with a shaggy water-resistant coat, "
+                    "lynx-like ear tufts and a long bushy tail.",
+     "personality": "Gentle giant: friendly, sociable, playful and often dog-like.",
+     "care": "Brush two to three times a week; needs space and sturdy cat trees."},
+    {"name": "Norwegian Forest Cat", "popularity": 0.6, "aliases": ["norwegian forest", "wegie", "skogkatt"],
+     "features": {"coat_long", "coat_dense", "size_large", "build_muscular", "ears_tufted",
+                  "tail_bushy", "pattern_tabby", "color_white", "eyes_green", "eyes_gold",
+                  "temper_calm", "temper_active"},
+     "signature": {"coat_dense"},
+     "description": "A sturdy Scandinavian cat with a thick double coat, a triangular face "
+                    "and a full ruff around the neck.",
+     "personality": "Calm and friendly, an enthusiastic climber.",
+     "care": "Weekly brushing, daily during the spring shed."},
+    {"name": "Siberian", "popularity": 0.6, "aliases": ["siberian"],
+     "features": {"coat_long", "coat_dense", "build_muscular", "ears_tufted", "tail_bushy",
+                  "pattern_tabby", "color_brown", "color_silver", "eyes_green", "eyes_gold",
+                  "temper_affectionate", "temper_active", "temper_water"},
+     "description": "A powerful Russian forest cat with a triple coat and a round, "
+                    "sweet expression.",
+     "personality": "Affectionate, playful and agile; often fascinated by water.",
+     "care": "Brush weekly; often tolerated by people with mild allergies."},
+    {"name": "Persian", "popularity": 0.9, "aliases": ["persian"],
+     "features": {"face_round", "coat_long", "coat_dense", "face_flat", "build_muscular", "color_white",
+                  "color_cream", "eyes_gold", "eyes_blue", "temper_calm",
+                  "temper_affectionate"},
+     "signature": {"face_flat"},
+     "description": "The classic flat-faced long-haired cat with a luxurious flowing coat.",
+     "personality": "Quiet, sweet and laid-back; prefers a calm home.",
+     "care": "Daily combing, regular eye cleaning; sensitive to heat."},
+    {"name": "Himalayan", "popularity": 0.5, "aliases": ["himalayan", "himmy"],
+     "features": {"coat_long", "coat_dense", "face_flat", "build_muscular", "pattern_pointed",
+                  "eyes_blue", "color_cream", "temper_calm", "temper_affectionate"},
+     "description": "A Persian with Siamese colorpoint markings and vivid blue eyes.",
+     "personality": "Gentle and calm, a little more playful than a Persian.",
+     "care": "Daily grooming and eye cleaning, like a Persian."},
+    {"name": "Exotic Shorthair", "popularity": 0.6, "aliases": ["exotic shorthair", "exotic"],
+     "features": {"face_round", "coat_short", "coat_dense", "face_flat", "build_muscular", "eyes_gold",
+                  "temper_calm", "temper_affectionate"},
+     "description": "A short-haired Persian: the same flat face with a plush, teddy-bear coat.",
+     "personality": "Easygoing, affectionate and quietly playful.",
+     "care": "Weekly brushing; keep the face and eyes clean."},
+    {"name": "Siamese", "popularity": 0.9, "aliases": ["siamese"],
+     "features": {"coat_short", "build_slender", "pattern_pointed", "eyes_blue", "face_wedge",
+                  "ears_large", "color_cream", "temper_vocal", "temper_active",
+                  "temper_affectionate"},
+     "description": "A sleek, slender cat with a wedge-shaped head, colorpoint coat and "
+                    "striking blue almond eyes.",
+     "personality": "Very vocal, social and demanding of attention.",
+     "care": "Minimal grooming; needs company and mental stimulation."},
+    {"name": "Ragdoll", "popularity": 0.9, "aliases": ["ragdoll"],
+     "features": {"coat_long", "size_large", "pattern_pointed", "eyes_blue", "gloves",
+                  "temper_floppy", "temper_calm", "temper_affectionate", "temper_doglike"},
+     "description": "A large, semi-long-haired colorpoint cat famous for going limp when held.",
+     "personality": "Docile, relaxed and people-oriented; follows owners around.",
+     "care": "Brush weekly; indoor cat, not very street-wise."},
+    {"name": "Birman", "popularity": 0.5, "aliases": ["birman", "sacred cat of burma"],
+     "features": {"coat_long", "pattern_pointed", "eyes_blue", "gloves", "temper_calm",
+                  "temper_affectionate"},
+     "description": "A colorpoint cat with a silky coat, sapphire eyes and pure white 'gloves'.",
+     "personality": "Gentle, quiet and affectionate.",
+     "care": "Weekly combing; the silky coat mats less than most long coats."},
+    {"name": "British Shorthair", "popularity": 0.9, "aliases": ["british shorthair", "british blue"],
+     "features": {"face_round", "coat_short", "coat_dense", "build_muscular", "color_blue_gray", "eyes_gold",
+                  "temper_calm"},
+     "description": "A round, cobby cat with chubby cheeks, a dense plush coat (classically "
+                    "blue-gray) and copper eyes.",
+     "personality": "Calm, independent and undemanding.",
+     "care": "Weekly brushing; watch its weight."},
+    {"name": "Russian Blue", "popularity": 0.7, "aliases": ["russian blue"],
+     "features": {"coat_short", "coat_dense", "build_slender", "color_blue_gray", "color_silver",
+                  "eyes_green", "temper_calm", "temper_affectionate"},
+     "description": "An elegant cat with a shimmering silver-tipped blue-gray coat and "
+                    "vivid green eyes.",
+     "personality": "Reserved with strangers, devoted to its family.",
+     "care": "Low maintenance; prefers routine."},
+    {"name": "Scottish Fold", "popularity": 0.7, "aliases": ["scottish fold"],
+     "features": {"face_round", "ears_folded", "build_muscular", "coat_short", "coat_dense", "eyes_gold",
+                  "temper_calm", "temper_affectionate"},
+     "description": "Recognized by its forward-folded ears that give an owl-like look.",
+     "personality": "Sweet, adaptable and calm.",
+     "care": "Check ears often; the fold gene is linked to joint problems."},
+    {"name": "American Curl", "popularity": 0.3, "aliases": ["american curl"],
+     "features": {"ears_curled", "coat_long", "coat_short", "temper_active",
+                  "temper_affectionate"},
+     "description": "Known for ears that curl backwards in a smooth arc.",
+     "personality": "Playful and people-oriented well into adulthood.",
+     "care": "Handle the ear cartilage gently; light grooming."},
+    {"name": "Sphynx", "popularity": 0.8, "aliases": ["sphynx", "sphinx"],
+     "features": {"coat_hairless", "skin_wrinkled", "ears_large", "build_muscular",
+                  "temper_active", "temper_affectionate", "temper_vocal"},
+     "description": "A hairless cat with wrinkled skin, large ears and a warm, suede-like feel.",
+     "personality": "Extroverted, energetic and very affectionate.",
+     "care": "Weekly baths for skin oils; keep warm and out of strong sun."},
+    {"name": "Devon Rex", "popularity": 0.6, "aliases": ["devon rex"],
+     "features": {"coat_curly", "ears_large", "build_slender", "size_small", "temper_active",
+                  "temper_affectionate", "temper_doglike"},
+     "description": "A pixie-faced cat with huge ears and a soft, wavy coat.",
+     "personality": "Mischievous, playful and very attached to its people.",
+     "care": "Minimal brushing; gentle wiping instead."},
+    {"name": "Cornish Rex", "popularity": 0.4, "aliases": ["cornish rex"],
+     "features": {"coat_curly", "build_slender", "ears_large", "face_wedge", "temper_active",
+                  "temper_affectionate"},
+     "description": "A greyhound-like cat with a tight, marcel-waved coat.",
+     "personality": "Athletic, playful and attention-seeking.",
+     "care": "Very light grooming; gets cold easily."},
+    {"name": "Bengal", "popularity": 0.9, "aliases": ["bengal"],
+     "features": {"coat_short", "pattern_spotted", "build_muscular", "color_brown",
+                  "color_orange", "eyes_green", "eyes_gold", "temper_active",
+                  "temper_water", "temper_vocal"},
+     "signature": {"pattern_spotted"},
+     "description": "A wild-looking cat with a leopard-like spotted or marbled coat and a glittery sheen.",
+     "personality": "Extremely active, curious and often loves water.",
+     "care": "Needs lots of play and climbing space; minimal grooming."},
+    {"name": "Savannah", "popularity": 0.5, "aliases": ["savannah"],
+     "features": {"coat_short", "pattern_spotted", "size_large", "build_slender", "ears_large",
+                  "temper_active", "temper_doglike", "temper_water"},
+     "description": "A tall, long-legged spotted cat descended from the African serval.",
+     "personality": "Bold, energetic and dog-like; can be leash trained.",
+     "care": "Needs space and enrichment; check local ownership rules."},
+    {"name": "Egyptian Mau", "popularity": 0.3, "aliases": ["egyptian mau", "mau"],
+     "features": {"coat_short", "pattern_spotted", "color_silver", "eyes_green",
+                  "build_slender", "temper_active"},
+     "description": "A naturally spotted cat with gooseberry-green eyes and great speed.",
+     "personality": "Loyal, sensitive and very fast.",
+     "care": "Low grooming; enjoys high perches."},
+    {"name": "Abyssinian", "popularity": 0.6, "aliases": ["abyssinian", "aby"],
+     "features": {"coat_short", "pattern_ticked", "build_slender", "color_orange",
+                  "color_brown", "ears_large", "eyes_gold", "eyes_green", "temper_active"},
+     "description": "An ancient-looking cat with a warm ticked (agouti) coat.",
+     "personality": "Busy, curious and always exploring.",
+     "care": "Minimal grooming; needs play and climbing."},
+    {"name": "Oriental Shorthair", "popularity": 0.4, "aliases": ["oriental shorthair", "oriental"],
+     "features": {"coat_short", "build_slender", "face_wedge", "ears_large", "eyes_green",
+                  "temper_vocal", "temper_active"},
+     "description": "A Siamese relative with huge ears and a solid or patterned coat.",
+     "personality": "Talkative, social and inquisitive.",
+     "care": "Minimal grooming; dislikes being alone."},
+    {"name": "Burmese", "popularity": 0.5, "aliases": ["burmese"],
+     "features": {"coat_short", "build_muscular", "color_brown", "eyes_gold", "size_small",
+                  "temper_affectionate", "temper_active"},
+     "description": "A compact, glossy cat, classically rich sable brown, with golden eyes.",
+     "personality": "People-focused, playful and persistent.",
+     "care": "Minimal grooming; thrives on company."},
+    {"name": "Manx", "popularity": 0.4, "aliases": ["manx"],
+     "features": {"tail_short", "build_muscular", "coat_short", "temper_doglike",
+                  "temper_affectionate"},
+     "description": "A round cat that is tailless or has only a short stub of a tail.",
+     "personality": "Loyal and playful; sometimes fetches.",
+     "care": "Minimal grooming; check the spine and hips at vet visits."},
+    {"name": "Japanese Bobtail", "popularity": 0.3, "aliases": ["japanese bobtail"],
+     "features": {"tail_short", "build_slender", "color_calico", "color_white",
+                  "eyes_odd", "temper_active", "temper_vocal"},
+     "description": "A lean cat with a short, pom-pom-like tail, often calico ('mi-ke').",
+     "personality": "Lively, chatty and social.",
+     "care": "Minimal grooming; loves interactive play."},
+    {"name": "Turkish Angora", "popularity": 0.4, "aliases": ["turkish angora", "angora"],
+     "features": {"coat_long", "color_white", "build_slender", "eyes_blue", "eyes_odd",
+                  "eyes_green", "tail_bushy", "temper_active"},
+     "description": "An elegant cat with a silky coat, classically white, often with odd eyes.",
+     "personality": "Intelligent, energetic and a little bossy.",
+     "care": "Weekly combing; white blue-eyed cats may be deaf."},
+    {"name": "Turkish Van", "popularity": 0.3, "aliases": ["turkish van"],
+     "features": {"coat_long", "color_white", "size_large", "build_muscular", "eyes_odd",
+                  "temper_water", "temper_active"},
+     "description": "A mostly white cat with color on the head and tail, famous for swimming.",
+     "personality": "Energetic and famously fond of water.",
+     "care": "Weekly brushing; needs plenty of activity."},
+    {"name": "Domestic Shorthair (mixed breed)", "popularity": 1.0, "aliases": ["domestic shorthair", "moggy", "mixed breed"],
+     "features": {"coat_short", "pattern_tabby", "color_orange", "color_black", "color_tuxedo",
+                  "color_calico", "color_white", "eyes_green", "eyes_gold", "temper_active"},
+     "description": "The everyday mixed-breed cat, in every color from orange tabby to tuxedo.",
+     "personality": "Varies by individual; usually adaptable and hardy.",
+     "care": "Minimal grooming; regular vet check-ups."},
+    {"name": "Domestic Longhair (mixed breed)", "popularity": 0.95, "aliases": ["domestic longhair"],
+     "features": {"coat_long", "pattern_tabby", "color_orange", "color_black", "color_calico",
+                  "color_white", "color_tuxedo", "temper_calm"},
+     "description": "A mixed-breed cat with a long coat in any color or pattern.",
+     "personality": "Varies by individual; usually easygoing.",
+     "care": "Brush several times a week to prevent mats."},
+]
+
+# Extra weight for explicitly naming a breed
+NAME_WEIGHT = 10.0
+
+# Extra weight, as a fraction of the feature's own, for a breed's signature
+# features; enough to settle look-alikes such as a big cat with tufted ears
+# (Maine Coon rather than Norwegian Forest Cat)
+SIGNATURE_BONUS = 0.5
+
+# Weight of the popularity prior; small enough to only break near-ties
+POPULARITY_WEIGHT = 0.3
+
+# Total feature weight needed for full confidence; a lone common trait such
+# as "fluffy" is not enough to name a breed
+MIN_EVIDENCE = 3.0
+
+
+class BreedMatch:
+    """A ranked breed candidate"""
+
+    def __init__(self, breed: Dict[str, Any], score: float, confidence: float, matched: List[str]):
+        self.breed = breed
+        self.score = score
+        self.confidence = confidence
+        self.matched = matched
+
+    @property
+    def confidence_label(self) -> str:
+        if self.confidence >= 0.75:
+            return "High"
+        if self.confidence >= 0.5:
+            return "Medium"
+        return "Low"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "breed": self.breed["name"],
+            "confidence": round(self.confidence, 3),
+            "matched_features": self.matched
+        }
+
+
+class BreedCatalog:
+    """
+    Scores descriptions against the breed table
+
+    Features are pulled from the description with one compiled regex and
+    looked up in an inverted index (feature -> breeds). Rare features weigh
+    more than common ones, and features that contradict a breed (e.g. "short
+    hair" for a Persian) count against it.
+    """
+
+    def __init__(self, breeds: List[Dict[str, Any]] = BREEDS):
+        self.breeds = breeds
+        count = len(breeds)
+
+        phrases: List[Tuple[str, str]] = [(phrase, feature)
+                                          for feature, words in FEATURE_PHRASES.items()
+                                          for phrase in words]
+        for breed in breeds:
+            phrases.extend((alias, f"name:{breed['name']}") for alias in breed["aliases"])
+        self.phrase_to_features: Dict[str, List[str]] = {}
+        for phrase, feature in phrases:
+            self.phrase_to_features.setdefault(phrase, []).append(feature)
+        self.pattern = re.compile(
+            r"\b(?:" + "|".join(re.escape(phrase) for phrase in
+                                sorted(self.phrase_to_features, key=len, reverse=True)) + r")\b"
+        )
+
+        # Inverted index with IDF-style weights
+        document_frequency: Dict[str, int] = {}
+        for breed in breeds:
+            for feature in breed["features"]:
+                document_frequency[feature] = document_frequency.get(feature, 0) + 1
+        self.weights = {feature: 1.0 + math.log(count / df)
+                        for feature, df in document_frequency.items()}
+        self.index: Dict[str, List[int]] = {}
+        for i, breed in enumerate(breeds):
+            for feature in breed["features"]:
+                self.index.setdefault(feature, []).append(i)
+            self.index.setdefault(f"name:{breed['name']}", []).append(i)
+            self.weights[f"name:{breed['name']}"] = NAME_WEIGHT
+
+        # Breeds that contradict a feature: they have another value of the
+        # same exclusive group but not this one
+        self.contradictions: Dict[str, List[int]] = {}
+        for group in EXCLUSIVE_GROUPS:
+            for feature in group:
+                self.contradictions[feature] = [
+                    i for i, breed in enumerate(breeds)
+                    if feature not in breed["features"] and breed["features"] & (group - {feature})
+                ]
+
+    def extract_features(self, description: str) -> Set[str]:
+        """
+        Find the catalog features mentioned in a description
+        """
+        return {feature
+                for match in self.pattern.finditer(description.lower())
+                for feature in self.phrase_to_features[match.group(0)]}
+
+    def match(self, description: str, limit: int = 3) -> List[BreedMatch]:
+        """
+        Rank breeds for a description
+
+        Confidence combines how much of the description the top breed
+        explains, how clearly it beats the runner-up and how much evidence
+        the description gave at all.
+
+        Args:
+            description: Free-text description of the cat
+            limit: Maximum number of matches to return
+
+        Returns:
+            Matches sorted by score, best first (empty if nothing matched)
+        """
+        features = self.extract_features(description)
+        if not features:
+            return []
+
+        scores = [0.0] * len(self.breeds)
+        matched: Dict[int, List[str]] = {}
+        for feature in features:
+            weight = self.weights.get(feature, 0.0)
+            for i in self.index.get(feature, ()):
+                if feature in self.breeds[i].get("signature", ()):
+                    scores[i] += (1.0 + SIGNATURE_BONUS) * weight
+                else:
+                    scores[i] += weight
+                matched.setdefault(i, []).append(feature)
+            for i in self.contradictions.get(feature, ()):
+                scores[i] -= 0.5 * weight
+
+        for i in matched:
+            scores[i] += POPULARITY_WEIGHT * self.breeds[i].get("popularity", 0.0)
+
+        ranked = sorted((i for i in matched if scores[i] > 0), key=lambda i: scores[i], reverse=True)
+        if not ranked:
+            return []
+
+        total = sum(self.weights.get(feature, 0.0) for feature in features) + POPULARITY_WEIGHT
+        top = scores[ranked[0]]
+        runner_up = scores[ranked[1]] if len(ranked) > 1 else 0.0
+        margin = (top - runner_up) / top
+        evidence = min(1.0, (total - POPULARITY_WEIGHT) / MIN_EVIDENCE)
+
+        results = []
+        for i in ranked[:limit]:
+            coverage = min(1.0, scores[i] / total)
+            relative = scores[i] / top
+            confidence = coverage * (0.6 + 0.4 * margin) * relative * evidence
+            results.append(BreedMatch(self.breeds[i], scores[i], confidence, sorted(matched[i])))
+        return results
+
+    @staticmethod
+    def format_analysis(matches: List[BreedMatch]) -> str:
+        """
+        Render matches in the same markdown layout BreedMatchAgent asks
+        Gemini for
+        """
+        best = matches[0]
+        reasons = ", ".join(feature.split(":", 1)[-1].replace("_", " ") for feature in best.matched)
+        analysis = (
+            f"**Breed**: {best.breed['name']}\n"
+            f"**Confidence**: {best.confidence_label}\n"
+            f"**Match Reasons**: Matches {reasons}\n"
+            f"**Description**: {best.breed['description']}\n"
+            f"**Personality**: {best.breed['personality']}\n"
+            f"**Care Notes**: {best.breed['care']}"
+        )
+        if len(matches) > 1:
+            others = ", ".join(match.breed["name"] for match in matches[1:])
+            analysis += f"\n\nAlso consider: {others}"
+        return analysis
@@ -2,8 +2,13 @@
 Cat Breed Matching Agent
 Identifies and suggests cat breeds based on descriptions or images
 """
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from .simple_agent import BaseAgent
+from .breed_catalog import BreedCatalog, BreedMatch
+from config.settings import (
+    BREED_MATCH_LOCAL_THRESHOLD, BREED_MATCH_LOCAL_MARGIN, BREED_MATCH_LOCAL_MIN_FEATURES
+)
+from services.rate_limiter import UpstreamThrottled
 
 class BreedMatchAgent(BaseAgent):
     """
@@ -11,6 +16,8 @@ class BreedMatchAgent(BaseAgent):
     Powered by Google Gemini
     """
     
+    cache_ttl = 86400  # Breed facts are stable, keep them for a day
+    
     def __init__(self):
         system_prompt = """You are an expert cat breed identifier and feline geneticist! 🐱
 
@@ -44,6 +51,10 @@ Be friendly and informative!"""
             system_prompt=system_prompt,
             agent_type="BreedMatchAgent"
         )
+        self.catalog = BreedCatalog()
+        self.local_threshold = BREED_MATCH_LOCAL_THRESHOLD
+        self.local_margin = BREED_MATCH_LOCAL_MARGIN
+        self.local_min_features = BREED_MATCH_LOCAL_MIN_FEATURES
         
     def process(self, input_text: str) -> Dict[str, Any]:
         """
@@ -64,17 +75,73 @@ Be friendly and informative!"""
                 "status": "analyzed"
             }
         
+        # Well-known breeds are answered from the local catalog; only
+        # ambiguous descriptions go to Gemini
+        matches = self.catalog.match(input_text)
+        if self.is_decisive(matches):
+            return self.catalog_result(input_text, matches)
+        
         # Call Gemini with breed matching prompt
-        response = self.call_gemini(
-            user_message=f"Identify the cat breed based on this description:\n\n\"{input_text}\"",
-            temperature=0.4  # Moderate temperature for accurate breed identification
-        )
+        try:
+            response = self.call_gemini(
+                user_message=f"Identify the cat breed based on this description:\n\n\"{input_text}\"",
+                temperature=0.4  # Moderate temperature for accurate breed identification
+            )
+        except UpstreamThrottled as e:
+            # Gemini unavailable (circuit open, out of time, over quota or
+            # shed): the catalog's best guess beats no answer
+            if not matches:
+                raise
+            return self.catalog_result(input_text, matches, fallback_reason=str(e))
+        
+        if self.last_call_failed() and matches:
+            return self.catalog_result(input_text, matches, fallback_reason=response)
         
         result = {
             "agent": self.agent_type,
             "input": input_text,
             "breed_analysis": response,
-            "status": "analyzed"
+            "matches": [match.to_dict() for match in matches],
+            "decided_by": "llm",
+            "status": "analyzed",
+            "cache_hit": self.last_call_cached()
         }
         
         return result
+    
+    def is_decisive(self, matches: List[BreedMatch]) -> bool:
+        """
+        Whether the catalog's top match is clear enough to skip Gemini
+        
+        Besides the confidence threshold, the top breed must lead the
+        runner-up by local_margin and rest on local_min_features matched
+        features, unless the description names the breed. Near-ties such as
+        "an orange cat" (several breeds on one color feature) go to Gemini.
+        """
+        if not matches or matches[0].confidence < self.local_threshold:
+            return False
+        top = matches[0]
+        if any(feature.startswith("name:") for feature in top.matched):
+            return True
+        if len(top.matched) < self.local_min_features:
+            return False
+        runner_up = matches[1].score if len(matches) > 1 else 0.0
+        return (top.score - runner_up) / top.score >= self.local_margin
+    
+    def catalog_result(self, input_text: str, matches: List[BreedMatch],
+                       fallback_reason: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Answer from the local catalog, in the same shape as a Gemini result
+        """
+        result = {
+            "agent": self.agent_type,
+            "input": input_text,
+            "breed_analysis": self.catalog.format_analysis(matches),
+            "matches": [match.to_dict() for match in matches],
+            "decided_by": "catalog",
+            "status": "analyzed",
+            "cache_hit": False
+        }
+        if fallback_reason is not None:
+            result["fallback_reason"] = fallback_reason
+        return result
@@ -0,0 +1,157 @@
+"""
+Local Cat Translation Engine
+Deterministic, rule-based text-to-cat translation that runs without Gemini
+"""
+from typing import List
+import re
+import zlib
+
+# Sentiment lexicons (lowercase). Small on purpose: they only need to pick a
+# mood for the sounds and the emoji.
+POSITIVE_WORDS = frozenset("""
+good great awesome amazing nice cool fun happy glad yay wonderful fantastic
+excellent perfect best congrats congratulations proud welcome enjoy brilliant
+thanks thank appreciate appreciated grateful yes sure ok okay
+""".split())
+EXCITED_WORDS = frozenset("""
+excited exciting finally woohoo hooray yay wow omg incredible launch shipped
+celebrate party weekend
+""".split())
+LOVE_WORDS = frozenset("""
+love loved lovely adore cute sweet heart hug hugs kiss kisses darling
+""".split())
+SAD_WORDS = frozenset("""
+sad sorry unhappy miss missed tired sick lonely cry crying upset down bad
+unfortunately sigh hurt lost fail failed
+""".split())
+ANGRY_WORDS = frozenset("""
+angry mad furious hate annoyed annoying stop broke broken ugh terrible awful
+worst stupid
+""".split())
+FUNNY_WORDS = frozenset("""
+lol haha hahaha lmao rofl funny hilarious joke kidding
+""".split())
+SURPRISE_WORDS = frozenset("""
+what really seriously whoa omg wow shocked surprise surprised
+""".split())
+
+# Cat sounds per mood; a word always maps to the same sound within a mood
+SOUNDS = {
+    "happy": ["meow", "mrrp", "purr", "nya", "mrow"],
+    "excited": ["meow", "nya", "mrrp"],
+    "love": ["purr", "mrrp", "meow"],
+    "sad": ["mrow", "purr", "mew"],
+    "angry": ["hiss", "mrrrow", "grr"],
+    "funny": ["nya", "meow", "mrrp"],
+    "surprised": ["mrow", "meow", "nya"],
+    "neutral": ["meow", "mrow", "mrrp", "purr"],
+}
+
+EMOJI = {
+    "happy": "😸",
+    "excited": "😻",
+    "love": "😽",
+    "sad": "😿",
+    "angry": "😾",
+    "funny": "😹",
+    "surprised": "🙀",
+    "neutral": "😺",
+}
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9]+(?:'[A-Za-z]+)?|[.!?]+|[,;:]|\S")
+SENTENCE_END = re.compile(r"[.!?]+")
+
+
+def detect_mood(words: List[str], text: str) -> str:
+    """
+    Pick a mood from lexicon hits and punctuation
+    """
+    lowered = [w.lower() for w in words]
+    scores = {
+        "angry": sum(w in ANGRY_WORDS for w in lowered) * 1.5,
+        "sad": sum(w in SAD_WORDS for w in lowered) * 1.5,
+        "love": sum(w in LOVE_WORDS for w in lowered) * 1.5,
+        "funny": sum(w in FUNNY_WORDS for w in lowered) * 1.5,
+        "excited": sum(w in EXCITED_WORDS for w in lowered) * 1.2,
+        "surprised": float(sum(w in SURPRISE_WORDS for w in lowered)),
+        "happy": float(sum(w in POSITIVE_WORDS for w in lowered)),
+    }
+    if "!" in text:
+        scores["excited"] += 1.0
+        if scores["angry"]:
+            scores["angry"] += 1.0
+    if "?!" in text or "!?" in text:
+        scores["surprised"] += 1.5
+    mood, score = max(scores.items(), key=lambda item: item[1])
+    return mood if score > 0 else "neutral"
+
+
+def cat_sound(word: str, mood: str) -> str:
+    """
+    Deterministic cat sound for a word, keeping a rough sense of its length
+    """
+    options = SOUNDS[mood]
+    sound = options[zlib.crc32(word.lower().encode("utf-8")) % len(options)]
+    # Stretch the vowel sound of long words ("meooow") to keep the rhythm
+    if len(word) >= 8:
+        for vowel in ("o", "e", "u", "a", "r"):
+            if vowel in sound:
+                sound = sound.replace(vowel, vowel * 2, 1)
+                break
+    return sound
+
+
+class LocalCatTranslator:
+    """
+    Rule-based translator following the CatTranslatorAgent prompt rules
+
+    1. Every word becomes a meow/mrow/purr/mrrp/nya variant
+    2. The sounds and the emoji follow the detected mood
+    3. Words in capitals (and excited sentences) come out in capitals
+    4. Punctuation and word count are preserved
+    """
+
+    def translate(self, text: str) -> str:
+        """
+        Translate text to cat language
+
+        Args:
+            text: Text to translate
+
+        Returns:
+            Cat language translation ending with a mood emoji
+        """
+        tokens = TOKEN_PATTERN.findall(text)
+        words = [t for t in tokens if t[0].isalnum()]
+        if not words:
+            return "Mrow? 😿"
+
+        mood = detect_mood(words, text)
+        shout_all = mood in ("excited", "angry") and "!" in text
+        separator = "... " if mood == "sad" else " "
+
+        pieces: List[str] = []
+        start_of_sentence = True
+        for token in tokens:
+            if token[0].isalnum():
+                sound = cat_sound(token, mood)
+                if shout_all or (token.isupper() and len(token) > 1):
+                    sound = sound.upper()
+                elif start_of_sentence:
+                    sound = sound.capitalize()
+                if pieces and pieces[-1][-1:].isalnum():
+                    pieces.append(separator)
+                elif pieces:
+                    pieces.append(" ")
+                pieces.append(sound)
+                start_of_sentence = False
+            else:
+                if mood == "sad" and SENTENCE_END.fullmatch(token):
+                    token = "..."
+                pieces.append(token)
+                start_of_sentence = bool(SENTENCE_END.fullmatch(token))
+
+        translation = "".join(pieces)
+        if mood == "sad" and not translation.endswith("..."):
+            translation += "..."
+        return f"{translation} {EMOJI[mood]}"
@@ -2,8 +2,14 @@
 Cat Language Translator Agent - Agent 2
 Converts text to cat language (meows) using Google Gemini
 """
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Optional
+from contextlib import contextmanager
+import json
+import threading
 from .simple_agent import BaseAgent
+from .cat_rules_engine import LocalCatTranslator
+from config.settings import TRANSLATOR_LOCAL_MODE, TRANSLATOR_LOAD_THRESHOLD
+from services.rate_limiter import UpstreamThrottled
 
 class CatTranslatorAgent(BaseAgent):
     """
@@ -11,6 +17,9 @@ class CatTranslatorAgent(BaseAgent):
     Powered by Google Gemini
     """
     
+    cache_ttl = 600  # Only used when high-temperature caching is allowed
+    translation_temperature = 0.9  # Higher temperature for more creative translations
+    
     def __init__(self):
         system_prompt = """You are a creative cat language translator! 🐱
 
@@ -37,6 +46,52 @@ Be creative and cat-like in your translations!"""
             agent_type="CatTranslatorAgent"
         )
         
+        # Rule-based engine for when Gemini is slow, failing or not wanted
+        self.local_engine = LocalCatTranslator()
+        self.local_mode = TRANSLATOR_LOCAL_MODE
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        
+    def local_engine_reason(self) -> Optional[str]:
+        """
+        Why the local engine should be used up front, or None to try Gemini
+        """
+        if self.local_mode == "always":
+            return "local mode"
+        if self.local_mode == "load" and self._in_flight >= TRANSLATOR_LOAD_THRESHOLD:
+            return "under load"
+        return None
+    
+    def falls_back_on_error(self) -> bool:
+        return self.local_mode in ("fallback", "load")
+    
+    @contextmanager
+    def track_in_flight(self):
+        with self._in_flight_lock:
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._in_flight_lock:
+                self._in_flight -= 1
+    
+    def local_result(self, input_text: str, reason: str) -> Dict[str, Any]:
+        """
+        Translate with the local engine, in the same shape as process()
+        """
+        return {
+            "agent": self.agent_type,
+            "original_text": input_text,
+            "cat_translation": self.local_engine.translate(input_text),
+            "status": "translated",
+            "engine": "local",
+            "fallback_reason": reason,
+            "cache_hit": False
+        }
+    
+    def build_user_message(self, input_text: str) -> str:
+        return f"Translate this to cat language:\n\n\"{input_text}\""
+    
     def process(self, input_text: str) -> Dict[str, Any]:
         """
         Translate text to cat language using Google Gemini
@@ -55,17 +110,117 @@ Be creative and cat-like in your translations!"""
                 "status": "translated"
             }
         
+        reason = self.local_engine_reason()
+        if reason is not None:
+            return self.local_result(input_text, reason)
+        
         # Call Gemini with translation prompt
-        cat_text = self.call_gemini(
-            user_message=f"Translate this to cat language:\n\n\"{input_text}\"",
-            temperature=0.9  # Higher temperature for more creative translations
-        )
+        with self.track_in_flight():
+            try:
+                cat_text = self.call_gemini(
+                    user_message=self.build_user_message(input_text),
+                    temperature=self.translation_temperature
+                )
+            except UpstreamThrottled as e:
+                # Over quota: translate locally if allowed, else the route
+                # answers 429/503
+                if not self.falls_back_on_error():
+                    raise
+                return self.local_result(input_text, str(e))
+        
+        # Never ship the API error text as if it were a translation
+        if self.last_call_failed() and self.falls_back_on_error():
+            return self.local_result(input_text, cat_text)
         
         result = {
             "agent": self.agent_type,
             "original_text": input_text,
             "cat_translation": cat_text,
-            "status": "translated"
+            "status": "translated",
+            "engine": "gemini",
+            "cache_hit": self.last_call_cached()
         }
         
         return result
+    
+    def process_stream(self, input_text: str) -> Iterator[str]:
+        """
+        Translate text to cat language, yielding the translation as it is
+        generated
+        
+        Args:
+            input_text: Text to translate
+            
+        Yields:
+            Pieces of the cat translation
+        """
+        if not input_text or not input_text.strip():
+            yield "Mrow? 😿 (Empty input detected)"
+            return
+        
+        if self.local_engine_reason() is not None:
+            yield self.local_engine.translate(input_text)
+            return
+        
+        started = False
+        with self.track_in_flight():
+            try:
+                for piece in self.stream_gemini(
+                    user_message=self.build_user_message(input_text),
+                    temperature=self.translation_temperature
+                ):
+                    started = True
+                    yield piece
+            except Exception:
+                # Only fall back if nothing was sent yet; a half Gemini,
+                # half local translation would read oddly
+                if started or not self.falls_back_on_error():
+                    raise
+                yield self.local_engine.translate(input_text)
+    
+    def translate_batch(self, texts: List[str]) -> List[Optional[str]]:
+        """
+        Translate several texts with a single Gemini call
+        
+        The system prompt is sent once for the whole pack instead of once
+        per text. Like process(), the pack is translated locally when the
+        local mode says so, or when Gemini fails or sheds the call and
+        fallback is allowed.
+        
+        Args:
+            texts: Texts to translate
+            
+        Returns:
+            Translations in input order; None for items that are missing or
+            unreadable in the response
+            
+        Raises:
+            UpstreamThrottled: If Gemini shed the call and fallback is off
+        """
+        if self.local_engine_reason() is not None:
+            return [self.local_engine.translate(text) for text in texts]
+        
+        items = [{"id": i, "text": text} for i, text in enumerate(texts)]
+        with self.track_in_flight():
+            try:
+                response = self.call_gemini(
+                    user_message=(
+                        "Translate the text of each item below to cat language. Reply ONLY with a "
+                        "JSON array containing one object per item, in the same order: "
+                        '{"id": <item id>, "cat_translation": "<translation>"}\n\n'
+                        + json.dumps(items, ensure_ascii=False)
+                    ),
+                    temperature=self.translation_temperature,
+                    max_output_tokens=8192,
+                    operation="batch"
+                )
+            except UpstreamThrottled:
+                if not self.falls_back_on_error():
+                    raise
+                return [self.local_engine.translate(text) for text in texts]
+        
+        # The error text is not a packed response: translate locally rather
+        # than retrying every item against a failing Gemini
+        if self.last_call_failed() and self.falls_back_on_error():
+            return [self.local_engine.translate(text) for text in texts]
+        return self.match_batch_items(response, len(texts), "cat_translation")
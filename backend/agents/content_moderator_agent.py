@@ -2,8 +2,51 @@
 Content Moderation Agent - Agent 1
 Checks if text is workplace appropriate using Google Gemini
 """
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Literal
+import json
+from pydantic import BaseModel, ValidationError, field_validator
 from .simple_agent import BaseAgent
+from .moderation_prefilter import ModerationPrefilter
+from config.settings import MODERATION_PREFILTER_ENABLED, MODERATION_FAIL_OPEN
+from services.rate_limiter import UpstreamThrottled
+
+
+class ModerationVerdict(BaseModel):
+    """
+    Typed moderation verdict, validated from Gemini's JSON output
+    """
+    appropriate: bool
+    reason: str = ""
+    severity: Literal["none", "low", "medium", "high"] = "none"
+    suggestions: str = ""
+    
+    @field_validator("severity", mode="before")
+    @classmethod
+    def normalize_severity(cls, value):
+        return value.strip().lower() if isinstance(value, str) else value
+
+
+# Gemini response_schema matching ModerationVerdict (JSON mode)
+VERDICT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "appropriate": {"type": "boolean"},
+        "reason": {"type": "string"},
+        "severity": {"type": "string", "enum": ["none", "low", "medium", "high"]},
+        "suggestions": {"type": "string"}
+    },
+    "required": ["appropriate", "reason", "severity"]
+}
+
+BATCH_VERDICT_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {"id": {"type": "integer"}, **VERDICT_SCHEMA["properties"]},
+        "required": ["id"] + VERDICT_SCHEMA["required"]
+    }
+}
+
 
 class ContentModeratorAgent(BaseAgent):
     """
@@ -11,6 +54,8 @@ class ContentModeratorAgent(BaseAgent):
     Powered by Google Gemini
     """
     
+    cache_ttl = 3600  # Verdicts for the same text rarely change
+    
     def __init__(self):
         system_prompt = """You are a professional content moderator for workplace communications.
 Your job is to analyze text and determine if it is appropriate for a professional workplace environment.
@@ -37,6 +82,9 @@ Be strict but fair in your evaluation."""
             agent_type="ContentModeratorAgent"
         )
         
+        # Local fast path for obvious cases
+        self.prefilter = ModerationPrefilter() if MODERATION_PREFILTER_ENABLED else None
+        
     def process(self, input_text: str) -> Dict[str, Any]:
         """
         Check if text is workplace appropriate using Google Gemini
@@ -55,18 +103,127 @@ Be strict but fair in your evaluation."""
                 "original_text": input_text
             }
         
-        # Call Gemini with moderation prompt
-        response = self.call_gemini(
-            user_message=f"Evaluate this text for workplace appropriateness:\n\n\"{input_text}\"",
-            temperature=0.3  # Lower temperature for more consistent moderation
-        )
+        # Settle clear-cut cases locally
+        verdict = self.prefilter.check(input_text) if self.prefilter else None
+        if verdict is not None:
+            return self.prefilter_result(input_text, verdict)
+        
+        # Call Gemini with moderation prompt in JSON mode. While Gemini is
+        # unhealthy (circuit open), out of time, over quota or shedding load,
+        # the prefilter has already had its say and the fail-open /
+        # fail-closed policy decides the rest.
+        try:
+            response = self.call_gemini(
+                user_message=f"Evaluate this text for workplace appropriateness:\n\n\"{input_text}\"",
+                temperature=0.3,  # Lower temperature for more consistent moderation
+                response_mime_type="application/json",
+                response_schema=VERDICT_SCHEMA
+            )
+        except UpstreamThrottled as e:
+            response = str(e)
+        
+        verdict = None if self.last_call_failed() else self.parse_verdict(response)
+        if verdict is None:
+            # No usable verdict (API error or malformed output); apply the
+            # configured fail-open / fail-closed policy
+            result = {
+                "agent": self.agent_type,
+                "original_text": input_text,
+                "appropriate": MODERATION_FAIL_OPEN,
+                "reason": "Moderation verdict unavailable",
+                "severity": "none",
+                "suggestions": "",
+                "analysis": response,
+                "status": "unverified",
+                "decided_by": "policy",
+                "cache_hit": self.last_call_cached()
+            }
+            return result
         
-        # Parse response (in production, use proper JSON parsing with error handling)
         result = {
             "agent": self.agent_type,
             "original_text": input_text,
+            **verdict.model_dump(),
             "analysis": response,
-            "status": "analyzed"
+            "status": "analyzed",
+            "decided_by": "llm",
+            "cache_hit": self.last_call_cached()
         }
         
         return result
+    
+    def parse_verdict(self, response: Any) -> Optional[ModerationVerdict]:
+        """
+        Validate a verdict from Gemini's JSON text (or an already parsed dict)
+        
+        Returns:
+            ModerationVerdict, or None if the response does not match the schema
+        """
+        data = self.parse_json_response(response) if isinstance(response, str) else response
+        if not isinstance(data, dict):
+            return None
+        try:
+            return ModerationVerdict.model_validate(data)
+        except ValidationError:
+            return None
+    
+    def prefilter_result(self, input_text: str, verdict: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Wrap a prefilter verdict in the same shape as a Gemini result
+        """
+        return {
+            "agent": self.agent_type,
+            "original_text": input_text,
+            **verdict,
+            "analysis": json.dumps(verdict),
+            "status": "analyzed",
+            "decided_by": "prefilter",
+            "cache_hit": False
+        }
+    
+    def moderate_batch(self, texts: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Evaluate several texts with a single Gemini call
+        
+        Texts the prefilter can decide never reach Gemini.
+        
+        Args:
+            texts: Texts to evaluate
+            
+        Returns:
+            Verdict dictionaries (appropriate, reason, severity, suggestions,
+            decided_by) in input order; None for items without a usable
+            verdict
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+        pending = []
+        for i, text in enumerate(texts):
+            verdict = self.prefilter.check(text) if self.prefilter else None
+            if verdict is not None:
+                results[i] = {**verdict, "decided_by": "prefilter"}
+            else:
+                pending.append(i)
+        if not pending:
+            return results
+        
+        items = [{"id": i, "text": texts[index]} for i, index in enumerate(pending)]
+        response = self.call_gemini(
+            user_message=(
+                "Evaluate the text of each item below for workplace appropriateness. Reply "
+                "ONLY with a JSON array containing one object per item, in the same order: "
+                '{"id": <item id>, "appropriate": true/false, "reason": "...", '
+                '"severity": "none/low/medium/high", "suggestions": "..."}\n\n'
+                + json.dumps(items, ensure_ascii=False)
+            ),
+            temperature=0.3,
+            max_output_tokens=8192,
+            response_mime_type="application/json",
+            response_schema=BATCH_VERDICT_SCHEMA,
+            operation="batch"
+        )
+        verdicts = self.match_batch_items(response, len(items))
+        for index, raw in zip(pending, verdicts):
+            verdict = self.parse_verdict(raw) if raw is not None else None
+            if verdict is not None:
+                results[index] = {**verdict.model_dump(), "decided_by": "llm"}
+        return results
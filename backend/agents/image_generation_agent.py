@@ -2,18 +2,68 @@
 Image Generation Agent
 Generates cat images using Pollinations.ai (Free, no API key needed)
 """
-from typing import Dict, Any
-import google.generativeai as genai
+from typing import Dict, Any, Optional
+import hashlib
 import requests
-import io
-import base64
-from PIL import Image
+import tempfile
 import sys
 import os
 import urllib.parse
+import json
+import time
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config.settings import GEMINI_API_KEY
+from config.settings import (
+    IMAGE_PROMPT_MODEL, RESPONSE_CACHE_ENABLED, IMAGE_CACHE_TTL, IMAGE_STREAM_CHUNK_SIZE,
+    SINGLE_FLIGHT_ENABLED, SINGLE_FLIGHT_IMAGE_TIMEOUT,
+    HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, IMAGE_HEDGE_ENABLED, IMAGE_HEDGE_MIN_DELAY,
+    IMAGE_VARIANT_QUALITY, IMAGE_POOL_QUEUE_WAIT, POLLINATIONS_URL
+)
+from services.response_cache import get_response_cache, make_cache_key
+from services.image_store import get_image_store
+from services.image_variants import get_image_variants
+from services.image_pool import get_image_pool, resize_to_file
+from services.http_pool import get_http_session
+from services.gemini_registry import get_gemini_registry
+from services.single_flight import get_single_flight, SingleFlightTimeout
+from services.rate_limiter import UpstreamThrottled
+from services.resilience import (
+    get_circuit_breaker, retry_call, call_timeout, hedged_call, LatencyTracker, last_retry_count
+)
+from services import tracing
+from services.metrics import (
+    agent_call_duration, image_fetch_duration, image_fetch_bytes, upstream_errors, outcome_of
+)
+from .simple_agent import generate_shared
+
+# Prompt model instructions (also part of their calls' cache keys)
+ENHANCE_INSTRUCTION = """
+            Enhance this cat image generation prompt to be more detailed and specific for Stable Diffusion.
+            
+            User prompt: "{user_prompt}"
+            
+            Add details about:
+            - Specific breed characteristics if mentioned
+            - Fur texture and patterns
+            - Eye color and expression
+            - Pose and environment
+            - Lighting and artistic style
+            
+            Keep it under 75 words. Focus on visual details. Return ONLY the enhanced prompt, nothing else.
+            """
+
+DESCRIBE_INSTRUCTION = (
+    "Describe the cat in this photo as a prompt for an image generator: "
+    "breed, fur color and pattern, eye color, pose and setting. "
+    "Keep it under 40 words. Return ONLY the description."
+)
+
+# Output formats generate_image can transcode to
+IMAGE_FORMATS = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp"
+}
 
 class ImageGenerationAgent:
     """
@@ -23,65 +73,97 @@ class ImageGenerationAgent:
     
     def __init__(self):
         self.agent_type = "ImageGenerationAgent"
-        genai.configure(api_key=GEMINI_API_KEY)
+        self.prompt_model = get_gemini_registry().get_model(IMAGE_PROMPT_MODEL)
         
         # Using Pollinations.ai - completely free, no API key
-        self.api_url = "https://image.pollinations.ai/prompt/"
+        self.api_url = POLLINATIONS_URL
         
-    def generate_image(self, prompt: str) -> Dict[str, Any]:
+        # Time to first byte of recent fetches, for the hedge delay
+        self.fetch_latency = LatencyTracker()
+        
+    def generate_image(self, prompt: str, enhanced_prompt: Optional[str] = None,
+                       output_format: Optional[str] = None) -> Dict[str, Any]:
         """
         Generate cat image from text prompt using Pollinations.ai
         
         Args:
             prompt: Text description of desired cat image
+            enhanced_prompt: Already enhanced prompt (skips the Gemini call)
+            output_format: 'png', 'jpeg' or 'webp' to transcode; None keeps
+                           the upstream encoding
             
         Returns:
             Dictionary with image generation results
         """
+        with tracing.span("generate_image", agent=self.agent_type) as image_span:
+            result = self._generate_image(prompt, enhanced_prompt, output_format)
+            image_span.cache_hit = bool(result.get("cache_hit"))
+            if result.get("status") != "success":
+                outcome = "error"
+            elif result.get("cache_hit"):
+                outcome = "cache_hit"
+            elif result.get("coalesced"):
+                # Waited on another request's fetch of the same image
+                outcome = "coalesced"
+                image_span.add_upstream(image_span.duration)
+            else:
+                outcome = "ok"
+            image_span.status = outcome
+        agent_call_duration.labels(self.agent_type, "generate_image", outcome).observe(image_span.duration)
+        return result
+    
+    def _generate_image(self, prompt: str, enhanced_prompt: Optional[str],
+                        output_format: Optional[str]) -> Dict[str, Any]:
+        if output_format is not None and output_format not in IMAGE_FORMATS:
+            return {
+                "agent": self.agent_type,
+                "prompt": prompt,
+                "image_url": None,
+                "message": f"Unsupported image format: {output_format}",
+                "status": "error"
+            }
+        
+        # Same prompt, same image: serve it from the shared cache if any
+        # worker has generated it before
+        cache_key = make_cache_key(
+            self.agent_type, self.api_url, prompt,
+            {"width": 1024, "height": 1024, "output": "store", "format": output_format}
+        )
+        if RESPONSE_CACHE_ENABLED:
+            cached = get_response_cache().get(cache_key)
+            if cached is not None:
+                result = json.loads(cached)
+                # The cache may outlive the file if the store was wiped
+                if get_image_store().exists(result.get("image_id", "")):
+                    result["cache_hit"] = True
+                    return result
+        
         try:
-            # Enhance the prompt to focus on cats
-            enhanced_prompt = self.enhance_prompt(prompt)
+            if not SINGLE_FLIGHT_ENABLED:
+                return self.fetch_image(prompt, enhanced_prompt, output_format, cache_key)
             
-            print(f"Generating image with prompt: {enhanced_prompt}")
-            print(f"Using Pollinations.ai API")
-            
-            # URL encode the prompt
-            encoded_prompt = urllib.parse.quote(enhanced_prompt)
-            
-            # Build the URL (Pollinations.ai generates on the fly)
-            image_url = f"{self.api_url}{encoded_prompt}?width=1024&height=1024&nologo=true"
-            
-            print(f"Fetching image from: {image_url}")
-            
-            # Download the image
-            response = requests.get(image_url, timeout=30)
-            response.raise_for_status()
-            
-            print("Image downloaded successfully, converting to base64...")
-            
-            # Convert to PIL Image
-            image = Image.open(io.BytesIO(response.content))
-            
-            # Convert to base64 for frontend
-            buffered = io.BytesIO()
-            image.save(buffered, format="PNG")
-            img_str = base64.b64encode(buffered.getvalue()).decode()
-            
-            # Return data URL
-            image_data_url = f"data:image/png;base64,{img_str}"
-            
-            print("Image conversion complete!")
+            # Concurrent requests for the same image share one Pollinations call
+            result, shared = get_single_flight("image").do(
+                cache_key,
+                lambda: self.fetch_image(prompt, enhanced_prompt, output_format, cache_key),
+                timeout=call_timeout(SINGLE_FLIGHT_IMAGE_TIMEOUT)
+            )
+            if shared:
+                result = {**result, "coalesced": True}
+            return result
             
+        except UpstreamThrottled as e:
+            # Out of time or Pollinations marked unhealthy: fail fast
+            error_msg = f"Image service unavailable: {str(e)}"
+            print(f"ERROR: {error_msg}")
             return {
                 "agent": self.agent_type,
                 "prompt": prompt,
-                "enhanced_prompt": enhanced_prompt,
-                "image_url": image_data_url,
-                "message": "Image generated successfully!",
-                "status": "success"
+                "image_url": None,
+                "message": error_msg,
+                "status": "error"
             }
-            
-        except requests.Timeout:
+        except (requests.Timeout, SingleFlightTimeout):
             error_msg = "Image generation timed out. Please try again."
             print(f"ERROR: {error_msg}")
             return {
@@ -113,30 +195,161 @@ class ImageGenerationAgent:
                 "status": "error"
             }
     
+    def fetch_image(self, prompt: str, enhanced_prompt: Optional[str],
+                    output_format: Optional[str], cache_key: str) -> Dict[str, Any]:
+        """
+        Generate, store and cache one image (the uncached path of generate_image)
+        
+        Raises:
+            requests.RequestException: If Pollinations.ai fails
+        """
+        # Enhance the prompt to focus on cats
+        if enhanced_prompt is None:
+            enhanced_prompt = self.enhance_prompt(prompt)
+        
+        print(f"Generating image with prompt: {enhanced_prompt}")
+        print(f"Using Pollinations.ai API")
+        
+        # URL encode the prompt
+        encoded_prompt = urllib.parse.quote(enhanced_prompt)
+        
+        # Build the URL (Pollinations.ai generates on the fly)
+        image_url = f"{self.api_url}{encoded_prompt}?width=1024&height=1024&nologo=true"
+        
+        print(f"Fetching image from: {image_url}")
+        
+        # Stream the image straight into the store, keeping the upstream
+        # encoding; the type is sniffed from the first bytes, not decoded.
+        # The download is network-bound, so all of it counts as upstream.
+        with tracing.span("fetch_image", upstream="pollinations") as fetch_span:
+            try:
+                with self.open_image_stream(image_url) as response:
+                    image_id, content_type, size = get_image_store().put_stream(
+                        response.iter_content(chunk_size=IMAGE_STREAM_CHUNK_SIZE)
+                    )
+            finally:
+                fetch_span.add_retries(last_retry_count())
+                fetch_span.add_upstream(fetch_span.duration)
+            fetch_span.attributes["bytes"] = size
+        
+        print(f"Image stored as {image_id} ({content_type}, {size} bytes)")
+        image_fetch_bytes.labels().observe(size)
+        
+        # Only decode with PIL when a different encoding was asked for
+        if output_format and IMAGE_FORMATS[output_format] != content_type:
+            image_id = self.transcode_image(image_id, output_format)
+            content_type = IMAGE_FORMATS[output_format]
+        
+        # Smaller / WebP copies are encoded in the background, so they are
+        # usually ready by the time the client asks for them
+        variants = get_image_variants()
+        variants.prerender(image_id)
+        
+        result = {
+            "agent": self.agent_type,
+            "prompt": prompt,
+            "enhanced_prompt": enhanced_prompt,
+            "image_id": image_id,
+            "image_url": f"/api/images/{image_id}",
+            "content_type": content_type,
+            "variants": variants.urls(image_id),
+            "message": "Image generated successfully!",
+            "status": "success",
+            "cache_hit": False
+        }
+        if RESPONSE_CACHE_ENABLED:
+            get_response_cache().set(cache_key, json.dumps(result), IMAGE_CACHE_TTL)
+        
+        return result
+    
+    def open_image_stream(self, image_url: str) -> requests.Response:
+        """
+        Start downloading an image, with retries, a circuit breaker and an
+        optional hedged second request
+        
+        Returns:
+            A streamed response with an OK status (the caller closes it)
+        """
+        breaker = get_circuit_breaker("pollinations")
+        
+        def request() -> requests.Response:
+            with breaker.guard():
+                started = time.monotonic()
+                try:
+                    response = get_http_session().get(
+                        image_url,
+                        stream=True,
+                        timeout=(HTTP_CONNECT_TIMEOUT, call_timeout(HTTP_READ_TIMEOUT))
+                    )
+                    try:
+                        response.raise_for_status()
+                    except requests.HTTPError:
+                        response.close()
+                        raise
+                except Exception as e:
+                    image_fetch_duration.labels("error").observe(time.monotonic() - started)
+                    upstream_errors.labels("pollinations", self.agent_type, type(e).__name__).inc()
+                    raise
+                self.fetch_latency.record(time.monotonic() - started)
+                image_fetch_duration.labels("ok").observe(time.monotonic() - started)
+                return response
+        
+        def attempt() -> requests.Response:
+            hedge_after = None
+            if IMAGE_HEDGE_ENABLED:
+                p95 = self.fetch_latency.percentile(95)
+                if p95 is not None:
+                    hedge_after = max(IMAGE_HEDGE_MIN_DELAY, p95)
+            return hedged_call(request, hedge_after, discard=lambda response: response.close())
+        
+        return retry_call(attempt)
+    
+    def transcode_image(self, image_id: str, output_format: str) -> str:
+        """
+        Re-encode a stored image in another format
+        
+        Decoding and encoding run in the image process pool, so they do not
+        hold this worker's GIL; the pool reads and writes files in the store.
+        
+        Args:
+            image_id: Digest of the stored source image
+            output_format: 'png', 'jpeg' or 'webp'
+            
+        Returns:
+            Digest of the re-encoded image
+            
+        Raises:
+            ImagePoolBusy: If the image pool is saturated
+        """
+        store = get_image_store()
+        fd, output_path = tempfile.mkstemp(dir=store.root, prefix=".tmp-transcode-")
+        os.close(fd)
+        try:
+            get_image_pool().run(
+                resize_to_file, store.path_for(image_id), output_path, None,
+                output_format, IMAGE_VARIANT_QUALITY, wait=IMAGE_POOL_QUEUE_WAIT
+            )
+            digest, _, _ = store.put_file(output_path)
+        finally:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+        return digest
+    
     def enhance_prompt(self, user_prompt: str) -> str:
         """
         Enhance user prompt with cat-specific details for better image generation
         """
         try:
-            model = genai.GenerativeModel("models/gemini-2.5-flash")
+            enhancement_prompt = ENHANCE_INSTRUCTION.format(user_prompt=user_prompt)
             
-            enhancement_prompt = f"""
-            Enhance this cat image generation prompt to be more detailed and specific for Stable Diffusion.
-            
-            User prompt: "{user_prompt}"
-            
-            Add details about:
-            - Specific breed characteristics if mentioned
-            - Fur texture and patterns
-            - Eye color and expression
-            - Pose and environment
-            - Lighting and artistic style
-            
-            Keep it under 75 words. Focus on visual details. Return ONLY the enhanced prompt, nothing else.
-            """
-            
-            response = model.generate_content(enhancement_prompt)
-            enhanced = response.text.strip()
+            # Cached and coalesced per prompt, so repeats of a prompt (whose
+            # image usually comes from the cache too) skip the round-trip.
+            # Shed, over-quota or circuit-open calls fall back to the basic
+            # prompt below.
+            enhanced = self.prompt_call(
+                "enhance_prompt", enhancement_prompt,
+                self.prompt_cache_key(ENHANCE_INSTRUCTION, user_prompt)
+            ).strip()
             
             # Ensure "cat" is in the prompt for better results
             if "cat" not in enhanced.lower():
@@ -150,7 +363,70 @@ class ImageGenerationAgent:
         except Exception as e:
             print(f"Error enhancing prompt: {str(e)}")
             # Fallback to basic enhancement
-            return f"beautiful cat, {user_prompt}, highly detailed, professional photography, 4k"
+            return self.basic_prompt(user_prompt)
+    
+    def describe_reference_image(self, image_bytes: bytes, mime_type: str = "image/jpeg") -> Optional[str]:
+        """
+        Describe an uploaded reference cat as an image prompt
+        
+        Args:
+            image_bytes: Encoded reference image, already downscaled by the caller
+            mime_type: Its MIME type
+        
+        Returns:
+            A short description, or None if Gemini is unavailable
+        """
+        try:
+            # Keyed by the image's hash; prompt size counts the instruction
+            # only, not the image
+            image_hash = hashlib.sha256(image_bytes).hexdigest()
+            description = self.prompt_call(
+                "describe", [DESCRIBE_INSTRUCTION, {"mime_type": mime_type, "data": image_bytes}],
+                self.prompt_cache_key(DESCRIBE_INSTRUCTION, f"{mime_type}:{image_hash}"),
+                prompt_chars=len(DESCRIBE_INSTRUCTION)
+            ).strip()
+            return description or None
+        except Exception as e:
+            print(f"Error describing reference image: {str(e)}")
+            return None
+    
+    def prompt_cache_key(self, instruction: str, user_input: str) -> str:
+        """Cache (and single-flight) key of a prompt model call"""
+        return make_cache_key(self.agent_type, instruction, user_input, {"model": IMAGE_PROMPT_MODEL})
+    
+    def prompt_call(self, operation: str, contents: Any, key: str,
+                    prompt_chars: Optional[int] = None) -> str:
+        """
+        Call the prompt model through the response cache, single-flight,
+        retries, circuit breaker and rate limiter
+        
+        Raises:
+            UpstreamThrottled: If the call was shed or the circuit is open
+            Exception: Other Gemini errors
+        """
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            text, outcome = generate_shared(
+                self.agent_type, self.prompt_model, IMAGE_PROMPT_MODEL, contents,
+                cache_key=key if RESPONSE_CACHE_ENABLED else None,
+                flight_key=key, cache_ttl=IMAGE_CACHE_TTL, prompt_chars=prompt_chars,
+                operation=operation
+            )
+            return text
+        except Exception as e:
+            outcome = outcome_of(e)
+            raise
+        finally:
+            agent_call_duration.labels(self.agent_type, operation, outcome).observe(
+                time.perf_counter() - started
+            )
+    
+    def basic_prompt(self, user_prompt: str) -> str:
+        """
+        Local prompt enhancement used when Gemini is unavailable
+        """
+        return f"beautiful cat, {user_prompt}, highly detailed, professional photography, 4k"
     
     def get_type(self) -> str:
         return self.agent_type
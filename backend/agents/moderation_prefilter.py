@@ -0,0 +1,113 @@
+"""
+Moderation Prefilter
+Local fast path that settles clear-cut moderation cases before Gemini
+"""
+from typing import Dict, Any, Optional, Iterable, List
+import re
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.settings import (
+    MODERATION_BLOCKLIST_PATH, MODERATION_ALLOWLIST_PATH,
+    MODERATION_EXTRA_BLOCKLIST, MODERATION_PREFILTER_MAX_ALLOW_WORDS
+)
+
+# Common character substitutions used to dodge word filters
+LEET_TRANSLATION = str.maketrans({"0": "o", "1": "i", "3": "e", "4": "a", "@": "a", "$": "s"})
+
+WORD_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+# Possible confidential data; never auto-approved, always left to Gemini
+SENSITIVE_PATTERNS = re.compile(
+    r"\b(?:\d[ -]?){13,19}\b"                      # card-like digit runs
+    r"|\b\d{3}-\d{2}-\d{4}\b"                       # SSN format
+    r"|\b(?:sk|pk|rk)[-_][A-Za-z0-9]{16,}\b"        # API-key-like tokens
+    r"|\bAKIA[0-9A-Z]{16}\b"                        # AWS access key id
+    r"|\bpass(?:word|wd)?\s*[:=]",                  # "password: ..."
+    re.IGNORECASE
+)
+
+
+def load_word_list(path: str) -> List[str]:
+    """
+    Read a word list file (one entry per line, # for comments)
+    """
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [line.strip().lower() for line in f
+                if line.strip() and not line.lstrip().startswith("#")]
+
+
+class ModerationPrefilter:
+    """
+    Decides obvious moderation cases locally in microseconds
+
+    - Text containing a blocklisted term is rejected.
+    - Short text made only of allowlisted words (plus numbers, punctuation
+      and emoji) is approved.
+    - Everything else, including text that looks like it contains
+      confidential data or is shouted in capitals, is left to Gemini.
+    """
+
+    def __init__(self, blocklist: Optional[Iterable[str]] = None,
+                 allowlist: Optional[Iterable[str]] = None,
+                 max_allow_words: int = MODERATION_PREFILTER_MAX_ALLOW_WORDS):
+        if blocklist is None:
+            blocklist = load_word_list(MODERATION_BLOCKLIST_PATH) + MODERATION_EXTRA_BLOCKLIST
+        if allowlist is None:
+            allowlist = load_word_list(MODERATION_ALLOWLIST_PATH)
+
+        terms = sorted({term.strip().lower() for term in blocklist if term.strip()},
+                       key=len, reverse=True)
+        # One alternation for all terms; phrases match any run of whitespace
+        self.block_pattern = re.compile(
+            r"\b(?:" + "|".join(r"\s+".join(map(re.escape, term.split())) for term in terms) + r")\b"
+        ) if terms else None
+        self.allowlist = frozenset(word.strip().lower() for word in allowlist if word.strip())
+        self.max_allow_words = max_allow_words
+
+    def check(self, text: str) -> Optional[Dict[str, Any]]:
+        """
+        Try to moderate text locally
+
+        Args:
+            text: Text to evaluate
+
+        Returns:
+            A verdict in the moderator's JSON format, or None if the text is
+            ambiguous and needs Gemini
+        """
+        normalized = text.lower().translate(LEET_TRANSLATION)
+
+        if self.block_pattern is not None:
+            match = self.block_pattern.search(normalized)
+            if match:
+                return {
+                    "appropriate": False,
+                    "reason": f"Contains blocked language: \"{match.group(0)}\"",
+                    "severity": "high",
+                    "suggestions": "Remove offensive or threatening language."
+                }
+
+        if SENSITIVE_PATTERNS.search(text):
+            return None
+
+        words = WORD_PATTERN.findall(text.lower())
+        if not words or len(words) > self.max_allow_words:
+            return None
+
+        letters = [c for c in text if c.isalpha()]
+        if len(words) >= 4 and sum(c.isupper() for c in letters) > 0.7 * len(letters):
+            return None
+
+        if all(word in self.allowlist for word in words):
+            return {
+                "appropriate": True,
+                "reason": "Everyday workplace language",
+                "severity": "none",
+                "suggestions": ""
+            }
+
+        return None
@@ -2,9 +2,29 @@
 Multi-Agent Orchestrator
 Coordinates multiple AI agents working together
 """
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import threading
+import time
+import sys
+import os
 from .content_moderator_agent import ContentModeratorAgent
 from .cat_translator_agent import CatTranslatorAgent
+from .simple_agent import gemini_requests_sent
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.settings import (
+    PIPELINE_MODE, PIPELINE_MODES, PIPELINE_MODE_OVERRIDE,
+    PIPELINE_MAX_WORKERS, STREAM_MAX_WORKERS, GEMINI_TIMEOUT,
+    BATCH_PACK_SIZE, BATCH_PACK_MAX_TOKENS, BATCH_MAX_CONCURRENCY
+)
+from services.resilience import submit_in_context, remaining_budget
+from services.rate_limiter import UpstreamThrottled
+from services.metrics import pipeline_duration
+from services import tracing
+
+BLOCKED_OUTPUT = "Hiss! 😾 (Message blocked by content moderation)"
 
 class MultiAgentOrchestrator:
     """
@@ -13,53 +33,476 @@ class MultiAgentOrchestrator:
     Pipeline:
     1. Content Moderator checks if text is workplace appropriate
     2. If appropriate, Cat Translator converts to cat language
+    
+    In "concurrent" mode both agents start at the same time and the
+    translation is discarded if moderation rejects the text. In "sequential"
+    mode the translator only runs once moderation has approved the text.
     """
     
     def __init__(self):
         self.moderator = ContentModeratorAgent()
         self.cat_translator = CatTranslatorAgent()
         
-    def process_pipeline(self, input_text: str, skip_moderation: bool = False) -> Dict[str, Any]:
+        # Shared worker pool for running agents side by side
+        self.executor = ThreadPoolExecutor(
+            max_workers=PIPELINE_MAX_WORKERS,
+            thread_name_prefix="pipeline"
+        )
+        # Streamed translations live as long as their Gemini stream, so they
+        # get their own pool rather than holding pipeline workers
+        self.stream_executor = ThreadPoolExecutor(
+            max_workers=STREAM_MAX_WORKERS,
+            thread_name_prefix="stream"
+        )
+        # Separate pool so bulk jobs cannot starve interactive requests
+        self.batch_executor = ThreadPoolExecutor(
+            max_workers=BATCH_MAX_CONCURRENCY,
+            thread_name_prefix="batch"
+        )
+        
+    @staticmethod
+    def resolve_mode(requested: Any) -> str:
+        """
+        Pipeline mode to run a request in
+        
+        A request may always ask for sequential mode, but only switches a
+        sequential deployment to concurrent when PIPELINE_MODE_OVERRIDE is
+        set, since concurrent mode spends tokens on translations moderation
+        may reject.
+        
+        Args:
+            requested: The request's pipeline_mode, or None for PIPELINE_MODE
+            
+        Returns:
+            'concurrent' or 'sequential'
+            
+        Raises:
+            ValueError: If requested is not a known mode
+        """
+        if requested is None:
+            return PIPELINE_MODE
+        if not isinstance(requested, str) or requested.lower() not in PIPELINE_MODES:
+            raise ValueError(f"'pipeline_mode' must be one of: {', '.join(PIPELINE_MODES)}")
+        mode = requested.lower()
+        if mode == "concurrent" and PIPELINE_MODE == "sequential" and not PIPELINE_MODE_OVERRIDE:
+            return PIPELINE_MODE
+        return mode
+    
+    def process_pipeline(self, input_text: str, skip_moderation: bool = False,
+                         mode: Optional[str] = None) -> Dict[str, Any]:
         """
         Process text through the multi-agent pipeline
         
         Args:
             input_text: Text to process
             skip_moderation: If True, skip moderation and translate directly
+            mode: 'concurrent' or 'sequential' (see resolve_mode)
             
         Returns:
             Dictionary with results from all agents
+            
+        Raises:
+            ValueError: If mode is not a known mode
+        """
+        mode = self.resolve_mode(mode)
+        results = {
+            "input": input_text,
+            "pipeline": []
+        }
+        pipeline_span, span_token = tracing.start_span(
+            "text_to_cat", mode="skip_moderation" if skip_moderation else mode
+        )
+        try:
+            if skip_moderation:
+                translation_result, translation_span = self.run_agent(self.cat_translator, input_text)
+            else:
+                translation_future = None
+                if mode == "concurrent":
+                    # Start translating while the moderator is still deciding
+                    translation_future = submit_in_context(
+                        self.executor, self.run_agent, self.cat_translator, input_text
+                    )
+                
+                # Step 1: Content Moderation
+                try:
+                    moderation_result, moderation_span = self.run_agent(self.moderator, input_text)
+                except BaseException:
+                    # No verdict (e.g. moderation was shed): do not start the
+                    # speculative translation if it is still queued
+                    if translation_future is not None:
+                        translation_future.cancel()
+                    raise
+                results["pipeline"].append({
+                    "step": 1,
+                    "agent": "ContentModeratorAgent",
+                    "result": moderation_result,
+                    **self.step_timing(moderation_span)
+                })
+                results["moderation"] = moderation_result
+                
+                if not self.is_approved(moderation_result):
+                    # Drop the translation: cancel it if it has not started yet,
+                    # otherwise let it finish in the background and ignore it
+                    if translation_future is not None:
+                        translation_future.cancel()
+                    results["final_output"] = BLOCKED_OUTPUT
+                    results["status"] = "blocked"
+                    return results
+                
+                if translation_future is not None:
+                    translation_result, translation_span = translation_future.result()
+                else:
+                    translation_result, translation_span = self.run_agent(self.cat_translator, input_text)
+            
+            # Step 2: Cat Translation
+            results["pipeline"].append({
+                "step": 2 if not skip_moderation else 1,
+                "agent": "CatTranslatorAgent",
+                "result": translation_result,
+                **self.step_timing(translation_span)
+            })
+            
+            results["final_output"] = translation_result["cat_translation"]
+            results["status"] = "completed"
+            
+            return results
+        finally:
+            pipeline_span.status = results.get("status", "error")
+            tracing.end_span(pipeline_span, span_token)
+            pipeline_duration.labels(
+                "text_to_cat", "skip_moderation" if skip_moderation else mode,
+                pipeline_span.status
+            ).observe(pipeline_span.duration)
+    
+    def run_agent(self, agent, input_text: str) -> Tuple[Dict[str, Any], tracing.Span]:
         """
+        Run an agent's process() in a trace span named after the agent
+        
+        Returns:
+            Tuple of (agent result, its finished span)
+        """
+        with tracing.span(agent.agent_type) as agent_span:
+            result = agent.process(input_text)
+            agent_span.cache_hit = result.get("cache_hit")
+            agent_span.status = result.get("status", "ok")
+        return result, agent_span
+    
+    @staticmethod
+    def step_timing(agent_span: tracing.Span) -> Dict[str, Any]:
+        """Timing fields added to a pipeline entry"""
+        upstream = min(agent_span.upstream, agent_span.duration)
+        return {
+            "span_id": agent_span.span_id,
+            "duration_ms": agent_span.duration_ms(),
+            "upstream_ms": round(upstream * 1000, 1),
+            "retries": agent_span.retries
+        }
+    
+    def process_pipeline_stream(self, input_text: str, skip_moderation: bool = False,
+                                mode: Optional[str] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Streaming variant of process_pipeline
+        
+        Yields the moderation verdict first, then the translation in pieces
+        as Gemini generates them, then the same result dictionary that
+        process_pipeline returns. In concurrent mode the translation starts
+        alongside moderation and its pieces are held back until the verdict
+        is in. Closing the generator stops the translation, and so does
+        running out of the request's deadline (the whole stream is bounded
+        by it, not just the wait for each piece).
+        
+        Args:
+            input_text: Text to process
+            skip_moderation: If True, skip moderation and translate directly
+            mode: 'concurrent' or 'sequential' (see resolve_mode)
+            
+        Yields:
+            (event, data) tuples: ('moderation', result),
+            ('translation', {'text': piece}), ('error', {'error': message})
+            and finally ('done', results)
+        """
+        mode = self.resolve_mode(mode)
         results = {
             "input": input_text,
             "pipeline": []
         }
+        pieces_queue = queue.Queue()
+        cancelled = threading.Event()
+        producer = None
+        translation_spans = []
+        started = time.perf_counter()
         
-        # Step 1: Content Moderation
-        if not skip_moderation:
-            moderation_result = self.moderator.process(input_text)
+        def produce():
+            with tracing.span(self.cat_translator.agent_type) as translation_span:
+                translation_spans.append(translation_span)
+                stream = self.cat_translator.process_stream(input_text)
+                try:
+                    for piece in stream:
+                        if cancelled.is_set():
+                            return
+                        budget = remaining_budget()
+                        if budget is not None and budget <= 0:
+                            translation_span.status = "timeout"
+                            return
+                        pieces_queue.put(("piece", piece))
+                    translation_span.cache_hit = self.cat_translator.last_call_cached()
+                    outcome = ("end", translation_span.cache_hit)
+                except Exception as e:
+                    translation_span.status = "error"
+                    outcome = ("error", f"Error calling Gemini API: {str(e)}")
+                finally:
+                    stream.close()
+            # Sent once the span is closed, so its timing is final
+            pieces_queue.put(outcome)
+        
+        try:
+            if not skip_moderation:
+                if mode == "concurrent":
+                    producer = submit_in_context(self.stream_executor, produce)
+                
+                # Step 1: Content Moderation
+                moderation_result, moderation_span = self.run_agent(self.moderator, input_text)
+                results["pipeline"].append({
+                    "step": 1,
+                    "agent": "ContentModeratorAgent",
+                    "result": moderation_result,
+                    **self.step_timing(moderation_span)
+                })
+                results["moderation"] = moderation_result
+                yield "moderation", moderation_result
+                
+                if not self.is_approved(moderation_result):
+                    cancelled.set()
+                    results["final_output"] = BLOCKED_OUTPUT
+                    results["status"] = "blocked"
+                    yield "done", results
+                    return
+            
+            # Step 2: Cat Translation
+            if producer is None:
+                producer = submit_in_context(self.stream_executor, produce)
+            
+            pieces = []
+            cache_hit = False
+            status = "translated"
+            while True:
+                # Each wait is cut to what is left of the request's deadline
+                budget = remaining_budget()
+                wait = GEMINI_TIMEOUT if budget is None else min(GEMINI_TIMEOUT, budget)
+                try:
+                    if wait <= 0:
+                        raise queue.Empty
+                    kind, value = pieces_queue.get(timeout=wait)
+                except queue.Empty:
+                    if budget is not None and budget <= GEMINI_TIMEOUT:
+                        kind, value = "error", "Translation stopped: request deadline exceeded"
+                    else:
+                        kind, value = "error", f"Translation timed out after {GEMINI_TIMEOUT}s"
+                if kind == "piece":
+                    pieces.append(value)
+                    yield "translation", {"text": value}
+                    continue
+                if kind == "error":
+                    status = "error"
+                    yield "error", {"error": value}
+                else:
+                    cache_hit = value
+                break
+            
+            translation_result = {
+                "agent": self.cat_translator.agent_type,
+                "original_text": input_text,
+                "cat_translation": "".join(pieces),
+                "status": status,
+                "cache_hit": cache_hit
+            }
             results["pipeline"].append({
-                "step": 1,
-                "agent": "ContentModeratorAgent",
-                "result": moderation_result
+                "step": 2 if not skip_moderation else 1,
+                "agent": "CatTranslatorAgent",
+                "result": translation_result,
+                **(self.step_timing(translation_spans[0]) if translation_spans else {})
             })
+            results["final_output"] = translation_result["cat_translation"]
+            results["status"] = "completed" if status == "translated" else "error"
+            yield "done", results
+        finally:
+            # Also reached when the consumer closes us early (client gone)
+            cancelled.set()
+            pipeline_duration.labels(
+                "text_to_cat_stream", "skip_moderation" if skip_moderation else mode,
+                results.get("status", "cancelled")
+            ).observe(time.perf_counter() - started)
+    
+    def process_batch(self, texts: List[str], skip_moderation: bool = False,
+                      pack_size: Optional[int] = None,
+                      max_tokens: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Moderate and translate many texts with packed Gemini requests
+        
+        Texts are grouped into packs, and each pack is moderated and then
+        translated with one Gemini call per agent. Up to BATCH_MAX_CONCURRENCY
+        packs run at once. Items the model leaves out or garbles are retried
+        on their own with the single-item agents.
+        
+        Args:
+            texts: Texts to process
+            skip_moderation: If True, skip moderation and translate directly
+            pack_size: Maximum items per pack (defaults to BATCH_PACK_SIZE)
+            max_tokens: Estimated input token budget per pack
+                        (defaults to BATCH_PACK_MAX_TOKENS)
             
-            # Check if we should proceed (in a real system, parse the JSON response)
-            # For now, we'll proceed regardless for demonstration
-            results["moderation"] = moderation_result
-        
-        # Step 2: Cat Translation
-        translation_result = self.cat_translator.process(input_text)
-        results["pipeline"].append({
-            "step": 2 if not skip_moderation else 1,
-            "agent": "CatTranslatorAgent",
-            "result": translation_result
-        })
-        
-        results["final_output"] = translation_result["cat_translation"]
-        results["status"] = "completed"
-        
-        return results
+        Returns:
+            Dictionary with one result per input (in order) and call counts
+        """
+        started = time.perf_counter()
+        packs = self.pack_texts(
+            texts, pack_size or BATCH_PACK_SIZE, max_tokens or BATCH_PACK_MAX_TOKENS
+        )
+        results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+        llm_calls = 0
+        retried = 0
+        failed = 0
+        
+        # Each pack runs in this request's context, so its Gemini calls keep
+        # the request deadline and are traced under the request's span
+        futures = [
+            submit_in_context(self.batch_executor, self._process_pack, texts, pack, skip_moderation)
+            for pack in packs
+        ]
+        for future in futures:
+            items, calls, retries = future.result()
+            for item in items:
+                results[item["index"]] = item
+                failed += item["status"] == "error"
+            llm_calls += calls
+            retried += retries
+        
+        status = "partial" if failed else "completed"
+        pipeline_duration.labels(
+            "batch", "skip_moderation" if skip_moderation else "packed", status
+        ).observe(time.perf_counter() - started)
+        return {
+            "results": results,
+            "count": len(texts),
+            "packs": len(packs),
+            "llm_calls": llm_calls,
+            "retried_items": retried,
+            "failed_items": failed,
+            "status": status
+        }
+    
+    def _process_pack(self, texts: List[str], pack: List[int],
+                      skip_moderation: bool) -> Tuple[List[Dict[str, Any]], int, int]:
+        """
+        Moderate and translate one pack of texts
+        
+        A shed Gemini call (UpstreamThrottled) only fails the items it was
+        for: they get status 'error' and the rest of the batch carries on.
+        Translation falls back to the local engine first where allowed.
+        
+        Returns:
+            Tuple of (per-item results, Gemini requests sent, items retried);
+            cache hits, prefilter and local answers and shed calls are not
+            requests sent
+        """
+        sent_before = gemini_requests_sent()
+        retries = 0
+        pack_texts = [texts[i] for i in pack]
+        items = [{"index": i, "input": texts[i]} for i in pack]
+        
+        if not skip_moderation:
+            try:
+                verdicts = self.moderator.moderate_batch(pack_texts)
+            except UpstreamThrottled as e:
+                self._fail_items(items, f"Moderation unavailable: {str(e)}")
+                return items, gemini_requests_sent() - sent_before, retries
+            for item, verdict in zip(items, verdicts):
+                if verdict is None:
+                    retries += 1
+                    try:
+                        verdict = self.moderator.process(item["input"])
+                    except UpstreamThrottled as e:
+                        self._fail_items([item], f"Moderation unavailable: {str(e)}")
+                        continue
+                item["moderation"] = verdict
+        
+        approved = []
+        for item in items:
+            if "status" in item:
+                continue
+            if skip_moderation or self.is_approved(item["moderation"]):
+                approved.append(item)
+            else:
+                item["final_output"] = BLOCKED_OUTPUT
+                item["status"] = "blocked"
+        
+        if approved:
+            try:
+                translations = self.cat_translator.translate_batch([item["input"] for item in approved])
+            except UpstreamThrottled as e:
+                self._fail_items(approved, f"Translation unavailable: {str(e)}")
+                return items, gemini_requests_sent() - sent_before, retries
+            for item, translation in zip(approved, translations):
+                if translation is None:
+                    retries += 1
+                    try:
+                        translation = self.cat_translator.process(item["input"])["cat_translation"]
+                    except UpstreamThrottled as e:
+                        self._fail_items([item], f"Translation unavailable: {str(e)}")
+                        continue
+                item["final_output"] = translation
+                item["status"] = "completed"
+        
+        return items, gemini_requests_sent() - sent_before, retries
+    
+    @staticmethod
+    def _fail_items(items: List[Dict[str, Any]], error: str) -> None:
+        for item in items:
+            item["final_output"] = None
+            item["error"] = error
+            item["status"] = "error"
+    
+    @staticmethod
+    def pack_texts(texts: List[str], pack_size: int, max_tokens: int) -> List[List[int]]:
+        """
+        Greedily group text indices into packs
+        
+        A pack closes when adding the next text would exceed pack_size items
+        or the token budget (estimated at ~4 characters per token). A single
+        text over the budget gets a pack of its own.
+        
+        Returns:
+            List of packs, each a list of indices into texts
+        """
+        packs: List[List[int]] = []
+        current: List[int] = []
+        current_tokens = 0
+        for index, text in enumerate(texts):
+            tokens = len(text) // 4 + 1
+            if current and (len(current) >= pack_size or current_tokens + tokens > max_tokens):
+                packs.append(current)
+                current, current_tokens = [], 0
+            current.append(index)
+            current_tokens += tokens
+        if current:
+            packs.append(current)
+        return packs
+    
+    @staticmethod
+    def is_approved(moderation_result: Dict[str, Any]) -> bool:
+        """
+        Read the verdict out of a moderation result
+        
+        Args:
+            moderation_result: Result returned by ContentModeratorAgent
+            
+        Returns:
+            The typed 'appropriate' verdict. Results without one are treated
+            as approved; the moderator already applies MODERATION_FAIL_OPEN
+            when Gemini gives no usable verdict.
+        """
+        verdict = moderation_result.get("appropriate")
+        return True if verdict is None else bool(verdict)
     
     def process_single_agent(self, input_text: str, agent_type: str) -> Dict[str, Any]:
         """
@@ -99,6 +542,6 @@ class MultiAgentOrchestrator:
                     "description": "Converts text to cat language (meows)"
                 }
             ],
-            "pipeline_mode": "Sequential processing through both agents",
+            "pipeline_mode": f"Moderation and translation ({PIPELINE_MODE})",
             "single_mode": "Process with individual agents"
         }
@@ -2,20 +2,160 @@
 Base Agent Class - Foundation for all specialized agents
 Uses Google Gemini API
 """
-import google.generativeai as genai
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Iterator, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import json
+import queue
+import re
+import threading
+import time
 import sys
 import os
 
 # Add parent directory to path to import config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config.settings import GEMINI_API_KEY, GEMINI_MODEL
+from config.settings import (
+    GEMINI_MODEL,
+    RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_DEFAULT_TTL,
+    RESPONSE_CACHE_MAX_TEMPERATURE, RESPONSE_CACHE_ALLOW_HIGH_TEMPERATURE,
+    SINGLE_FLIGHT_ENABLED, SINGLE_FLIGHT_GEMINI_TIMEOUT, GEMINI_TIMEOUT, STREAM_MAX_WORKERS
+)
+from services.response_cache import get_response_cache, make_cache_key
+from services.gemini_registry import get_gemini_registry
+from services.single_flight import get_single_flight
+from services.rate_limiter import get_gemini_limiter, UpstreamThrottled
+from google.api_core import exceptions as google_exceptions
+from services.resilience import (
+    get_circuit_breaker, retry_call, call_timeout, last_retry_count, submit_in_context,
+    DeadlineExceeded
+)
+from services import tracing
+from services.metrics import (
+    agent_call_duration, record_gemini_response, track_gemini_request, outcome_of
+)
+
+
+# Gemini requests each thread has actually sent (admitted by the limiter)
+_requests_sent = threading.local()
+
+
+def gemini_requests_sent() -> int:
+    """
+    Number of Gemini requests the current thread has sent so far
+
+    Cache hits, coalesced calls and calls shed before reaching Gemini are
+    not counted; each retry is. Callers diff it around a piece of work to
+    report how many requests that work really made.
+    """
+    return getattr(_requests_sent, "count", 0)
+
+
+def is_shared_error(error: BaseException) -> bool:
+    """
+    True if a coalesced call's error is also the answer for its waiters
+
+    Running out of time is not: it depends on the leader's own deadline,
+    which a client can cut short with X-Request-Timeout, so waiters with
+    time left retry instead.
+    """
+    return not isinstance(error, (DeadlineExceeded, google_exceptions.DeadlineExceeded))
+
+
+def generate_shared(agent_type: str, model: Any, model_name: str, contents: Any,
+                    cache_key: Optional[str], flight_key: Optional[str], cache_ttl: float,
+                    generation_config: Optional[Dict[str, Any]] = None,
+                    prompt_chars: Optional[int] = None,
+                    operation: str = "generate") -> Tuple[str, str]:
+    """
+    One Gemini call through the shared layers: response cache, then
+    single-flight, then retries, then the circuit breaker and rate limiter
+
+    Cache hits and coalescing are recorded on the current trace span.
+
+    Args:
+        agent_type: Agent making the call (limiter, metrics and tracing label)
+        model: Model handle from the registry
+        model_name: Its model name
+        contents: Prompt text, or a list of parts (e.g. text plus an image)
+        cache_key: Response cache key, or None if the call must not be cached
+        flight_key: Key identical in-flight calls share, or None to not coalesce
+        cache_ttl: Seconds a cached response stays valid
+        generation_config: Generation config for the call (None = the model's)
+        prompt_chars: Prompt size for metrics (default: len(contents))
+        operation: Kind of call for the limiter's latency baseline (e.g.
+                   'batch' for long multi-item answers)
+
+    Returns:
+        Tuple of (response text, outcome): outcome is "cache_hit",
+        "coalesced" (shared another caller's request) or "ok"
+
+    Raises:
+        UpstreamThrottled: If the call was shed, over quota, out of time or
+                           the circuit is open
+        Exception: Other Gemini errors, after retries
+    """
+    if cache_key is not None:
+        cached = get_response_cache().get(cache_key)
+        if cached is not None:
+            tracing.annotate(cache_hit=True)
+            return cached, "cache_hit"
+    tracing.annotate(cache_hit=False)
+    if prompt_chars is None:
+        prompt_chars = len(contents)
+
+    def attempt() -> str:
+        with get_circuit_breaker("gemini").guard():
+            with get_gemini_limiter().slot(model_name, agent_type, operation):
+                _requests_sent.count = gemini_requests_sent() + 1
+                with track_gemini_request(agent_type, model_name, prompt_chars):
+                    response = model.generate_content(
+                        contents,
+                        generation_config=generation_config,
+                        request_options=BaseAgent.request_options()
+                    )
+                    text = response.text
+                record_gemini_response(agent_type, model_name, response, text)
+                return text
+
+    def generate() -> str:
+        # Transient errors (timeouts, 5xx) are retried with backoff while the
+        # request's deadline allows it
+        try:
+            text = retry_call(attempt)
+        finally:
+            tracing.record_retries(last_retry_count())
+        if cache_key is not None:
+            get_response_cache().set(cache_key, text, cache_ttl)
+        return text
+
+    if not SINGLE_FLIGHT_ENABLED or flight_key is None:
+        return generate(), "ok"
+
+    # Identical calls already in flight share one Gemini request
+    flight_started = time.perf_counter()
+    text, shared = get_single_flight("gemini").do(
+        flight_key, generate, timeout=call_timeout(SINGLE_FLIGHT_GEMINI_TIMEOUT),
+        share_error=is_shared_error
+    )
+    if shared:
+        # Waited on another caller's Gemini request
+        tracing.record_upstream(time.perf_counter() - flight_started)
+        tracing.annotate(coalesced=True)
+    return text, "coalesced" if shared else "ok"
+
+
+# Threads reading streamed Gemini answers for stream_gemini
+_stream_readers = ThreadPoolExecutor(max_workers=STREAM_MAX_WORKERS, thread_name_prefix="gemini-stream")
+
 
 class BaseAgent:
     """
     Base class for all AI agents using Google Gemini API
     """
     
+    # Seconds a cached response stays valid (subclasses override)
+    cache_ttl = RESPONSE_CACHE_DEFAULT_TTL
+    
     def __init__(self, system_prompt: str, agent_type: str):
         """
         Initialize the base agent with Google Gemini
@@ -27,12 +167,9 @@ class BaseAgent:
         self.agent_type = agent_type
         self.system_prompt = system_prompt
         
-        # Configure Google Gemini API with global API key
-        genai.configure(api_key=GEMINI_API_KEY)
-        
-        # Initialize Gemini model
-        self.model = genai.GenerativeModel(
-            model_name=GEMINI_MODEL,
+        # Shared model handle from the process-wide registry
+        self.model = get_gemini_registry().get_model(
+            GEMINI_MODEL,
             generation_config={
                 "temperature": 0.7,
                 "top_p": 0.95,
@@ -44,39 +181,280 @@ class BaseAgent:
         # Default temperature (can be overridden per call)
         self.temperature = 0.7
         
-    def call_gemini(self, user_message: str, **kwargs) -> str:
+        # Agents are shared between request threads, so per-call state
+        # (e.g. whether the last call was a cache hit) is kept per thread
+        self._call_state = threading.local()
+        
+    def call_gemini(self, user_message: str, operation: str = "generate", **kwargs) -> str:
         """
         Make an API call to Google Gemini
         
         Args:
             user_message: The user's input message
+            operation: Kind of call for the rate limiter ('batch' for packed
+                       multi-item requests, whose answers take far longer)
             **kwargs: Additional parameters for the API call
             
         Returns:
-            The model's response text
+            The model's response text (or an error message; see last_call_failed)
+            
+        Raises:
+            UpstreamThrottled: If the call was shed by the rate limiter,
+                               Gemini reported a quota error, the request's
+                               deadline ran out or the circuit is open
         """
+        self._call_state.cache_hit = False
+        self._call_state.failed = False
+        self._call_state.coalesced = False
+        started = time.perf_counter()
+        outcome = "error"
+        call_span, span_token = tracing.start_span("call_gemini", agent=self.agent_type)
         try:
             # Combine system prompt with user message
             full_prompt = f"{self.system_prompt}\n\nUser Input: {user_message}"
+            generation_config = self.build_generation_config(**kwargs)
             
-            # Override temperature if provided
-            temperature = kwargs.get("temperature", self.temperature)
+            cache_key = self.response_cache_key(user_message, generation_config)
+            # High-temperature calls are not coalesced: each caller wants its
+            # own sample
+            flight_key = None
+            if self.is_shareable(generation_config["temperature"]):
+                flight_key = cache_key or make_cache_key(
+                    self.agent_type, self.system_prompt, user_message, generation_config
+                )
+            text, outcome = generate_shared(
+                self.agent_type, self.model, GEMINI_MODEL, full_prompt,
+                cache_key=cache_key, flight_key=flight_key, cache_ttl=self.cache_ttl,
+                generation_config=generation_config, operation=operation
+            )
+            self._call_state.cache_hit = outcome == "cache_hit"
+            self._call_state.coalesced = outcome == "coalesced"
+            return text
             
-            # Generate response
-            response = self.model.generate_content(
-                full_prompt,
-                generation_config={
-                    "temperature": temperature,
-                    "top_p": kwargs.get("top_p", 0.95),
-                    "top_k": kwargs.get("top_k", 40),
-                    "max_output_tokens": kwargs.get("max_output_tokens", 2048),
-                }
+        except UpstreamThrottled:
+            # Shed, over quota, out of time or circuit open: let the caller
+            # fall back or the route answer 429/503/504 instead of returning
+            # the error text as if it were the model's answer
+            self._call_state.failed = True
+            call_span.status = "throttled"
+            outcome = "throttled"
+            raise
+        except Exception as e:
+            self._call_state.failed = True
+            call_span.status = "error"
+            return f"Error calling Gemini API: {str(e)}"
+        finally:
+            tracing.end_span(call_span, span_token)
+            agent_call_duration.labels(self.agent_type, "call", outcome).observe(
+                time.perf_counter() - started
             )
+    
+    def stream_gemini(self, user_message: str, **kwargs) -> Iterator[str]:
+        """
+        Stream a Gemini response chunk by chunk
+        
+        Takes the same arguments as call_gemini. A cached response is yielded
+        as a single chunk. Closing the generator early (e.g. when the client
+        disconnects) stops reading from Gemini and skips caching.
+        
+        Args:
+            user_message: The user's input message
+            **kwargs: Additional parameters for the API call
             
-            return response.text
+        Yields:
+            Pieces of the model's response text
             
+        Raises:
+            UpstreamThrottled: If the call was shed by the rate limiter
+            Exception: Gemini errors are raised rather than returned as text,
+                       since part of the answer may already have been sent
+        """
+        self._call_state.cache_hit = False
+        full_prompt = f"{self.system_prompt}\n\nUser Input: {user_message}"
+        generation_config = self.build_generation_config(**kwargs)
+        
+        cache_key = self.response_cache_key(user_message, generation_config)
+        if cache_key is not None:
+            cached = get_response_cache().get(cache_key)
+            if cached is not None:
+                self._call_state.cache_hit = True
+                tracing.annotate(cache_hit=True)
+                agent_call_duration.labels(self.agent_type, "stream", "cache_hit").observe(0.0)
+                yield cached
+                return
+        
+        # Gemini is read on its own thread, so the limiter slot is held for
+        # the upstream request only, not for as long as the caller takes to
+        # consume the answer
+        chunks = queue.Queue()
+        closed = threading.Event()
+        
+        def read_upstream():
+            pieces = []
+            try:
+                # Not retried: part of the answer may already be on its way
+                with get_circuit_breaker("gemini").guard():
+                    with get_gemini_limiter().slot(GEMINI_MODEL, self.agent_type, "stream"):
+                        with track_gemini_request(self.agent_type, GEMINI_MODEL, len(full_prompt)):
+                            response = self.model.generate_content(
+                                full_prompt,
+                                generation_config=generation_config,
+                                stream=True,
+                                request_options=self.request_options()
+                            )
+                            chunk = None
+                            for chunk in response:
+                                if closed.is_set():
+                                    # Counted like a closed generator:
+                                    # cancelled, no verdict on Gemini
+                                    raise GeneratorExit
+                                text = chunk.text
+                                if text:
+                                    pieces.append(text)
+                                    chunks.put(("piece", text))
+                        # The last chunk carries the usage of the whole answer
+                        record_gemini_response(self.agent_type, GEMINI_MODEL, chunk, "".join(pieces))
+            except GeneratorExit:
+                return
+            except Exception as e:
+                chunks.put(("error", e))
+                return
+            if cache_key is not None:
+                get_response_cache().set(cache_key, "".join(pieces), self.cache_ttl)
+            chunks.put(("end", None))
+        
+        started = time.perf_counter()
+        outcome = "cancelled"
+        try:
+            submit_in_context(_stream_readers, read_upstream)
+            while True:
+                kind, value = chunks.get()
+                if kind == "piece":
+                    yield value
+                elif kind == "error":
+                    raise value
+                else:
+                    break
+            outcome = "ok"
         except Exception as e:
-            return f"Error calling Gemini API: {str(e)}"
+            outcome = outcome_of(e)
+            raise
+        finally:
+            # Closing early (e.g. the client went away) stops the reader and
+            # skips caching
+            closed.set()
+            agent_call_duration.labels(self.agent_type, "stream", outcome).observe(
+                time.perf_counter() - started
+            )
+    
+    @staticmethod
+    def request_options() -> Dict[str, Any]:
+        """
+        Per-call SDK options: a timeout cut to the request's remaining
+        budget, and no SDK-level retries (retry_call owns retries)
+        """
+        return {"timeout": call_timeout(GEMINI_TIMEOUT), "retry": None}
+    
+    def build_generation_config(self, **kwargs) -> Dict[str, Any]:
+        """
+        Effective generation config for a call (per-call overrides applied)
+        """
+        config = {
+            "temperature": kwargs.get("temperature", self.temperature),
+            "top_p": kwargs.get("top_p", 0.95),
+            "top_k": kwargs.get("top_k", 40),
+            "max_output_tokens": kwargs.get("max_output_tokens", 2048),
+        }
+        # Structured output (JSON mode) when an agent asks for it
+        for key in ("response_mime_type", "response_schema"):
+            if kwargs.get(key) is not None:
+                config[key] = kwargs[key]
+        return config
+    
+    def response_cache_key(self, user_message: str, generation_config: Dict[str, Any]) -> Optional[str]:
+        """
+        Cache key for a call, or None if the call must not be cached
+        """
+        if not self.is_cacheable(generation_config["temperature"]):
+            return None
+        return make_cache_key(self.agent_type, self.system_prompt, user_message, generation_config)
+    
+    @staticmethod
+    def parse_json_response(text: str) -> Any:
+        """
+        Parse JSON from a model response, tolerating markdown code fences
+        
+        Returns:
+            The parsed value, or None if the text is not valid JSON
+        """
+        cleaned = text.strip()
+        fenced = re.match(r"^```(?:json)?\s*(.*?)\s*```$", cleaned, re.DOTALL)
+        if fenced:
+            cleaned = fenced.group(1)
+        try:
+            return json.loads(cleaned)
+        except ValueError:
+            return None
+    
+    def match_batch_items(self, response_text: str, count: int,
+                          field: Optional[str] = None) -> List[Optional[Any]]:
+        """
+        Split a packed response (a JSON array of {"id": ...} objects) back
+        into per-item results
+        
+        Args:
+            response_text: Raw model response
+            count: Number of items that were sent (ids 0..count-1)
+            field: Field to extract from each object (None = whole object)
+            
+        Returns:
+            One entry per input in order; None where the item is missing or
+            malformed so the caller can retry it on its own
+        """
+        matched: List[Optional[Any]] = [None] * count
+        parsed = self.parse_json_response(response_text)
+        if not isinstance(parsed, list):
+            return matched
+        for item in parsed:
+            if not isinstance(item, dict) or not isinstance(item.get("id"), int):
+                continue
+            if not 0 <= item["id"] < count:
+                continue
+            value = item if field is None else item.get(field)
+            if value is not None:
+                matched[item["id"]] = value
+        return matched
+    
+    def is_cacheable(self, temperature: float) -> bool:
+        """
+        Decide whether a call at this temperature may use the response cache
+        
+        High-temperature agents (e.g. the cat translator) are meant to vary
+        their output, so they are only cached when explicitly allowed.
+        """
+        if not RESPONSE_CACHE_ENABLED or self.cache_ttl <= 0:
+            return False
+        return self.is_shareable(temperature)
+    
+    @staticmethod
+    def is_shareable(temperature: float) -> bool:
+        """
+        Decide whether callers may share one answer at this temperature,
+        from the cache or by coalescing onto the same in-flight call
+        """
+        return temperature <= RESPONSE_CACHE_MAX_TEMPERATURE or RESPONSE_CACHE_ALLOW_HIGH_TEMPERATURE
+    
+    def last_call_cached(self) -> bool:
+        """Return True if this thread's last call_gemini was a cache hit"""
+        return getattr(self._call_state, "cache_hit", False)
+    
+    def last_call_coalesced(self) -> bool:
+        """Return True if this thread's last call_gemini shared another caller's request"""
+        return getattr(self._call_state, "coalesced", False)
+    
+    def last_call_failed(self) -> bool:
+        """Return True if this thread's last call_gemini returned an error"""
+        return getattr(self._call_state, "failed", False)
     
     def process(self, input_text: str) -> Dict[str, Any]:
         """
@@ -2,55 +2,133 @@
 Video Generation Agent
 Converts static cat images into dynamic videos/GIFs
 """
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+import tempfile
+import time
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.settings import (
+    VIDEO_DEFAULT_SIZE, VIDEO_MAX_SIZE, VIDEO_DEFAULT_FRAMES, VIDEO_MAX_FRAMES, VIDEO_FPS
+)
+from agents.animation_engine import LocalAnimationEngine, EFFECTS
+from services.image_store import get_image_store
 
 class VideoGenerationAgent:
     """
     Agent that generates animated videos from cat images
-    Placeholder for integration with video generation services
+    Renders zoom / pan / wiggle loops locally on the CPU
     """
-    
+
+    DEFAULT_EFFECTS = ["zoom", "wiggle"]
+
     def __init__(self):
         self.agent_type = "VideoGenerationAgent"
-        
-    def generate_video(self, image_path: str, format_type: str = "mp4") -> Dict[str, Any]:
+        self.engine = LocalAnimationEngine()
+
+    def generate_video(self, image_path: str, format_type: str = "mp4",
+                       effects: Optional[List[str]] = None, size: Optional[int] = None,
+                       frames: Optional[int] = None, fps: Optional[int] = None) -> Dict[str, Any]:
         """
         Generate video/GIF from cat image
-        
+
         Args:
             image_path: Path to uploaded cat image
-            format_type: Output format ('mp4' or 'gif')
-            
+            format_type: Output format ('mp4', 'gif' or 'webp')
+            effects: Effects to apply (default: zoom and wiggle)
+            size: Longest side of the output in pixels
+            frames: Number of frames in the loop
+            fps: Frames per second
+
         Returns:
             Dictionary with video generation results
         """
-        # Placeholder implementation
-        # In production, integrate with:
-        # - RunwayML Gen-2
-        # - Stability AI's Stable Video Diffusion
-        # - Google's Lumiere (when available)
-        # - Custom animation libraries (OpenCV, PIL)
-        
+        format_type = (format_type or "mp4").lower()
+        applied = self.add_animation_effects(effects if effects is not None else self.DEFAULT_EFFECTS)
+        size = max(16, min(int(size or VIDEO_DEFAULT_SIZE), VIDEO_MAX_SIZE))
+        frames = max(2, min(int(frames or VIDEO_DEFAULT_FRAMES), VIDEO_MAX_FRAMES))
+        fps = max(1, min(int(fps or VIDEO_FPS), 60))
+
+        message = "Video generated locally"
+        output_format = format_type
+        if format_type not in self.engine.formats():
+            if format_type != "mp4":
+                return self.error_result(image_path, format_type, f"Unsupported format: {format_type}")
+            # MP4 needs ffmpeg; an animated GIF plays in the same places
+            output_format = "gif"
+            message = "MP4 encoding is not available on this server; generated a GIF instead"
+
+        store = get_image_store()
+        # Rendered next to the store so the finished file can be renamed into it
+        fd, output_path = tempfile.mkstemp(dir=store.root, prefix=".tmp-video-")
+        os.close(fd)
+        started = time.perf_counter()
+        try:
+            dimensions = self.engine.animate(
+                image_path, output_path, output_format, applied["effects_applied"],
+                frame_count=frames, fps=fps, max_side=size
+            )
+            render_ms = (time.perf_counter() - started) * 1000
+            video_id, content_type, byte_size = store.put_file(output_path)
+        except Exception as e:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            return self.error_result(image_path, format_type, f"Video generation failed: {str(e)}")
+
         return {
             "agent": self.agent_type,
             "input_image": image_path,
-            "format": format_type,
-            "video_url": None,  # Placeholder
-            "message": "Video generation coming soon! Currently using placeholder.",
-            "status": "placeholder"
+            "format": output_format,
+            "requested_format": format_type,
+            "effects": applied["effects_applied"],
+            "video_id": video_id,
+            "video_url": f"/api/videos/{video_id}",
+            "content_type": content_type,
+            "width": dimensions["width"],
+            "height": dimensions["height"],
+            "frames": frames,
+            "fps": fps,
+            "bytes": byte_size,
+            "render_ms": round(render_ms, 1),
+            "message": message,
+            "status": "generated"
         }
-    
+
     def add_animation_effects(self, effects: list) -> Dict[str, Any]:
         """
-        Apply animation effects to the video
-        
+        Validate the animation effects to apply to the video
+
         Args:
             effects: List of effects to apply (e.g., ['zoom', 'pan', 'wiggle'])
+
+        Returns:
+            Dictionary with the known effects (deduplicated, in order) and
+            any names that were ignored
         """
+        applied, ignored = [], []
+        for effect in effects or []:
+            name = str(effect).strip().lower()
+            if name in EFFECTS:
+                if name not in applied:
+                    applied.append(name)
+            elif name:
+                ignored.append(name)
+        return {
+            "effects_applied": applied,
+            "ignored": ignored,
+            "status": "ok"
+        }
+
+    def error_result(self, image_path: str, format_type: str, message: str) -> Dict[str, Any]:
         return {
-            "effects_applied": effects,
-            "status": "placeholder"
+            "agent": self.agent_type,
+            "input_image": image_path,
+            "format": format_type,
+            "video_url": None,
+            "message": message,
+            "status": "error"
         }
-    
+
     def get_type(self) -> str:
         return self.agent_type
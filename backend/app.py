@@ -2,14 +2,55 @@
 Main Flask application for Agentic AI backend
 Cat Management Platform with Multiple Modules
 """
-from flask import Flask, jsonify, request
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from flask import Flask, Request, Response, g, jsonify, request, send_file
+from werkzeug.exceptions import RequestEntityTooLarge
 from flask_cors import CORS
 from agents.orchestrator import MultiAgentOrchestrator
 from agents.breed_match_agent import BreedMatchAgent
 from agents.image_generation_agent import ImageGenerationAgent
 from agents.video_generation_agent import VideoGenerationAgent
+from services.task_graph import TaskGraph
+from services.response_cache import get_response_cache
+from services.image_store import get_image_store
+from services.upload_store import get_upload_store, UploadRejected
+from services.image_pool import get_image_pool
+from services.image_variants import (
+    get_image_variants, choose_format, variant_url, VARIANT_FORMATS, VARIANT_SOURCE_TYPES
+)
+from services.http_pool import get_http_session
+from services.gemini_registry import get_gemini_registry
+from services.job_queue import JobQueue, QueueFullError, get_job_store
+from services.single_flight import single_flight_stats
+from services.rate_limiter import get_gemini_limiter, UpstreamThrottled
+from services.resilience import start_deadline, end_deadline, circuit_breaker_stats
+from services import metrics, tracing
+from config.settings import (
+    DREAM_CAT_MODERATION_TIMEOUT, DREAM_CAT_BREED_TIMEOUT,
+    DREAM_CAT_ENHANCE_TIMEOUT, DREAM_CAT_IMAGE_TIMEOUT, DREAM_CAT_MAX_WORKERS, IMAGE_CACHE_MAX_AGE,
+    GEMINI_MODEL, IMAGE_PROMPT_MODEL, GEMINI_WARMUP, GEMINI_WARMUP_PING,
+    BATCH_MAX_ITEMS, REQUEST_DEADLINE, MAX_UPLOAD_BYTES, REFERENCE_IMAGE_MAX_SIDE,
+    IMAGE_VARIANT_SIZES, IMAGE_VARIANT_WAIT, IMAGE_POOL_QUEUE_WAIT, METRICS_ENABLED,
+    TRACE_REQUEST_ID_HEADER, MODERATION_FAIL_OPEN, WEB_CONCURRENCY
+)
+
+class UploadRequest(Request):
+    """
+    Streams uploaded files straight into the upload store, hashing them on
+    the way, instead of buffering them in memory
+    """
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return get_upload_store().spool()
 
 app = Flask(__name__)
+app.request_class = UploadRequest
+# Larger requests are refused (413) before the body is read
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES
 CORS(app, origins=[
     "http://localhost:3000",
     "https://mertmensah.github.io"
@@ -21,6 +62,124 @@ breed_matcher = BreedMatchAgent()
 image_generator = ImageGenerationAgent()
 video_generator = VideoGenerationAgent()
 
+# Dream-cat steps get their own pool: a step that overruns its timeout keeps
+# its thread until it finishes, which must not starve the text pipeline
+dream_cat_executor = ThreadPoolExecutor(max_workers=DREAM_CAT_MAX_WORKERS, thread_name_prefix="dream-cat")
+
+# Background queue for image and video generation jobs
+job_queue = JobQueue(store=get_job_store())
+# A status poll can reach any worker, so jobs need a shared store once there
+# is more than one; without it mode=async requests run synchronously
+ASYNC_JOBS_AVAILABLE = job_queue.shared or WEB_CONCURRENCY <= 1
+if not ASYNC_JOBS_AVAILABLE:
+    print("Async jobs disabled: set JOB_STORE_BACKEND=sqlite to share job state between workers")
+
+# Component stats exported as gauges on /metrics
+metrics.register_stats("response_cache", lambda: get_response_cache().stats())
+metrics.register_stats("http_pool", lambda: get_http_session().stats())
+metrics.register_stats("job_queue", job_queue.stats)
+metrics.register_stats("single_flight", single_flight_stats, keyed_by="group")
+metrics.register_stats("gemini_limiter", lambda: get_gemini_limiter().stats())
+metrics.register_stats("circuit_breaker", circuit_breaker_stats, keyed_by="upstream")
+metrics.register_stats("image_variants", lambda: get_image_variants().stats())
+metrics.register_stats("image_pool", lambda: get_image_pool().stats())
+
+# Prepare Gemini model handles before the first request
+if GEMINI_WARMUP:
+    get_gemini_registry().warm_up({GEMINI_MODEL, IMAGE_PROMPT_MODEL}, ping=GEMINI_WARMUP_PING)
+
+@app.before_request
+def open_request_deadline():
+    """
+    Give the request a time budget that upstream calls draw their timeouts
+    from; clients may ask for less with X-Request-Timeout (seconds)
+    """
+    budget = REQUEST_DEADLINE
+    try:
+        budget = min(budget, max(0.0, float(request.headers.get('X-Request-Timeout', budget))))
+    except ValueError:
+        pass
+    g.deadline_token = start_deadline(budget)
+
+@app.teardown_request
+def close_request_deadline(error=None):
+    token = g.pop('deadline_token', None)
+    if token is not None:
+        end_deadline(token)
+
+@app.before_request
+def open_request_trace():
+    """
+    Start the request's trace under the caller's request ID (or a new one)
+    """
+    g.request_id = tracing.request_id_from(request.headers.get(TRACE_REQUEST_ID_HEADER))
+    g.trace_token = tracing.start_trace(g.request_id)
+
+@app.after_request
+def send_request_id(response):
+    if 'request_id' in g:
+        response.headers[TRACE_REQUEST_ID_HEADER] = g.request_id
+    return response
+
+@app.teardown_request
+def close_request_trace(error=None):
+    token = g.pop('trace_token', None)
+    if token is None:
+        return
+    # Streamed responses export their trace when the stream ends
+    trace = tracing.current_trace()
+    if trace is not None and not g.get('trace_streaming'):
+        tracing.export(trace, method=request.method, path=request.path,
+                       endpoint=request.endpoint, status=g.get('metrics_status', 500))
+    tracing.end_trace(token)
+
+def trace_payload():
+    """The current request's trace for a response body (None when tracing is off)"""
+    trace = tracing.current_trace()
+    return trace.to_dict() if trace is not None else None
+
+@app.before_request
+def start_request_metrics():
+    """
+    Count the request in flight; the endpoint label is the view name, so
+    unknown paths cannot blow up the number of series
+    """
+    g.metrics_endpoint = request.endpoint or "unmatched"
+    g.metrics_started = time.perf_counter()
+    metrics.http_requests_in_flight.labels(g.metrics_endpoint).inc()
+
+@app.after_request
+def note_response_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    endpoint = g.pop('metrics_endpoint', None)
+    if endpoint is None:
+        return
+    # No response status means the view raised (Flask answers 500)
+    labels = (endpoint, request.method, g.pop('metrics_status', 500))
+    metrics.http_requests_in_flight.labels(endpoint).dec()
+    metrics.http_requests.labels(*labels).inc()
+    metrics.http_request_duration.labels(*labels).observe(time.perf_counter() - g.metrics_started)
+
+@app.errorhandler(UpstreamThrottled)
+def upstream_throttled(error):
+    """
+    Upstream calls that were not made: 429 when over quota, 503 when there
+    is no capacity or the circuit is open, 504 when the request ran out of
+    time, with a Retry-After hint in every case
+    """
+    retry_after = max(1, math.ceil(error.retry_after))
+    response = jsonify({"error": str(error), "retry_after": retry_after})
+    response.headers["Retry-After"] = str(retry_after)
+    return response, error.status_code
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(error):
+    return jsonify({"error": f"Upload too large (max {MAX_UPLOAD_BYTES // (1024 * 1024)} MB)"}), 413
+
 @app.route('/')
 def home():
     return jsonify({
@@ -49,12 +208,102 @@ def text_to_cat():
     
     if not input_text:
         return jsonify({"error": "No text provided"}), 400
+    try:
+        pipeline_mode = orchestrator.resolve_mode(data.get('pipeline_mode'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
     # Process through pipeline (moderation + translation)
-    result = orchestrator.process_pipeline(input_text, skip_moderation=False)
+    result = orchestrator.process_pipeline(input_text, skip_moderation=False, mode=pipeline_mode)
+    result["trace"] = trace_payload()
+    
+    return jsonify(result)
+
+@app.route('/api/text-to-cat/batch', methods=['POST'])
+def text_to_cat_batch():
+    """
+    Moderate and translate many texts at once
+    
+    Texts are packed into a few Gemini requests instead of one round trip
+    per text. Body: {"texts": [...], "skip_moderation": false,
+    "pack_size": optional, "max_tokens": optional}
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Send a JSON object with a 'texts' list"}), 400
+    texts = data.get('texts')
+    
+    if not isinstance(texts, list) or not texts:
+        return jsonify({"error": "Provide a non-empty 'texts' list"}), 400
+    if not all(isinstance(text, str) and text.strip() for text in texts):
+        return jsonify({"error": "Every item in 'texts' must be a non-empty string"}), 400
+    if len(texts) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"At most {BATCH_MAX_ITEMS} texts per batch"}), 400
+    skip_moderation = data.get('skip_moderation', False)
+    if not isinstance(skip_moderation, bool):
+        return jsonify({"error": "'skip_moderation' must be true or false"}), 400
+    # bool is an int subclass, so true/false are rejected explicitly
+    for field in ('pack_size', 'max_tokens'):
+        value = data.get(field)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value < 1):
+            return jsonify({"error": f"'{field}' must be a positive integer"}), 400
+    
+    result = orchestrator.process_batch(
+        texts,
+        skip_moderation=skip_moderation,
+        pack_size=data.get('pack_size'),
+        max_tokens=data.get('max_tokens')
+    )
     
     return jsonify(result)
 
+@app.route('/api/text-to-cat/stream', methods=['GET', 'POST'])
+def text_to_cat_stream():
+    """
+    Stream text-to-cat results as server-sent events
+    
+    Sends a 'moderation' event with the verdict, 'translation' events with
+    pieces of the translation as they are generated, and a final 'done' event
+    with the same body /api/text-to-cat returns. Accepts a JSON body (POST) or
+    query parameters (GET, for EventSource).
+    """
+    data = request.get_json(silent=True) or request.args
+    input_text = data.get('text', '')
+    
+    if not input_text:
+        return jsonify({"error": "No text provided"}), 400
+    # Checked here: once streaming starts the status can no longer be 400
+    try:
+        pipeline_mode = orchestrator.resolve_mode(data.get('pipeline_mode'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    events = orchestrator.process_pipeline_stream(input_text, mode=pipeline_mode)
+    # The body is produced after this view returns: run each step of the
+    # pipeline in this request's context so its deadline and trace apply
+    context = copy_context()
+    trace = tracing.current_trace()
+    g.trace_streaming = True
+    request_fields = {"method": request.method, "path": request.path, "endpoint": request.endpoint}
+    
+    def stream():
+        try:
+            # Flush headers straight away so the client sees the first byte
+            yield ": stream open\n\n"
+            for event, payload in iter(lambda: context.run(next, events, None), None):
+                if event == "done" and trace is not None:
+                    payload = {**payload, "trace": trace.to_dict()}
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        finally:
+            # Runs on completion and when the client disconnects mid-stream,
+            # which stops the upstream translation
+            context.run(events.close)
+            if trace is not None:
+                tracing.export(trace, status=200, **request_fields)
+    
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.route('/api/text-to-speech', methods=['POST'])
 def text_to_speech():
     """
@@ -81,55 +330,244 @@ def text_to_speech():
 def generate_dream_cat():
     """
     Generate AI cat image from text prompt and/or reference image
+    
+    With mode=async the request returns a job ID right away (202) and the
+    image is generated by the background job queue; if job state is not
+    shared between workers the request runs synchronously instead. Optional size (thumbnail, preview
+    or full) and format (webp, jpeg or png) fields pick the variant image_url
+    points at; without format the encoding follows the Accept header when
+    the image is fetched.
     """
     prompt = request.form.get('prompt', '')
     image_file = request.files.get('image', None)
+    variant = {
+        "size": request.form.get('size') or None,
+        "output_format": request.form.get('format') or None
+    }
     
     if not prompt and not image_file:
         return jsonify({"error": "Provide prompt or image"}), 400
+    if variant["size"] is not None and variant["size"] not in IMAGE_VARIANT_SIZES:
+        return jsonify({"error": f"Unknown size (use one of: {', '.join(IMAGE_VARIANT_SIZES)})"}), 400
+    if variant["output_format"] is not None and variant["output_format"] not in VARIANT_FORMATS:
+        return jsonify({"error": f"Unknown format (use one of: {', '.join(VARIANT_FORMATS)})"}), 400
+    
+    reference = None
+    if image_file:
+        try:
+            reference = get_upload_store().ingest(image_file)
+        except UploadRejected as e:
+            return jsonify({"error": str(e)}), 400
+    
+    if is_async_request():
+        return submit_job(
+            "dream-cat",
+            lambda: run_dream_cat(prompt, reference, variant),
+            dedupe_key=(f"dream-cat:{prompt}:{reference.digest if reference else ''}:"
+                        f"{variant['size']}:{variant['output_format']}")
+        )
     
-    # Use prompt or generate from image description
+    payload, status_code = run_dream_cat(prompt, reference, variant)
+    payload["trace"] = trace_payload()
+    return jsonify(payload), status_code
+
+def run_dream_cat(prompt: str, reference=None, variant: dict = None):
+    """
+    Run the dream-cat steps for a prompt
+    
+    Args:
+        prompt: Text prompt (may be empty when a reference image is given)
+        reference: StoredUpload of the reference image, if any
+        variant: Requested size / output_format for image_url
+    
+    Returns:
+        Tuple of (response payload, HTTP status code)
+    """
+    with tracing.span("dream_cat") as dream_span:
+        payload, status_code = dream_cat_steps(prompt, reference, variant)
+        dream_span.status = str(status_code)
+    return payload, status_code
+
+def dream_cat_steps(prompt: str, reference=None, variant: dict = None):
+    """The body of run_dream_cat, inside its trace span"""
+    # Without a prompt, generate from a description of the reference image;
+    # this is the only place its pixels are decoded (in the image pool)
     if not prompt:
-        prompt = "a beautiful cat"
+        description = None
+        if reference is not None:
+            with tracing.span("describe_reference", agent=image_generator.agent_type):
+                description = image_generator.describe_reference_image(
+                    reference.downscaled_jpeg(REFERENCE_IMAGE_MAX_SIDE, wait=IMAGE_POOL_QUEUE_WAIT)
+                )
+        prompt = description or "a beautiful cat"
+    
+    # Prompt enhancement runs alongside moderation since it is on the
+    # critical path to the image. Breed matching and the image fetch wait for
+    # an approving verdict, so rejected prompts never pay for them.
+    def moderation_passed(upstream):
+        moderation = upstream["moderation"]
+        if isinstance(moderation.exception, UpstreamThrottled):
+            return False
+        if not moderation.ok:
+            # Timed out or failed: same policy as the text pipeline
+            return MODERATION_FAIL_OPEN
+        return orchestrator.is_approved(moderation.value)
     
-    # Step 1: Moderate content
-    moderation = orchestrator.process_single_agent(prompt, "moderator")
+    graph = TaskGraph(dream_cat_executor)
+    graph.add(
+        "moderation",
+        lambda _: orchestrator.process_single_agent(prompt, "moderator"),
+        timeout=DREAM_CAT_MODERATION_TIMEOUT
+    )
+    graph.add(
+        "breed_match",
+        lambda _: breed_matcher.process(prompt),
+        depends_on=["moderation"],
+        timeout=DREAM_CAT_BREED_TIMEOUT,
+        when=moderation_passed
+    )
+    graph.add(
+        "enhance_prompt",
+        lambda _: image_generator.enhance_prompt(prompt),
+        timeout=DREAM_CAT_ENHANCE_TIMEOUT
+    )
+    graph.add(
+        "image",
+        lambda upstream: image_generator.generate_image(
+            prompt,
+            enhanced_prompt=(upstream["enhance_prompt"].value
+                             if upstream["enhance_prompt"].ok
+                             else image_generator.basic_prompt(prompt))
+        ),
+        depends_on=["moderation", "enhance_prompt"],
+        timeout=DREAM_CAT_IMAGE_TIMEOUT,
+        when=moderation_passed
+    )
+    steps = graph.run()
+    timings = [step.to_dict() for step in steps.values()]
     
-    # Check if content is appropriate
-    if moderation and "not appropriate" in moderation.get('analysis', '').lower():
-        return jsonify({
+    # No verdict because Gemini shed the call: answer 429/503 rather than
+    # generating an unmoderated image
+    if isinstance(steps["moderation"].exception, UpstreamThrottled):
+        raise steps["moderation"].exception
+    
+    # Step 1: Moderation verdict
+    moderation = steps["moderation"].value
+    if not steps["moderation"].ok and steps["image"].status == "skipped":
+        # No verdict and MODERATION_FAIL_OPEN is off
+        return {
+            "error": f"Content moderation unavailable: {steps['moderation'].error}",
+            "steps": timings
+        }, 503
+    if steps["image"].status == "skipped":
+        return {
             "error": "Content not appropriate",
-            "moderation": moderation
-        }), 400
+            "reason": moderation.get("reason"),
+            "moderation": moderation,
+            "steps": timings
+        }, 400
     
-    # Step 2: Match breed if description provided
+    # Step 2: Breed match
     breed_match = None
-    if prompt:
-        try:
-            breed_result = breed_matcher.process(prompt)
-            breed_match = breed_result.get('breed_analysis')
-        except Exception as e:
-            print(f"Breed matching error: {e}")
-            breed_match = "Could not determine breed"
+    if steps["breed_match"].ok:
+        breed_match = steps["breed_match"].value.get('breed_analysis')
+    else:
+        print(f"Breed matching error: {steps['breed_match'].error}")
+        breed_match = "Could not determine breed"
     
-    # Step 3: Generate image using Hugging Face
-    try:
-        image_result = image_generator.generate_image(prompt)
-        
-        return jsonify({
-            "image_url": image_result.get('image_url'),
+    # Step 3: Generated image
+    if not steps["image"].ok:
+        return {
+            "error": f"Image generation failed: {steps['image'].error}",
             "prompt": prompt,
-            "enhanced_prompt": image_result.get('enhanced_prompt'),
-            "breed_match": breed_match,
-            "moderation": moderation,
-            "status": image_result.get('status'),
-            "message": image_result.get('message')
-        })
-    except Exception as e:
-        return jsonify({
-            "error": f"Image generation failed: {str(e)}",
-            "prompt": prompt
-        }), 500
+            "steps": timings
+        }, 500
+    
+    image_result = steps["image"].value
+    image_url = image_result.get('image_url')
+    if image_result.get('image_id') and variant and any(variant.values()):
+        image_url = variant_url(image_result['image_id'], **variant)
+    return {
+        "image_url": image_url,
+        "image_id": image_result.get('image_id'),
+        "variants": image_result.get('variants'),
+        "prompt": prompt,
+        "enhanced_prompt": image_result.get('enhanced_prompt'),
+        "breed_match": breed_match,
+        "moderation": moderation,
+        "reference_image": reference.to_dict() if reference else None,
+        "status": image_result.get('status'),
+        "message": image_result.get('message'),
+        "steps": timings
+    }, 200
+
+@app.route('/api/images/<digest>', methods=['GET'])
+@app.route('/api/videos/<digest>', methods=['GET'])
+def serve_image(digest):
+    """
+    Serve a stored image (or rendered cat video) by content hash
+    
+    Images are immutable, so the digest is a strong ETag and clients may cache
+    them forever. Conditional (If-None-Match) and Range requests are handled
+    by send_file.
+    
+    ?size=thumbnail|preview|full serves a resized variant, encoded as
+    ?format= or, by default, the best format the client's Accept header
+    allows (WebP for browsers).
+    """
+    store = get_image_store()
+    if not store.exists(digest):
+        return jsonify({"error": "Image not found"}), 404
+    
+    size = request.args.get('size')
+    output_format = request.args.get('format')
+    if size is not None or output_format is not None:
+        return serve_image_variant(digest, size or "full", output_format)
+    
+    response = send_file(
+        store.path_for(digest),
+        mimetype=store.content_type(digest),
+        conditional=True,
+        etag=digest,
+        max_age=IMAGE_CACHE_MAX_AGE
+    )
+    response.headers["Cache-Control"] = f"public, max-age={IMAGE_CACHE_MAX_AGE}, immutable"
+    return response
+
+def serve_image_variant(digest: str, size: str, output_format: str = None):
+    """
+    Serve a size / format variant of a stored image, rendering it (off this
+    thread, waiting up to IMAGE_VARIANT_WAIT) if it is not ready yet
+    """
+    variants = get_image_variants()
+    negotiated = output_format is None
+    if negotiated:
+        output_format = choose_format(request.accept_mimetypes)
+    if not variants.is_valid(size, output_format):
+        return jsonify({"error": "Unknown image size or format"}), 400
+    
+    store = get_image_store()
+    path = None
+    if store.content_type(digest) in VARIANT_SOURCE_TYPES:
+        path = variants.get(digest, size, output_format, wait=IMAGE_VARIANT_WAIT)
+    
+    if path is None:
+        # Not ready (or not an image we resize): send the original, without
+        # long-term caching so the client picks up the variant later
+        response = send_file(store.path_for(digest), mimetype=store.content_type(digest))
+        response.headers["Cache-Control"] = "no-cache"
+    else:
+        response = send_file(
+            path,
+            mimetype=VARIANT_FORMATS[output_format],
+            conditional=True,
+            etag=f"{digest}-{size}-{output_format}",
+            max_age=IMAGE_CACHE_MAX_AGE
+        )
+        response.headers["Cache-Control"] = f"public, max-age={IMAGE_CACHE_MAX_AGE}, immutable"
+    if negotiated:
+        response.vary.add("Accept")
+    return response
 
 # ========================================
 # Cat Video Generator Module Endpoints
@@ -139,29 +577,180 @@ def generate_dream_cat():
 def generate_cat_video():
     """
     Generate animated video/GIF from cat image
+    
+    Form fields: image (file), format ('mp4', 'gif' or 'webp'), optional
+    effects (comma-separated: zoom, pan, wiggle), size, frames and fps.
+    Supports mode=async like the dream-cat endpoint.
     """
     image_file = request.files.get('image', None)
     format_type = request.form.get('format', 'mp4')
+    effects = request.form.get('effects')
+    options = {
+        "effects": effects.split(',') if effects else None,
+        "size": request.form.get('size', type=int),
+        "frames": request.form.get('frames', type=int),
+        "fps": request.form.get('fps', type=int)
+    }
     
     if not image_file:
         return jsonify({"error": "No image provided"}), 400
     
-    # Save uploaded image temporarily
-    image_path = f"/tmp/{image_file.filename}"
-    # image_file.save(image_path)  # Uncomment in production
+    # Already streamed to disk while the request was parsed; stored under
+    # its content hash, never the client's filename
+    try:
+        upload = get_upload_store().ingest(image_file)
+    except UploadRejected as e:
+        return jsonify({"error": str(e)}), 400
+    image_path = upload.path
+    
+    if is_async_request():
+        return submit_job(
+            "cat-video",
+            lambda: run_cat_video(image_path, format_type, options),
+            dedupe_key=f"cat-video:{upload.digest}:{format_type}:{json.dumps(options, sort_keys=True)}"
+        )
     
+    payload, status_code = run_cat_video(image_path, format_type, options)
+    return jsonify(payload), status_code
+
+def run_cat_video(image_path: str, format_type: str, options: dict = None):
+    """
+    Generate a video for a saved image
+    
+    Returns:
+        Tuple of (response payload, HTTP status code)
+    """
     # Generate video
-    video_result = video_generator.generate_video(image_path, format_type)
+    video_result = video_generator.generate_video(image_path, format_type, **(options or {}))
+    
+    if video_result.get('status') == 'error':
+        return {"error": video_result.get('message'), "format": format_type}, 400
     
     # Optional: Detect breed from image
     breed_match = "Breed detection from image coming soon!"
     
-    return jsonify({
+    return {
         "video_url": video_result.get('video_url'),
-        "format": format_type,
+        "video_id": video_result.get('video_id'),
+        "content_type": video_result.get('content_type'),
+        "format": video_result.get('format'),
+        "effects": video_result.get('effects'),
+        "width": video_result.get('width'),
+        "height": video_result.get('height'),
+        "frames": video_result.get('frames'),
+        "fps": video_result.get('fps'),
+        "render_ms": video_result.get('render_ms'),
+        "message": video_result.get('message'),
         "breed_match": breed_match,
         "status": "generated"
+    }, 200
+
+# ========================================
+# Background Jobs
+# ========================================
+
+def is_async_request() -> bool:
+    """
+    True if the client asked for job mode (?mode=async or a 'mode' form field)
+    and any worker can answer the status polls; otherwise the request runs
+    synchronously and returns its result directly
+    """
+    requested = (request.args.get('mode') or request.form.get('mode')) == 'async'
+    return requested and ASYNC_JOBS_AVAILABLE
+
+def submit_job(kind: str, fn, dedupe_key: str):
+    """
+    Queue a generation job and return the 202 response pointing at it
+    """
+    request_id = g.get('request_id')
+    
+    def traced():
+        # Jobs outlive the request: they get their own trace under its ID,
+        # returned with the job result
+        token = tracing.start_trace(request_id or tracing.request_id_from(None))
+        try:
+            payload, status_code = fn()
+            trace = tracing.current_trace()
+            if trace is not None:
+                payload["trace"] = trace.to_dict()
+                tracing.export(trace, job=kind, status=status_code)
+            return payload, status_code
+        except Exception as e:
+            # The queue records the failure on the job and in metrics; the
+            # trace keeps the spans that led up to it
+            trace = tracing.current_trace()
+            if trace is not None:
+                tracing.export(trace, job=kind, status=getattr(e, "status_code", 500), error=str(e))
+            raise
+        finally:
+            tracing.end_trace(token)
+    
+    try:
+        job, created = job_queue.submit(kind, traced, dedupe_key=dedupe_key)
+    except QueueFullError as e:
+        response = jsonify({"error": str(e)})
+        response.headers["Retry-After"] = "5"
+        return response, 503
+    
+    status_url = f"/api/jobs/{job.id}"
+    response = jsonify({
+        "job_id": job.id,
+        "status": job.status,
+        "deduplicated": not created,
+        "status_url": status_url,
+        "events_url": f"{status_url}/events"
     })
+    response.headers["Location"] = status_url
+    return response, 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Poll a generation job
+    
+    Pass ?wait=<seconds> (max 30) to long-poll until the job finishes. A
+    long-poll holds a sync gunicorn worker for its whole duration, so
+    clients should prefer plain short polls.
+    """
+    try:
+        wait = float(request.args.get('wait', 0) or 0)
+    except ValueError:
+        wait = math.nan
+    if not math.isfinite(wait) or wait < 0:
+        return jsonify({"error": "'wait' must be a non-negative number of seconds"}), 400
+    wait = min(wait, 30.0)
+    job = job_queue.wait(job_id, wait) if wait > 0 else job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """
+    Subscribe to a job's status changes as server-sent events
+    
+    Each event holds the full job state; the stream ends when the job does.
+    Like a long-poll, the stream holds a sync gunicorn worker until then.
+    """
+    if job_queue.get(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+    
+    def stream():
+        last_status = None
+        while True:
+            job = job_queue.wait(job_id, 15)
+            if job is None:
+                return
+            if job["status"] != last_status:
+                last_status = job["status"]
+                yield f"event: status\ndata: {json.dumps(job)}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+            if job["status"] in ("succeeded", "failed"):
+                return
+    
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 # ========================================
 # Breed Matching Endpoint
@@ -204,8 +793,13 @@ def process_pipeline():
     
     if not input_text:
         return jsonify({"error": "No text provided"}), 400
+    try:
+        pipeline_mode = orchestrator.resolve_mode(data.get('pipeline_mode'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
-    result = orchestrator.process_pipeline(input_text, skip_moderation)
+    result = orchestrator.process_pipeline(input_text, skip_moderation, mode=pipeline_mode)
+    result["trace"] = trace_payload()
     
     return jsonify(result)
 
@@ -218,8 +812,35 @@ def agent_status():
         "status": "active",
         "system": "Cat Management Platform",
         "agents_available": 6,
-        "modules": 4
+        "modules": 4,
+        "response_cache": get_response_cache().stats(),
+        "http_pool": get_http_session().stats(),
+        "job_queue": job_queue.stats(),
+        "single_flight": single_flight_stats(),
+        "gemini_limiter": get_gemini_limiter().stats(),
+        "circuit_breakers": circuit_breaker_stats(),
+        "image_variants": get_image_variants().stats(),
+        "image_pool": get_image_pool().stats()
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+    Latency, token, error and in-flight metrics of this worker process in
+    the Prometheus text format
+    """
+    if not METRICS_ENABLED:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/api/agent/health', methods=['GET'])
+def agent_health():
+    """
+    Check that Gemini is reachable with the configured key and model
+    """
+    health = get_gemini_registry().health_check()
+    status_code = 200 if health["status"] == "healthy" else 503
+    return jsonify(health), status_code
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
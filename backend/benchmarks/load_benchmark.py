@@ -0,0 +1,553 @@
+"""
+Load Benchmark
+Drives every app.py route under gunicorn against local Gemini / Pollinations
+stand-ins and reports throughput, latency percentiles and peak RSS.
+
+For each workers x threads configuration a fresh gunicorn is started on
+temporary data directories (SQLite response cache, so jobs are visible to
+every worker), then each endpoint gets a closed-loop run: --concurrency
+clients send requests back to back for --duration seconds. Inputs vary per
+request so the response cache does not turn the run into a cache benchmark
+(pass --env RESPONSE_CACHE_ENABLED=False to disable it outright). Peak RSS
+is the sampled total of the gunicorn master and its workers during each
+endpoint's run; upstream_calls is how many stand-in requests it caused.
+
+Results are written as JSON (default benchmarks/results/<commit>-<time>.json);
+--compare prints throughput and latency changes against an earlier file and
+exits non-zero if any endpoint regressed by more than --tolerance.
+
+Usage (from the backend directory):
+    python benchmarks/load_benchmark.py [--configs 1x4,2x4,4x8] [--duration 10]
+                                        [--concurrency 8] [--endpoints text_to_cat,dream_cat]
+                                        [--gemini-latency lognormal:0.4,0.4] [--gemini-error-rate 0.01]
+                                        [--image-latency lognormal:1.0,0.3] [--image-error-rate 0.01]
+                                        [--env GEMINI_RATE_LIMIT_RPM=6000] [--compare baseline.json]
+"""
+from typing import Dict, Any, Callable, List, Optional, Tuple
+import argparse
+import collections
+import itertools
+import json
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import sys
+import os
+import time
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from upstream_stubs import add_arguments, build_server, make_jpeg
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "moderation_corpus.txt")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+BREED_DESCRIPTIONS = [
+    "fluffy grey cat with a flat face and copper eyes",
+    "slim cat with blue eyes, cream coat and dark points",
+    "huge long-haired cat with a bushy tail and tufted ears",
+    "hairless wrinkly cat that loves warm laps",
+    "orange tabby with a white chest",
+]
+
+DREAM_PROMPTS = [
+    "a cat astronaut floating above the moon",
+    "a cat knight guarding a castle of yarn",
+    "a tiny cat sailing a teacup across a pond",
+    "a cat wizard reading a glowing book",
+]
+
+
+def load_texts() -> List[str]:
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def git_commit() -> Tuple[str, bool]:
+    """Current commit (short hash) and whether the tree has local changes"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=BACKEND_DIR,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+# ========================================
+# Process memory
+# ========================================
+
+def process_tree(root_pid: int) -> List[int]:
+    """root_pid and all of its descendants, from /proc"""
+    children = collections.defaultdict(list)
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; fields resume after ')'
+                fields = f.read().rsplit(")", 1)[1].split()
+            children[int(fields[1])].append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    pids, pending = [], [root_pid]
+    while pending:
+        pid = pending.pop()
+        pids.append(pid)
+        pending.extend(children.get(pid, []))
+    return pids
+
+
+def rss_bytes(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+class RssSampler(threading.Thread):
+    """Samples the total RSS of a process tree; reset() starts a new peak"""
+
+    def __init__(self, root_pid: int, interval: float = 0.1):
+        super().__init__(daemon=True)
+        self.root_pid = root_pid
+        self.interval = interval
+        self.peak = 0
+        self._stop_event = threading.Event()
+
+    def sample(self) -> int:
+        return sum(rss_bytes(pid) for pid in process_tree(self.root_pid))
+
+    def reset(self) -> None:
+        self.peak = self.sample()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, self.sample())
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+
+# ========================================
+# Scenarios
+# ========================================
+
+class Client:
+    """What a scenario needs: the app's base URL, a session and fixtures"""
+
+    def __init__(self, base_url: str, fixtures: Dict[str, Any], timeout: float):
+        self.base_url = base_url
+        self.fixtures = fixtures
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, self.base_url + path, **kwargs)
+
+
+def vary(texts: List[str], n: int) -> str:
+    """A corpus text made unique per request, so the response cache misses"""
+    return f"{texts[n % len(texts)]} (#{n})"
+
+
+def wait_for_job(client: Client, response: requests.Response) -> requests.Response:
+    """Long-poll a submitted job until it finishes"""
+    if response.status_code != 202:
+        return response
+    status_url = response.json()["status_url"]
+    while True:
+        response = client.request("GET", f"{status_url}?wait=30")
+        if response.status_code != 200 or response.json()["status"] in ("succeeded", "failed"):
+            return response
+
+
+def follow_job_events(client: Client, response: requests.Response) -> requests.Response:
+    """Read a submitted job's event stream to the end"""
+    if response.status_code != 202:
+        return response
+    events = client.request("GET", response.json()["events_url"], stream=True)
+    for _ in events.iter_content(chunk_size=None):
+        pass
+    return events
+
+
+def build_scenarios(texts: List[str]) -> Dict[str, Callable[[Client, int], requests.Response]]:
+    """
+    One request function per route, taking a client and the request number
+    """
+
+    def stream(client, n):
+        response = client.request("GET", "/api/text-to-cat/stream", params={"text": vary(texts, n)}, stream=True)
+        for _ in response.iter_content(chunk_size=None):
+            pass
+        return response
+
+    def dream_cat_form(n, mode=None):
+        data = {"prompt": f"{DREAM_PROMPTS[n % len(DREAM_PROMPTS)]} #{n}"}
+        if mode:
+            data["mode"] = mode
+        return data
+
+    def cat_video(client, n):
+        files = {"image": ("cat.jpg", client.fixtures["upload"], "image/jpeg")}
+        data = {"format": "gif", "size": "128", "frames": "12", "effects": "zoom"}
+        return client.request("POST", "/api/cat-video/generate", files=files, data=data)
+
+    return {
+        "home": lambda client, n: client.request("GET", "/"),
+        "text_to_cat": lambda client, n: client.request(
+            "POST", "/api/text-to-cat", json={"text": vary(texts, n)}),
+        "text_to_cat_batch": lambda client, n: client.request(
+            "POST", "/api/text-to-cat/batch", json={"texts": [vary(texts, n * 5 + i) for i in range(5)]}),
+        "text_to_cat_stream": stream,
+        "text_to_speech": lambda client, n: client.request(
+            "POST", "/api/text-to-speech", json={"text": vary(texts, n)}),
+        "dream_cat": lambda client, n: client.request(
+            "POST", "/api/dream-cat/generate", data=dream_cat_form(n)),
+        "dream_cat_async": lambda client, n: wait_for_job(client, client.request(
+            "POST", "/api/dream-cat/generate", data=dream_cat_form(n, "async"))),
+        "job_events": lambda client, n: follow_job_events(client, client.request(
+            "POST", "/api/dream-cat/generate", data=dream_cat_form(n, "async"))),
+        "image": lambda client, n: client.request("GET", f"/api/images/{client.fixtures['image_id']}"),
+        "image_variant": lambda client, n: client.request(
+            "GET", f"/api/images/{client.fixtures['image_id']}",
+            params={"size": ("thumbnail", "preview", "full")[n % 3]}, headers={"Accept": "image/webp,*/*"}),
+        "cat_video": cat_video,
+        "video": lambda client, n: client.request("GET", f"/api/videos/{client.fixtures['video_id']}"),
+        "breed_match": lambda client, n: client.request(
+            "POST", "/api/breed-match",
+            json={"description": f"{BREED_DESCRIPTIONS[n % len(BREED_DESCRIPTIONS)]} #{n}"}),
+        "agents_info": lambda client, n: client.request("GET", "/api/agents/info"),
+        "agents_pipeline": lambda client, n: client.request(
+            "POST", "/api/agents/pipeline", json={"text": vary(texts, n)}),
+        "agent_status": lambda client, n: client.request("GET", "/api/agent/status"),
+        "agent_health": lambda client, n: client.request("GET", "/api/agent/health"),
+        "metrics": lambda client, n: client.request("GET", "/metrics"),
+    }
+
+
+def prepare_fixtures(base_url: str, timeout: float) -> Dict[str, Any]:
+    """
+    A stored image and a rendered video for the routes that serve them
+    """
+    fixtures: Dict[str, Any] = {"upload": make_jpeg(256)}
+    client = Client(base_url, fixtures, timeout)
+
+    response = client.request("POST", "/api/dream-cat/generate", data={"prompt": "a benchmark cat"})
+    fixtures["image_id"] = response.json().get("image_id") if response.ok else None
+
+    response = client.request(
+        "POST", "/api/cat-video/generate",
+        files={"image": ("cat.jpg", fixtures["upload"], "image/jpeg")},
+        data={"format": "gif", "size": "128", "frames": "12"}
+    )
+    fixtures["video_id"] = response.json().get("video_id") if response.ok else None
+    return fixtures
+
+
+# ========================================
+# Load generation
+# ========================================
+
+def run_endpoint(name: str, scenario: Callable[[Client, int], requests.Response], base_url: str,
+                 fixtures: Dict[str, Any], concurrency: int, duration: float, timeout: float,
+                 sampler: RssSampler, stub_stats: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Closed-loop load on one endpoint: each client sends its next request as
+    soon as the previous one is answered
+    """
+    counter = itertools.count()
+    latencies: List[float] = []
+    statuses: Dict[str, int] = collections.Counter()
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client_loop():
+        client = Client(base_url, fixtures, timeout)
+        while time.perf_counter() < deadline:
+            n = next(counter)
+            started = time.perf_counter()
+            try:
+                status = str(scenario(client, n).status_code)
+            except requests.RequestException as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] += 1
+
+    upstream_before = stub_stats()
+    sampler.reset()
+    started = time.perf_counter()
+    clients = [threading.Thread(target=client_loop, daemon=True) for _ in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    upstream_after = stub_stats()
+
+    latencies.sort()
+    completed = len(latencies)
+    ok = sum(count for status, count in statuses.items() if status.isdigit() and int(status) < 400)
+    return {
+        "requests": completed,
+        "ok": ok,
+        "errors": completed - ok,
+        "error_rate": round((completed - ok) / completed, 4) if completed else 0.0,
+        "statuses": dict(sorted(statuses.items())),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(completed / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / completed * 1000, 1) if completed else 0.0,
+            "p50": round(percentile(latencies, 0.50) * 1000, 1),
+            "p95": round(percentile(latencies, 0.95) * 1000, 1),
+            "p99": round(percentile(latencies, 0.99) * 1000, 1),
+            "max": round(latencies[-1] * 1000, 1) if latencies else 0.0
+        },
+        "peak_rss_mb": round(sampler.peak / 1024 / 1024, 1),
+        "upstream_calls": {
+            upstream: upstream_after[upstream]["requests"] - upstream_before[upstream]["requests"]
+            for upstream in upstream_after
+        }
+    }
+
+
+def wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {process.returncode}")
+        try:
+            if requests.get(base_url + "/", timeout=2).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError("gunicorn did not start in time")
+
+
+def run_config(workers: int, threads: int, args: argparse.Namespace, stub_url: str,
+               stub_stats: Callable[[], Dict[str, Any]], scenarios: Dict[str, Callable]) -> Dict[str, Any]:
+    """
+    Start gunicorn with one workers x threads setting and load each endpoint
+    """
+    data_dir = tempfile.mkdtemp(prefix="load-benchmark-")
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(
+        os.environ,
+        GEMINI_API_KEY="benchmark",
+        GEMINI_API_ENDPOINT=stub_url,
+        POLLINATIONS_URL=f"{stub_url}/prompt/",
+        RESPONSE_CACHE_BACKEND="sqlite",
+        RESPONSE_CACHE_PATH=os.path.join(data_dir, "response_cache.db"),
+        IMAGE_STORE_DIR=os.path.join(data_dir, "images"),
+        UPLOAD_DIR=os.path.join(data_dir, "uploads"),
+        TRACE_EXPORT_PATH="",
+        PYTHONUNBUFFERED="1"
+    )
+    env.update(item.split("=", 1) for item in args.env)
+
+    command = [sys.executable, "-m", "gunicorn", "--workers", str(workers), "--threads", str(threads),
+               "--bind", f"127.0.0.1:{port}", "--timeout", str(int(args.timeout) + 30), "app:app"]
+    log = open(os.path.join(data_dir, "gunicorn.log"), "w")
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    sampler = RssSampler(process.pid)
+    try:
+        wait_until_ready(base_url, process)
+        sampler.start()
+        fixtures = prepare_fixtures(base_url, args.timeout)
+        idle_rss = sampler.sample()
+
+        endpoints = {}
+        for name, scenario in scenarios.items():
+            if name in ("image", "image_variant") and not fixtures["image_id"]:
+                print(f"  {name}: skipped (no image could be generated)")
+                continue
+            if name == "video" and not fixtures["video_id"]:
+                print(f"  {name}: skipped (no video could be rendered)")
+                continue
+            if args.warmup > 0:
+                run_endpoint(name, scenario, base_url, fixtures, args.concurrency, args.warmup,
+                             args.timeout, sampler, stub_stats)
+            result = run_endpoint(name, scenario, base_url, fixtures, args.concurrency, args.duration,
+                                  args.timeout, sampler, stub_stats)
+            endpoints[name] = result
+            latency = result["latency_ms"]
+            print(f"  {name}: {result['throughput_rps']} req/s, p50 {latency['p50']} ms, "
+                  f"p95 {latency['p95']} ms, p99 {latency['p99']} ms, errors {result['errors']}, "
+                  f"peak RSS {result['peak_rss_mb']} MB", flush=True)
+        return {
+            "workers": workers,
+            "threads": threads,
+            "idle_rss_mb": round(idle_rss / 1024 / 1024, 1),
+            "endpoints": endpoints
+        }
+    finally:
+        sampler.stop()
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log.close()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+# ========================================
+# Comparison
+# ========================================
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float) -> int:
+    """
+    Print throughput and p95/p99 changes per configuration and endpoint
+
+    Returns:
+        Number of regressions beyond tolerance (throughput down or p95 up)
+    """
+    def key(run):
+        return f"{run['workers']}x{run['threads']}"
+
+    def change(old: float, new: float) -> Optional[float]:
+        return (new - old) / old if old else None
+
+    def fmt(value: Optional[float]) -> str:
+        return "n/a" if value is None else f"{value:+.1%}"
+
+    print(f"\nCompared with {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    regressions = 0
+    baseline_runs = {key(run): run for run in baseline.get("runs", [])}
+    for run in current["runs"]:
+        old_run = baseline_runs.get(key(run))
+        if old_run is None:
+            print(f"  {key(run)}: not in baseline")
+            continue
+        for name, result in run["endpoints"].items():
+            old = old_run["endpoints"].get(name)
+            if old is None:
+                continue
+            throughput = change(old["throughput_rps"], result["throughput_rps"])
+            p95 = change(old["latency_ms"]["p95"], result["latency_ms"]["p95"])
+            p99 = change(old["latency_ms"]["p99"], result["latency_ms"]["p99"])
+            regressed = (throughput is not None and throughput < -tolerance) or (p95 is not None and p95 > tolerance)
+            regressions += regressed
+            print(f"  {key(run)} {name}: throughput {fmt(throughput)}, p95 {fmt(p95)}, p99 {fmt(p99)}"
+                  f"{'  <-- regression' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--configs", default="1x4,2x4,4x8",
+                        help="Comma-separated gunicorn workers x threads settings")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per endpoint")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Untimed seconds of load before each endpoint")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout (seconds)")
+    parser.add_argument("--endpoints", default="", help="Comma-separated subset of endpoints to run")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra app setting for the gunicorn run (repeatable)")
+    parser.add_argument("--output", default="", help="Results file (default: benchmarks/results/<commit>-<time>.json)")
+    parser.add_argument("--compare", default="", help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Throughput drop / p95 rise that counts as a regression")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the stand-ins' latency and errors")
+    add_arguments(parser)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    configs = []
+    for item in args.configs.split(","):
+        workers, _, threads = item.strip().lower().partition("x")
+        configs.append((int(workers), int(threads or 1)))
+    for item in args.env:
+        if "=" not in item:
+            parser.error(f"--env expects KEY=VALUE, got '{item}'")
+
+    scenarios = build_scenarios(load_texts())
+    if args.endpoints:
+        selected = [name.strip() for name in args.endpoints.split(",")]
+        unknown = [name for name in selected if name not in scenarios]
+        if unknown:
+            parser.error(f"Unknown endpoints: {', '.join(unknown)} (use: {', '.join(scenarios)})")
+        scenarios = {name: scenarios[name] for name in selected}
+
+    # Stand-ins run in this process, on their own threads
+    stub_port = free_port()
+    stub = build_server(args, stub_port)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    stub_url = f"http://127.0.0.1:{stub_port}"
+
+    commit, dirty = git_commit()
+    results = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": {"cpu_count": os.cpu_count(), "python": platform.python_version(), "platform": platform.platform()},
+        "settings": {
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "concurrency": args.concurrency,
+            "env": args.env
+        },
+        "upstreams": {
+            "gemini": {"latency": args.gemini_latency, "error_rate": args.gemini_error_rate,
+                       "throttle_rate": args.gemini_throttle_rate},
+            "pollinations": {"latency": args.image_latency, "error_rate": args.image_error_rate,
+                             "image_side": args.image_side}
+        },
+        "runs": []
+    }
+    try:
+        for workers, threads in configs:
+            print(f"gunicorn {workers} worker(s) x {threads} thread(s), {args.concurrency} clients:", flush=True)
+            results["runs"].append(run_config(workers, threads, args, stub_url, stub.stats, scenarios))
+    finally:
+        stub.shutdown()
+        stub.server_close()
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{commit}{'-dirty' if dirty else ''}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(baseline, results, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Moderation Prefilter Benchmark
+Measures how many Gemini moderation calls the prefilter avoids on a sample
+corpus and how long the prefilter takes per message.
+
+Usage (from the backend directory):
+    python benchmarks/prefilter_benchmark.py [corpus_file]
+"""
+import json
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agents.moderation_prefilter import ModerationPrefilter
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "moderation_corpus.txt")
+
+
+def load_corpus(path: str):
+    with open(path, encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f
+                if line.strip() and not line.startswith("#")]
+
+
+def main():
+    corpus = load_corpus(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_CORPUS)
+    prefilter = ModerationPrefilter()
+
+    approved = rejected = ambiguous = 0
+    for text in corpus:
+        verdict = prefilter.check(text)
+        if verdict is None:
+            ambiguous += 1
+        elif verdict["appropriate"]:
+            approved += 1
+        else:
+            rejected += 1
+
+    # Time many passes over the corpus for a stable per-message figure
+    rounds = max(1, 200000 // len(corpus))
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for text in corpus:
+            prefilter.check(text)
+    elapsed = time.perf_counter() - started
+    per_message_us = elapsed / (rounds * len(corpus)) * 1e6
+
+    print(json.dumps({
+        "messages": len(corpus),
+        "approved_locally": approved,
+        "rejected_locally": rejected,
+        "sent_to_gemini": ambiguous,
+        "llm_calls_avoided_pct": round(100 * (approved + rejected) / len(corpus), 1),
+        "prefilter_us_per_message": round(per_message_us, 2)
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+Upstream Stand-ins
+Local Gemini (REST) and Pollinations.ai servers for load tests, with
+configurable latency distributions and error rates.
+
+Gemini answers generateContent / streamGenerateContent with schema-shaped
+JSON in JSON mode (one object per item for packed batch prompts) and short
+cat text otherwise, plus usage metadata; model metadata requests (health
+checks) answer at once. Pollinations answers /prompt/<text> with a JPEG.
+
+Latency specs: "fixed:0.2", "uniform:0.1,0.5", "normal:0.3,0.05" (mean,
+stddev), "lognormal:0.3,0.5" (median, sigma) or "exp:0.3" (mean), in
+seconds. Error rates are fractions (0-1): errors answer 500, throttles 429.
+
+Usage (from the backend directory):
+    python benchmarks/upstream_stubs.py [--port 8600] [--gemini-latency lognormal:0.4,0.4]
+                                        [--image-latency lognormal:1.5,0.3]
+                                        [--gemini-error-rate 0.01] [--image-error-rate 0.01]
+
+Then start the app with GEMINI_API_ENDPOINT=http://127.0.0.1:8600 and
+POLLINATIONS_URL=http://127.0.0.1:8600/prompt/.
+"""
+from typing import Dict, Any, Callable, Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import io
+import json
+import math
+import random
+import re
+import threading
+import time
+import urllib.parse
+
+from PIL import Image
+
+# Reply text for plain (non-JSON) Gemini calls
+CAT_TEXT = "Meow meow purr! 😺 Mrrp, meow meow. *slow blink*"
+
+# Schema type names, as strings or as the REST transport's enum numbers
+SCHEMA_TYPES = {1: "STRING", 2: "NUMBER", 3: "INTEGER", 4: "BOOLEAN", 5: "ARRAY", 6: "OBJECT"}
+
+# Item ids of packed batch prompts ('[{"id": 0, "text": ...}, ...]')
+ITEM_ID_PATTERN = re.compile(r'"id": (\d+), "text"')
+
+
+def latency_sampler(spec: str) -> Callable[[], float]:
+    """
+    Parse a latency spec ("kind:args") into a function returning seconds
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(value) for value in args.split(",") if value]
+    samplers = {
+        "fixed": lambda: values[0],
+        "uniform": lambda: random.uniform(values[0], values[1]),
+        "normal": lambda: random.gauss(values[0], values[1]),
+        "lognormal": lambda: random.lognormvariate(math.log(values[0]), values[1]),
+        "exp": lambda: random.expovariate(1 / values[0]),
+    }
+    if kind not in samplers:
+        raise ValueError(f"Unknown latency distribution '{kind}' (use one of: {', '.join(samplers)})")
+    sampler = samplers[kind]
+    return lambda: max(0.0, sampler())
+
+
+class Upstream:
+    """Latency and failure behaviour of one stand-in, plus its counters"""
+
+    def __init__(self, latency: str, error_rate: float = 0.0, throttle_rate: float = 0.0):
+        self.latency = latency
+        self.sample_latency = latency_sampler(latency)
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def outcome(self) -> int:
+        """Wait a sampled latency and pick the HTTP status to answer with"""
+        time.sleep(self.sample_latency())
+        roll = random.random()
+        status = 200
+        if roll < self.error_rate:
+            status = 500
+        elif roll < self.error_rate + self.throttle_rate:
+            status = 429
+        with self._lock:
+            self.requests += 1
+            self.errors += status == 500
+            self.throttled += status == 429
+        return status
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "latency": self.latency,
+                "error_rate": self.error_rate,
+                "throttle_rate": self.throttle_rate,
+                "requests": self.requests,
+                "errors": self.errors,
+                "throttled": self.throttled
+            }
+
+
+def example_value(schema: Dict[str, Any], prompt: str) -> Any:
+    """A value matching a Gemini response schema"""
+    kind = schema.get("type", "OBJECT")
+    kind = SCHEMA_TYPES.get(kind, str(kind).upper())
+    if kind == "OBJECT":
+        return {name: example_value(field, prompt) for name, field in schema.get("properties", {}).items()}
+    if kind == "ARRAY":
+        ids = [int(item_id) for item_id in ITEM_ID_PATTERN.findall(prompt)] or [0]
+        items = []
+        for item_id in ids:
+            item = example_value(schema.get("items", {}), prompt)
+            if isinstance(item, dict) and "id" in item:
+                item["id"] = item_id
+            items.append(item)
+        return items
+    if kind == "BOOLEAN":
+        return True
+    if kind in ("INTEGER", "NUMBER"):
+        return 0
+    if schema.get("enum"):
+        return schema["enum"][0]
+    return "Looks fine for the workplace"
+
+
+def gemini_reply(body: Dict[str, Any]) -> str:
+    """Response text for a generateContent request body"""
+    prompt = " ".join(
+        part.get("text", "")
+        for content in body.get("contents", [])
+        for part in content.get("parts", [])
+    )
+    config = body.get("generationConfig", {})
+    schema = config.get("responseSchema") or config.get("response_schema")
+    if schema:
+        return json.dumps(example_value(schema, prompt))
+    ids = ITEM_ID_PATTERN.findall(prompt)
+    if ids:
+        # Packed translation prompt without a schema
+        return json.dumps([{"id": int(item_id), "cat_translation": CAT_TEXT} for item_id in ids])
+    return CAT_TEXT
+
+
+def gemini_response(text: str, prompt_chars: int) -> Dict[str, Any]:
+    prompt_tokens = max(1, prompt_chars // 4)
+    response_tokens = max(1, len(text) // 4)
+    return {
+        "candidates": [{
+            "content": {"parts": [{"text": text}], "role": "model"},
+            "finishReason": "STOP",
+            "index": 0
+        }],
+        "usageMetadata": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": response_tokens,
+            "totalTokenCount": prompt_tokens + response_tokens
+        }
+    }
+
+
+def make_jpeg(side: int) -> bytes:
+    """A noisy test image, so it does not compress to nothing"""
+    image = Image.effect_noise((side, side), 64).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Routes requests to the Gemini or Pollinations stand-in"""
+
+    protocol_version = "HTTP/1.1"
+    server: "StubServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status: int, payload: Any) -> None:
+        self.send_body(status, json.dumps(payload).encode(), "application/json")
+
+    def send_error_status(self, status: int) -> None:
+        message = "Resource has been exhausted" if status == 429 else "Internal error"
+        self.send_json(status, {"error": {"code": status, "message": message,
+                                          "status": "RESOURCE_EXHAUSTED" if status == 429 else "INTERNAL"}})
+
+    def do_GET(self):
+        path = urllib.parse.urlparse(self.path).path
+        if path.startswith("/prompt/"):
+            status = self.server.image.outcome()
+            if status != 200:
+                self.send_body(status, b"upstream error", "text/plain")
+                return
+            self.send_body(200, self.server.jpeg, "image/jpeg")
+        elif path == "/stats":
+            self.send_json(200, self.server.stats())
+        elif "/models/" in path:
+            # Model metadata (health checks): no latency, no tokens
+            name = path.split("/v1beta/", 1)[-1]
+            self.send_json(200, {"name": name, "displayName": name, "inputTokenLimit": 1048576,
+                                 "outputTokenLimit": 8192,
+                                 "supportedGenerationMethods": ["generateContent"]})
+        else:
+            self.send_json(404, {"error": {"code": 404, "message": "Not found"}})
+
+    def do_POST(self):
+        path = urllib.parse.urlparse(self.path).path
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length)
+        if not (path.endswith(":generateContent") or path.endswith(":streamGenerateContent")):
+            self.send_json(404, {"error": {"code": 404, "message": "Not found"}})
+            return
+        status = self.server.gemini.outcome()
+        if status != 200:
+            self.send_error_status(status)
+            return
+        body = json.loads(raw or b"{}")
+        text = gemini_reply(body)
+        if path.endswith(":streamGenerateContent"):
+            # The REST transport reads a JSON array of responses
+            middle = len(text) // 2
+            chunks = [text[:middle], text[middle:]] if middle else [text]
+            payload = [gemini_response(chunk, len(raw)) for chunk in chunks]
+            self.send_json(200, payload)
+        else:
+            self.send_json(200, gemini_response(text, len(raw)))
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, gemini: Upstream, image: Upstream, image_side: int = 512):
+        super().__init__(address, StubHandler)
+        self.gemini = gemini
+        self.image = image
+        self.jpeg = make_jpeg(image_side)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"gemini": self.gemini.stats(), "pollinations": self.image.stats()}
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Stand-in options, shared with the load benchmark"""
+    parser.add_argument("--gemini-latency", default="lognormal:0.4,0.4")
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--gemini-throttle-rate", type=float, default=0.0)
+    parser.add_argument("--image-latency", default="lognormal:1.0,0.3")
+    parser.add_argument("--image-error-rate", type=float, default=0.0)
+    parser.add_argument("--image-side", type=int, default=512, help="Stand-in image size (pixels)")
+
+
+def build_server(args: argparse.Namespace, port: int, host: str = "127.0.0.1") -> StubServer:
+    return StubServer(
+        (host, port),
+        Upstream(args.gemini_latency, args.gemini_error_rate, args.gemini_throttle_rate),
+        Upstream(args.image_latency, args.image_error_rate),
+        args.image_side
+    )
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = build_server(args, args.port, args.host)
+    print(f"Stand-ins listening on http://{args.host}:{args.port} "
+          f"(Gemini {args.gemini_latency}, Pollinations {args.image_latency})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
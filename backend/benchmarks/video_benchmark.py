@@ -0,0 +1,163 @@
+"""
+Local Animation Engine Benchmark
+Measures render time and memory per output size, frame count and format.
+
+Each configuration runs on a freshly started render pool (warmed up before
+timing), so worker peak RSS is per configuration. Parent memory is the
+tracemalloc peak (NumPy buffers) plus the sampled RSS growth of the encoding
+side (which also catches Pillow's own allocations); both show whether a
+format streams (flat in the frame count) or buffers the clip.
+
+Usage (from the backend directory):
+    python benchmarks/video_benchmark.py [--image cat.jpg] [--sizes 256,512,1024]
+                                         [--frames 24,48,96] [--formats gif,webp,mp4]
+                                         [--effects zoom,pan,wiggle]
+"""
+import argparse
+import json
+import multiprocessing
+import tempfile
+import threading
+import tracemalloc
+import sys
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.settings import VIDEO_RENDER_WORKERS, VIDEO_FPS
+from agents import animation_engine
+from agents.animation_engine import LocalAnimationEngine
+
+
+def synthetic_image(path: str, width: int = 1600, height: int = 1200) -> None:
+    """A detailed test image (gradients plus noise), so GIF/WebP cannot cheat"""
+    y, x = np.mgrid[0:height, 0:width]
+    noise = np.random.default_rng(0).integers(0, 32, (height, width), dtype=np.int64)
+    pixels = np.stack([x * 255 // width, y * 255 // height, (x + y + noise) % 256], axis=-1)
+    Image.fromarray(pixels.astype(np.uint8)).save(path, quality=90)
+
+
+def proc_status_kb(pid, field: str) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def worker_peak_rss_mb() -> float:
+    """Largest peak RSS (VmHWM) among the live render workers"""
+    peak = max([proc_status_kb(child.pid, "VmHWM") for child in multiprocessing.active_children()] or [0])
+    return round(peak / 1024, 1)
+
+
+class RssSampler:
+    """Samples this process's RSS in the background and keeps the maximum"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.baseline = proc_status_kb("self", "VmRSS")
+        self.peak = self.baseline
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, proc_status_kb("self", "VmRSS"))
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def growth_mb(self) -> float:
+        return round((self.peak - self.baseline) / 1024, 1)
+
+
+def fresh_pool(image_path: str) -> None:
+    """Replace the render pool and start its workers outside the timed run"""
+    pool = animation_engine.get_render_pool()
+    if pool is None:
+        return
+    animation_engine.discard_render_pool(pool)
+    for _ in animation_engine.render_frames(image_path, ["zoom"], 2 * VIDEO_RENDER_WORKERS, 16, 16):
+        pass
+
+
+def run(engine: LocalAnimationEngine, image_path: str, output_dir: str, size: int,
+        frames: int, output_format: str, effects):
+    fresh_pool(image_path)
+    output_path = os.path.join(output_dir, f"clip-{size}-{frames}.{output_format}")
+
+    tracemalloc.start()
+    with RssSampler() as rss:
+        started = time.perf_counter()
+        dimensions = engine.animate(image_path, output_path, output_format, effects,
+                                    frame_count=frames, fps=VIDEO_FPS, max_side=size)
+        elapsed = time.perf_counter() - started
+    _, parent_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "format": output_format,
+        "size": f"{dimensions['width']}x{dimensions['height']}",
+        "frames": frames,
+        "render_s": round(elapsed, 3),
+        "ms_per_frame": round(elapsed * 1000 / frames, 1),
+        "frames_per_s": round(frames / elapsed, 1),
+        "output_kb": round(os.path.getsize(output_path) / 1024, 1),
+        "parent_peak_traced_mb": round(parent_peak / 2 ** 20, 1),
+        "parent_rss_growth_mb": rss.growth_mb(),
+        "worker_peak_rss_mb": worker_peak_rss_mb()
+    }
+    os.remove(output_path)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--image", help="Source image (default: a synthetic 1600x1200 image)")
+    parser.add_argument("--sizes", default="256,512,1024")
+    parser.add_argument("--frames", default="24,48,96")
+    parser.add_argument("--formats", default=None, help="Default: every format available here")
+    parser.add_argument("--effects", default="zoom,pan,wiggle")
+    args = parser.parse_args()
+
+    engine = LocalAnimationEngine()
+    formats = args.formats.split(",") if args.formats else engine.formats()
+    effects = args.effects.split(",")
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        image_path = args.image
+        if image_path is None:
+            image_path = os.path.join(output_dir, "source.jpg")
+            synthetic_image(image_path)
+
+        results = [
+            run(engine, image_path, output_dir, int(size), int(frames), output_format, effects)
+            for output_format in formats
+            for size in args.sizes.split(",")
+            for frames in args.frames.split(",")
+        ]
+
+    print(json.dumps({
+        "render_workers": VIDEO_RENDER_WORKERS,
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": animation_engine.ffmpeg_available(),
+        "effects": effects,
+        "fps": VIDEO_FPS,
+        "results": results
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -23,8 +23,278 @@ FLASK_ENV = os.getenv("FLASK_ENV", "development")
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
 
 # Gemini Model Configuration
-GEMINI_MODEL = "models/gemini-2.5-flash"  # Stable, fast, and reliable
-GEMINI_TIMEOUT = 30  # seconds
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "models/gemini-2.5-flash")  # Stable, fast, and reliable
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "30"))  # seconds per Gemini call
+# Model used by ImageGenerationAgent to enhance image prompts
+IMAGE_PROMPT_MODEL = os.getenv("IMAGE_PROMPT_MODEL", GEMINI_MODEL)
+# Build model handles (and optionally ping Gemini) when the app starts
+GEMINI_WARMUP = os.getenv("GEMINI_WARMUP", "True").lower() == "true"
+GEMINI_WARMUP_PING = os.getenv("GEMINI_WARMUP_PING", "False").lower() == "true"
+# Alternative Gemini API endpoint, e.g. a local stand-in for benchmarks
+# ("http://127.0.0.1:8600"); empty uses Google's. Set, it switches the SDK to
+# its REST transport.
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT", "")
+# Pollinations.ai image endpoint (prompt is appended)
+POLLINATIONS_URL = os.getenv("POLLINATIONS_URL", "https://image.pollinations.ai/prompt/")
+
+# Gemini Rate Limiting (client side, per process: divide quotas by the number
+# of gunicorn workers). Requests per minute per model, and optional per-agent
+# limits as "AgentType=rpm,...". 0 disables a bucket.
+GEMINI_LIMITER_ENABLED = os.getenv("GEMINI_LIMITER_ENABLED", "True").lower() == "true"
+GEMINI_RATE_LIMIT_RPM = float(os.getenv("GEMINI_RATE_LIMIT_RPM", "1000"))
+GEMINI_RATE_LIMIT_BURST = float(os.getenv("GEMINI_RATE_LIMIT_BURST", "0"))  # 0 = 5 seconds' worth
+GEMINI_AGENT_RATE_LIMITS = {
+    name.strip(): float(rpm)
+    for name, rpm in (item.split("=", 1) for item in os.getenv("GEMINI_AGENT_RATE_LIMITS", "").split(",") if "=" in item)
+}
+# Adaptive concurrency: starts at INITIAL, moves between MIN and MAX
+GEMINI_CONCURRENCY_INITIAL = int(os.getenv("GEMINI_CONCURRENCY_INITIAL", "8"))
+GEMINI_CONCURRENCY_MIN = int(os.getenv("GEMINI_CONCURRENCY_MIN", "1"))
+GEMINI_CONCURRENCY_MAX = int(os.getenv("GEMINI_CONCURRENCY_MAX", "64"))
+# Longest a request queues for a token and a slot before it is shed
+GEMINI_LIMITER_MAX_WAIT = float(os.getenv("GEMINI_LIMITER_MAX_WAIT", "5"))
+GEMINI_LIMITER_MAX_QUEUE = int(os.getenv("GEMINI_LIMITER_MAX_QUEUE", "200"))
+# Calls slower than this multiple of the best recent latency shrink the limit
+GEMINI_LATENCY_TOLERANCE = float(os.getenv("GEMINI_LATENCY_TOLERANCE", "3.0"))
+# Seconds to stop sending after Gemini reports a quota error
+GEMINI_QUOTA_BACKOFF = float(os.getenv("GEMINI_QUOTA_BACKOFF", "5"))
+
+# Background Job Queue
+# Image and video generation can run as jobs (mode=async) so they do not hold
+# a web worker for the whole generation time
+JOB_QUEUE_WORKERS = int(os.getenv("JOB_QUEUE_WORKERS", "4"))
+JOB_QUEUE_MAX_PENDING = int(os.getenv("JOB_QUEUE_MAX_PENDING", "100"))
+JOB_TTL = int(os.getenv("JOB_TTL", "900"))  # seconds a finished job is kept
+# Job state has to be readable by whichever worker a status poll reaches.
+# "sqlite" shares it through JOB_STORE_PATH (its own file, so response cache
+# churn never evicts a running job); "memory" keeps it in the worker that
+# ran the job, in which case mode=async requests run synchronously when
+# gunicorn runs more than one worker (WEB_CONCURRENCY, which gunicorn reads
+# for its worker count).
+JOB_STORE_BACKEND = os.getenv("JOB_STORE_BACKEND", os.getenv("RESPONSE_CACHE_BACKEND", "memory")).lower()
+JOB_STORE_PATH = os.getenv(
+    "JOB_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "jobs.db")
+)
+JOB_STORE_MAX_BYTES = int(os.getenv("JOB_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# Response Cache Configuration
+# Identical Gemini calls (same agent, system prompt, input and generation
+# config) are answered from an in-process LRU cache until their TTL expires.
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "True").lower() == "true"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+RESPONSE_CACHE_DEFAULT_TTL = int(os.getenv("RESPONSE_CACHE_DEFAULT_TTL", "3600"))  # seconds
+# Calls above this temperature are creative by design and are not cached
+# unless RESPONSE_CACHE_ALLOW_HIGH_TEMPERATURE is set
+RESPONSE_CACHE_MAX_TEMPERATURE = float(os.getenv("RESPONSE_CACHE_MAX_TEMPERATURE", "0.5"))
+RESPONSE_CACHE_ALLOW_HIGH_TEMPERATURE = os.getenv("RESPONSE_CACHE_ALLOW_HIGH_TEMPERATURE", "False").lower() == "true"
+# "memory" keeps the cache per process. "sqlite" adds a shared SQLite file
+# (WAL mode) behind it so every gunicorn worker sees the same entries and the
+# cache survives restarts.
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+RESPONSE_CACHE_PATH = os.getenv(
+    "RESPONSE_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "response_cache.db")
+)
+RESPONSE_CACHE_PERSISTENT_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_PERSISTENT_MAX_BYTES", str(512 * 1024 * 1024)))
+RESPONSE_CACHE_COMPACTION_INTERVAL = int(os.getenv("RESPONSE_CACHE_COMPACTION_INTERVAL", "300"))  # seconds
+IMAGE_CACHE_TTL = int(os.getenv("IMAGE_CACHE_TTL", "86400"))  # seconds
+
+# Outbound HTTP Pool
+# One keep-alive session per process for all agent HTTP traffic.
+# HTTP_POOL_CONNECTIONS is the number of hosts to keep pools for,
+# HTTP_POOL_MAXSIZE the connections kept per host.
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+HTTP_POOL_BLOCK = os.getenv("HTTP_POOL_BLOCK", "False").lower() == "true"
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))  # seconds
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))  # seconds
+
+# Image Store Configuration
+# Generated images are stored on disk by content hash and served from
+# /api/images/<hash> instead of being inlined as base64 data URLs
+IMAGE_STORE_DIR = os.getenv(
+    "IMAGE_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "images")
+)
+IMAGE_STREAM_CHUNK_SIZE = int(os.getenv("IMAGE_STREAM_CHUNK_SIZE", str(64 * 1024)))  # bytes
+# Largest image accepted from the image service; bigger downloads are cut
+# off while streaming instead of filling the disk
+IMAGE_DOWNLOAD_MAX_BYTES = int(os.getenv("IMAGE_DOWNLOAD_MAX_BYTES", str(25 * 1024 * 1024)))
+IMAGE_CACHE_MAX_AGE = int(os.getenv("IMAGE_CACHE_MAX_AGE", str(365 * 24 * 3600)))  # seconds
+# Derived variants of generated images, requested as /api/images/<hash>?size=
+# and encoded as WebP / JPEG / PNG by the client's Accept header (or ?format=).
+# Longest side in pixels per size name.
+IMAGE_VARIANT_SIZES = {
+    name.strip(): int(px)
+    for name, px in (item.split("=", 1) for item in os.getenv(
+        "IMAGE_VARIANT_SIZES", "thumbnail=256,preview=512,full=1024").split(",") if "=" in item)
+}
+# Encoded in the background as soon as an image is generated; the other
+# combinations are made on first request
+IMAGE_VARIANT_PRERENDER = [
+    item.strip() for item in os.getenv(
+        "IMAGE_VARIANT_PRERENDER", "thumbnail:webp,preview:webp,full:webp,thumbnail:jpeg,preview:jpeg"
+    ).split(",") if ":" in item
+]
+# Longest a request waits for a missing variant before the original is served
+IMAGE_VARIANT_WAIT = float(os.getenv("IMAGE_VARIANT_WAIT", "5"))  # seconds
+IMAGE_VARIANT_QUALITY = int(os.getenv("IMAGE_VARIANT_QUALITY", "80"))
+# Image decoding / resizing / encoding runs in a pool of worker processes so
+# it never holds the GIL of a web worker (0 runs it inline). At most
+# IMAGE_POOL_MAX_QUEUE transforms are queued or running; more are shed.
+IMAGE_POOL_WORKERS = int(os.getenv("IMAGE_POOL_WORKERS", str(min(2, os.cpu_count() or 1))))
+IMAGE_POOL_MAX_QUEUE = int(os.getenv("IMAGE_POOL_MAX_QUEUE", "32"))
+# Seconds an image request waits for room in that queue
+IMAGE_POOL_QUEUE_WAIT = float(os.getenv("IMAGE_POOL_QUEUE_WAIT", "2"))
+
+# Uploads
+# Uploaded images are streamed to disk while they arrive and stored under
+# their content hash. Requests above MAX_UPLOAD_BYTES are refused with 413.
+UPLOAD_DIR = os.getenv(
+    "UPLOAD_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "uploads")
+)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+# Larger images are refused before any pixel is decoded (decompression bombs)
+MAX_UPLOAD_PIXELS = int(os.getenv("MAX_UPLOAD_PIXELS", str(40_000_000)))
+UPLOAD_RETENTION = int(os.getenv("UPLOAD_RETENTION", str(24 * 3600)))  # seconds
+# Dream Cat reference images are downscaled to this before Gemini sees them
+REFERENCE_IMAGE_MAX_SIDE = int(os.getenv("REFERENCE_IMAGE_MAX_SIDE", "768"))
+
+# Moderation Prefilter
+# Clear-cut cases (blocklisted terms, short everyday messages) are decided
+# locally; only ambiguous text is sent to Gemini
+MODERATION_PREFILTER_ENABLED = os.getenv("MODERATION_PREFILTER_ENABLED", "True").lower() == "true"
+MODERATION_BLOCKLIST_PATH = os.getenv(
+    "MODERATION_BLOCKLIST_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "moderation", "blocklist.txt")
+)
+MODERATION_ALLOWLIST_PATH = os.getenv(
+    "MODERATION_ALLOWLIST_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "moderation", "allowlist.txt")
+)
+# Comma-separated extra blocked terms
+MODERATION_EXTRA_BLOCKLIST = [term for term in os.getenv("MODERATION_EXTRA_BLOCKLIST", "").split(",") if term.strip()]
+# What to do when Gemini's verdict is missing or invalid (e.g. API errors):
+# True lets the text through, False blocks it
+MODERATION_FAIL_OPEN = os.getenv("MODERATION_FAIL_OPEN", "True").lower() == "true"
+# Longer messages always go to Gemini, even if every word is allowlisted
+MODERATION_PREFILTER_MAX_ALLOW_WORDS = int(os.getenv("MODERATION_PREFILTER_MAX_ALLOW_WORDS", "30"))
+
+# Local Cat Translation Engine
+# "never"    - always use Gemini
+# "fallback" - use the local rule-based engine when Gemini fails
+# "load"     - as fallback, and also when too many Gemini translations are
+#              already in flight in this process
+# "always"   - never call Gemini for translations
+TRANSLATOR_LOCAL_MODE = os.getenv("TRANSLATOR_LOCAL_MODE", "fallback").lower()
+TRANSLATOR_LOAD_THRESHOLD = int(os.getenv("TRANSLATOR_LOAD_THRESHOLD", "16"))
+
+# Breed matching: answer from the local breed catalog when its top match is at
+# least this confident (0-1); below it, ask Gemini. 0 always uses the catalog
+# when it has any match, above 1 always uses Gemini.
+BREED_MATCH_LOCAL_THRESHOLD = float(os.getenv("BREED_MATCH_LOCAL_THRESHOLD", "0.55"))
+# A local answer also needs a clear winner: the top score must beat the
+# runner-up by this fraction, and rest on at least this many matched features
+# (naming the breed is enough on its own)
+BREED_MATCH_LOCAL_MARGIN = float(os.getenv("BREED_MATCH_LOCAL_MARGIN", "0.15"))
+BREED_MATCH_LOCAL_MIN_FEATURES = int(os.getenv("BREED_MATCH_LOCAL_MIN_FEATURES", "2"))
+
+# Single-flight: concurrent identical Gemini / image calls share one upstream
+# request. The timeouts bound how long a caller waits on someone else's call.
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "True").lower() == "true"
+SINGLE_FLIGHT_GEMINI_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_GEMINI_TIMEOUT", "30"))
+SINGLE_FLIGHT_IMAGE_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_IMAGE_TIMEOUT", "60"))
+
+# Resilience
+# Time budget for one API request; Gemini and image calls get whatever is
+# left (capped by GEMINI_TIMEOUT / HTTP_READ_TIMEOUT). Clients may ask for a
+# shorter budget with the X-Request-Timeout header (seconds).
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "60"))
+# Calls are not started with less than this many seconds left
+MIN_CALL_TIMEOUT = float(os.getenv("MIN_CALL_TIMEOUT", "0.5"))
+# Retries for transient upstream errors (capped exponential backoff, full jitter)
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "4"))
+# Circuit breaker per upstream: open after this many consecutive failures,
+# probe again after the reset timeout
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+# Hedged image fetch: send a second request when the first is slower than
+# the observed p95 (never sooner than IMAGE_HEDGE_MIN_DELAY)
+IMAGE_HEDGE_ENABLED = os.getenv("IMAGE_HEDGE_ENABLED", "False").lower() == "true"
+IMAGE_HEDGE_MIN_DELAY = float(os.getenv("IMAGE_HEDGE_MIN_DELAY", "2"))
+
+# Local Animation Engine (cat videos)
+# Frames are rendered in a pool of VIDEO_RENDER_WORKERS processes per web
+# worker (0 renders in the request thread). MP4, and streamed WebP, need
+# ffmpeg at FFMPEG_PATH; without it WebP is encoded by Pillow in memory and
+# MP4 requests fall back to GIF.
+VIDEO_RENDER_WORKERS = int(os.getenv("VIDEO_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+VIDEO_DEFAULT_SIZE = int(os.getenv("VIDEO_DEFAULT_SIZE", "512"))  # longest side, pixels
+VIDEO_MAX_SIZE = int(os.getenv("VIDEO_MAX_SIZE", "1024"))
+VIDEO_DEFAULT_FRAMES = int(os.getenv("VIDEO_DEFAULT_FRAMES", "48"))
+VIDEO_MAX_FRAMES = int(os.getenv("VIDEO_MAX_FRAMES", "240"))
+VIDEO_FPS = int(os.getenv("VIDEO_FPS", "24"))
+FFMPEG_PATH = os.getenv("FFMPEG_PATH", "ffmpeg")
+
+# Metrics (served on /metrics in the Prometheus text format, per process).
+# Latency histogram bucket bounds are in seconds.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+METRICS_LATENCY_BUCKETS = [
+    float(bound) for bound in os.getenv(
+        "METRICS_LATENCY_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30,60"
+    ).split(",") if bound.strip()
+]
+
+# Tracing: spans per agent call, returned in API responses and linked by the
+# request ID in TRACE_REQUEST_ID_HEADER (generated when missing). With
+# TRACE_EXPORT_PATH set, a TRACE_SAMPLE_RATE share of traces (0-1), plus
+# every trace slower than TRACE_EXPORT_SLOW seconds (0 = off), is appended
+# to that file as JSON lines.
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "True").lower() == "true"
+TRACE_REQUEST_ID_HEADER = os.getenv("TRACE_REQUEST_ID_HEADER", "X-Request-ID")
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+TRACE_EXPORT_SLOW = float(os.getenv("TRACE_EXPORT_SLOW", "10"))
+
+# Pipeline Configuration
+# "concurrent" starts moderation and translation together and discards the
+# translation if moderation rejects the text. "sequential" moderates first and
+# only spends translation tokens on approved text.
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "concurrent").lower()
+PIPELINE_MODES = ("concurrent", "sequential")
+# Whether a request's pipeline_mode may switch a sequential deployment to
+# concurrent (asking for sequential is always allowed)
+PIPELINE_MODE_OVERRIDE = os.getenv("PIPELINE_MODE_OVERRIDE", "False").lower() == "true"
+PIPELINE_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", "8"))
+# Threads reading streamed translations (text-to-cat SSE), kept apart from
+# the pipeline pool; streams beyond this wait for a free thread, within the
+# request deadline
+STREAM_MAX_WORKERS = int(os.getenv("STREAM_MAX_WORKERS", "8"))
+
+# Batch translation: texts are packed into one Gemini request per pack,
+# bounded by item count and an estimated input token budget
+BATCH_PACK_SIZE = int(os.getenv("BATCH_PACK_SIZE", "20"))
+BATCH_PACK_MAX_TOKENS = int(os.getenv("BATCH_PACK_MAX_TOKENS", "1500"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+
+# Dream Cat step timeouts (seconds), counted from when a step starts running.
+# Moderation and prompt enhancement run side by side; breed matching and the
+# image fetch wait for an approving verdict (the fetch also for the enhanced
+# prompt), so rejected prompts never pay for them.
+DREAM_CAT_MODERATION_TIMEOUT = float(os.getenv("DREAM_CAT_MODERATION_TIMEOUT", "15"))
+DREAM_CAT_BREED_TIMEOUT = float(os.getenv("DREAM_CAT_BREED_TIMEOUT", "20"))
+DREAM_CAT_ENHANCE_TIMEOUT = float(os.getenv("DREAM_CAT_ENHANCE_TIMEOUT", "15"))
+DREAM_CAT_IMAGE_TIMEOUT = float(os.getenv("DREAM_CAT_IMAGE_TIMEOUT", "60"))
+# Worker threads for dream-cat steps, separate from the text pipeline's pool
+# so slow image steps cannot starve translations and streams (or vice versa)
+DREAM_CAT_MAX_WORKERS = int(os.getenv("DREAM_CAT_MAX_WORKERS", "16"))
 
 # Database Configuration (if needed in future)
 DATABASE_URL = os.getenv("DATABASE_URL", None)
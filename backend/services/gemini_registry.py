@@ -0,0 +1,131 @@
+"""
+Gemini Registry
+Owns the configured Gemini SDK and the model handles shared by all agents
+"""
+from typing import Dict, Any, Optional, Iterable
+import google.generativeai as genai
+import json
+import threading
+import time
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.settings import GEMINI_API_KEY, GEMINI_MODEL, GEMINI_API_ENDPOINT
+
+
+class GeminiRegistry:
+    """
+    Process-wide registry of Gemini model handles
+
+    The SDK is configured once, and each (model name, generation config)
+    pair is built once and then reused by every agent and request.
+    """
+
+    def __init__(self, api_key: str = GEMINI_API_KEY, api_endpoint: str = GEMINI_API_ENDPOINT):
+        self.api_key = api_key
+        self.api_endpoint = api_endpoint
+        self._models: Dict[str, genai.GenerativeModel] = {}
+        self._lock = threading.Lock()
+        self._configured = False
+
+    def configure(self) -> None:
+        """Configure the Gemini SDK (idempotent)"""
+        if self._configured:
+            return
+        with self._lock:
+            if not self._configured:
+                if self.api_endpoint:
+                    # Custom endpoints (e.g. http:// stand-ins) need REST
+                    genai.configure(api_key=self.api_key, transport="rest",
+                                    client_options={"api_endpoint": self.api_endpoint})
+                else:
+                    genai.configure(api_key=self.api_key)
+                self._configured = True
+
+    def get_model(self, model_name: str = GEMINI_MODEL,
+                  generation_config: Optional[Dict[str, Any]] = None) -> genai.GenerativeModel:
+        """
+        Return the shared model handle for a model name and generation config
+
+        Args:
+            model_name: Gemini model name (defaults to GEMINI_MODEL)
+            generation_config: Default generation config for the handle
+
+        Returns:
+            Configured GenerativeModel
+        """
+        key = json.dumps([model_name, generation_config], sort_keys=True)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        self.configure()
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                model = genai.GenerativeModel(
+                    model_name=model_name,
+                    generation_config=generation_config
+                )
+                self._models[key] = model
+        return model
+
+    def warm_up(self, model_names: Iterable[str] = (GEMINI_MODEL,), ping: bool = False) -> Dict[str, Any]:
+        """
+        Build model handles ahead of the first request
+
+        Args:
+            model_names: Models to prepare
+            ping: Also send a one-token request to open the connection
+
+        Returns:
+            Dictionary with the time spent per model
+        """
+        timings = {}
+        for name in model_names:
+            started = time.perf_counter()
+            model = self.get_model(name)
+            if ping:
+                try:
+                    model.generate_content("ping", generation_config={"max_output_tokens": 1})
+                except Exception as e:
+                    print(f"Gemini warm-up ping failed for {name}: {e}")
+            timings[name] = round((time.perf_counter() - started) * 1000, 1)
+        return {"warmed_up": timings}
+
+    def health_check(self, model_name: str = GEMINI_MODEL) -> Dict[str, Any]:
+        """
+        Check that the API key works and the model is reachable
+
+        Uses the model metadata endpoint, which costs no tokens.
+        """
+        self.configure()
+        started = time.perf_counter()
+        try:
+            genai.get_model(model_name)
+            status, error = "healthy", None
+        except Exception as e:
+            status, error = "unhealthy", str(e)
+        return {
+            "model": model_name,
+            "status": status,
+            "error": error,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "models_loaded": len(self._models)
+        }
+
+
+_registry: Optional[GeminiRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_gemini_registry() -> GeminiRegistry:
+    """
+    Return the process-wide Gemini registry
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = GeminiRegistry()
+    return _registry
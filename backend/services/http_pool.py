@@ -0,0 +1,105 @@
+"""
+HTTP Connection Pool
+Shared keep-alive session for all outbound HTTP made by the agents
+"""
+from typing import Dict, Any, Optional, Tuple
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.settings import (
+    HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_POOL_BLOCK,
+    HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+)
+
+# Default (connect, read) timeout for pooled requests
+DEFAULT_TIMEOUT: Tuple[float, float] = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+
+class PooledSession(requests.Session):
+    """
+    requests.Session with bounded per-host pools and usage counters
+
+    Connections are kept alive and reused across requests, so repeat calls to
+    the same host skip DNS, TCP and TLS setup. pool_maxsize bounds the
+    connections kept per host; with pool_block the caller waits for a free
+    connection instead of opening an extra one.
+    """
+
+    def __init__(self, pool_connections: int = HTTP_POOL_CONNECTIONS,
+                 pool_maxsize: int = HTTP_POOL_MAXSIZE,
+                 pool_block: bool = HTTP_POOL_BLOCK):
+        super().__init__()
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            max_retries=0
+        )
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        self._stats_lock = threading.Lock()
+        self.requests_sent = 0
+        self.errors = 0
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+        try:
+            response = super().request(method, url, **kwargs)
+        except requests.RequestException:
+            with self._stats_lock:
+                self.requests_sent += 1
+                self.errors += 1
+            raise
+        with self._stats_lock:
+            self.requests_sent += 1
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Pool usage: requests sent and, per host, connections opened versus
+        requests served (the difference is connection reuse)
+        """
+        hosts = {}
+        for adapter in set(self.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                hosts[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                    "connections_opened": pool.num_connections,
+                    "requests": pool.num_requests,
+                    "max_size": pool.pool.maxsize if pool.pool is not None else 0
+                }
+        return {
+            "requests": self.requests_sent,
+            "errors": self.errors,
+            "pool_connections": self.pool_connections,
+            "pool_maxsize": self.pool_maxsize,
+            "hosts": hosts
+        }
+
+
+_session: Optional[PooledSession] = None
+_session_pid: Optional[int] = None
+_session_lock = threading.Lock()
+
+
+def get_http_session() -> PooledSession:
+    """
+    Return the process-wide pooled session
+
+    Sockets must not be shared across a fork, so a gunicorn worker that
+    inherited a session from its parent builds its own.
+    """
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        with _session_lock:
+            if _session is None or _session_pid != os.getpid():
+                _session = PooledSession()
+                _session_pid = os.getpid()
+    return _session
@@ -0,0 +1,227 @@
+"""
+Image Pool
+Process pool for CPU-bound image transforms (decode, resize, encode)
+"""
+from typing import Dict, Any, Callable, Optional, Tuple
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import tempfile
+import threading
+import time
+import sys
+import os
+
+from PIL import Image, ImageOps
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.settings import IMAGE_POOL_WORKERS, IMAGE_POOL_MAX_QUEUE
+from services.rate_limiter import UpstreamOverloaded
+
+# Encoder options per output format
+ENCODE_OPTIONS = {
+    "jpeg": lambda quality: {"quality": quality, "optimize": True, "progressive": True},
+    "webp": lambda quality: {"quality": quality, "method": 4},
+    "png": lambda quality: {"optimize": True},
+}
+
+
+class ImagePoolBusy(UpstreamOverloaded):
+    """Too many image transforms queued; the work is shed (503)"""
+
+
+# ========================================
+# Transforms (run in the worker processes)
+# ========================================
+# Images are handed over as file paths: workers read the source from disk
+# and write the result next to its destination, so no image bytes are
+# pickled between processes.
+
+def _open_for(source_path: str, max_side: Optional[int]) -> Image.Image:
+    with Image.open(source_path) as image:
+        if max_side is not None:
+            # JPEG sources decode straight at a reduced scale when possible
+            image.draft("RGB", (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if max_side is not None and max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    return image
+
+
+def _save_atomic(image: Image.Image, dest_path: str, output_format: str, quality: int) -> None:
+    if output_format == "jpeg" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    # Write to a temp file and rename so readers never see partial files
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest_path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            image.save(f, format=output_format.upper(), **ENCODE_OPTIONS[output_format](quality))
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def resize_to_file(source_path: str, dest_path: str, max_side: Optional[int],
+                   output_format: str, quality: int = 80) -> Tuple[int, int]:
+    """
+    Fit an image into max_side x max_side (None keeps its size) and encode it
+
+    Returns:
+        The output (width, height)
+    """
+    image = _open_for(source_path, max_side)
+    _save_atomic(image, dest_path, output_format, quality)
+    return image.size
+
+
+# ========================================
+# Pool
+# ========================================
+
+class ImageProcessPool:
+    """
+    Process pool with a bounded queue
+
+    At most max_queue transforms are queued or running; past that, submit
+    waits briefly and then raises ImagePoolBusy, so a burst of image work
+    turns into fast 503s instead of an ever-growing backlog. Workers are
+    spawned (not forked) and replaced if one dies. With no workers,
+    transforms run in the calling thread.
+    """
+
+    def __init__(self, workers: int = IMAGE_POOL_WORKERS, max_queue: int = IMAGE_POOL_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max(1, max_queue)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cond = threading.Condition()
+        self.outstanding = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.restarts = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def submit(self, fn: Callable[..., Any], *args, wait: float = 0.0) -> "Future[Any]":
+        """
+        Queue a transform (a module-level function, called as fn(*args))
+
+        Args:
+            wait: Seconds to wait for room in the queue
+
+        Returns:
+            Future with fn's result
+
+        Raises:
+            ImagePoolBusy: If the queue stays full for wait seconds
+        """
+        if self.workers <= 0:
+            future: Future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        deadline = time.monotonic() + wait
+        with self._cond:
+            while self.outstanding >= self.max_queue:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.rejected += 1
+                    raise ImagePoolBusy(
+                        f"Image workers busy ({self.outstanding} transforms queued)", retry_after=1.0
+                    )
+                self._cond.wait(remaining)
+            self.outstanding += 1
+            self.submitted += 1
+            try:
+                executor = self._get_executor()
+                try:
+                    future = executor.submit(fn, *args)
+                except BrokenProcessPool:
+                    # A worker died earlier: start a fresh pool
+                    self._discard_executor(executor)
+                    executor = self._get_executor()
+                    future = executor.submit(fn, *args)
+            except BaseException:
+                self.outstanding -= 1
+                raise
+        future.add_done_callback(lambda done: self._done(done, executor))
+        return future
+
+    def _discard_executor(self, executor: ProcessPoolExecutor) -> None:
+        """
+        Drop a broken executor (called with _cond held) so the next submit
+        starts a new one; shutting it down stops its management thread
+        """
+        if self._executor is executor:
+            self._executor = None
+            self.restarts += 1
+        executor.shutdown(wait=False)
+
+    def _done(self, future: Future, executor: ProcessPoolExecutor) -> None:
+        # exception() raises CancelledError on a cancelled future
+        error = None if future.cancelled() else future.exception()
+        with self._cond:
+            self.outstanding -= 1
+            if future.cancelled() or error is not None:
+                self.failed += 1
+                if isinstance(error, BrokenProcessPool):
+                    self._discard_executor(executor)
+            else:
+                self.completed += 1
+            self._cond.notify()
+
+    def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None,
+            wait: float = 0.0) -> Any:
+        """
+        Run a transform and wait for its result
+
+        Raises:
+            ImagePoolBusy: If the queue is full
+            TimeoutError: If the result takes longer than timeout
+        """
+        return self.submit(fn, *args, wait=wait).result(timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "outstanding": self.outstanding,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "restarts": self.restarts
+            }
+
+
+_image_pool: Optional[ImageProcessPool] = None
+_image_pool_pid: Optional[int] = None
+_image_pool_lock = threading.Lock()
+
+
+def get_image_pool() -> ImageProcessPool:
+    """
+    Return this process's image pool (a forked child gets its own)
+    """
+    global _image_pool, _image_pool_pid
+    if _image_pool is None or _image_pool_pid != os.getpid():
+        with _image_pool_lock:
+            if _image_pool is None or _image_pool_pid != os.getpid():
+                _image_pool = ImageProcessPool()
+                _image_pool_pid = os.getpid()
+    return _image_pool
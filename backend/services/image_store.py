@@ -0,0 +1,214 @@
+"""
+Image Store
+Content-addressed storage for generated images (and cat videos) on local disk
+"""
+from typing import Optional, Iterable, Tuple
+import hashlib
+import re
+import tempfile
+import threading
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.settings import IMAGE_STORE_DIR, IMAGE_DOWNLOAD_MAX_BYTES
+
+# Magic numbers of the formats we serve
+IMAGE_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """
+    Detect an image MIME type from the first bytes of a file
+
+    Args:
+        head: At least the first 12 bytes of the image
+
+    Returns:
+        MIME type, or None if the bytes are not a supported image
+    """
+    for signature, content_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    # ISO base media (MP4): box size, then the 'ftyp' box type
+    if head[4:8] == b"ftyp":
+        return "video/mp4"
+    return None
+
+
+class ImageStore:
+    """
+    Stores images under the SHA-256 of their bytes
+
+    Identical images are stored once, files never change once written and
+    the digest doubles as a strong ETag, so they can be cached forever.
+    """
+
+    def __init__(self, root: str = IMAGE_STORE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def is_valid_digest(digest: str) -> bool:
+        return bool(DIGEST_PATTERN.match(digest))
+
+    @staticmethod
+    def is_image_type(content_type: Optional[str]) -> bool:
+        # sniff_image_type also knows videos (for put_file); put_stream only
+        # takes images
+        return content_type is not None and content_type.startswith("image/")
+
+    def path_for(self, digest: str) -> str:
+        # Two-level fan-out keeps directories small
+        return os.path.join(self.root, digest[:2], digest)
+
+    def exists(self, digest: str) -> bool:
+        return self.is_valid_digest(digest) and os.path.exists(self.path_for(digest))
+
+    def put(self, data: bytes) -> str:
+        """
+        Store image bytes
+
+        Args:
+            data: Encoded image
+
+        Returns:
+            Hex SHA-256 digest identifying the image
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            return digest
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file and rename so readers never see partial files
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest
+
+    def put_stream(self, chunks: Iterable[bytes],
+                   max_bytes: int = IMAGE_DOWNLOAD_MAX_BYTES) -> Tuple[str, str, int]:
+        """
+        Store an image from a stream of chunks without buffering it whole
+
+        The bytes are hashed while they are written to a temp file, and the
+        type is sniffed from the first bytes instead of decoding the image.
+        A stream that is not an image, or grows past max_bytes, is abandoned
+        as soon as that is known, without reading the rest.
+
+        Args:
+            chunks: Iterable of byte strings (e.g. response.iter_content())
+            max_bytes: Largest image accepted
+
+        Returns:
+            Tuple of (digest, content type, size in bytes)
+
+        Raises:
+            ValueError: If the stream is not a supported image or is larger
+                        than max_bytes
+        """
+        hasher = hashlib.sha256()
+        head = b""
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    if not chunk:
+                        continue
+                    if len(head) < 16:
+                        head += chunk[:16 - len(head)]
+                        if len(head) == 16 and not self.is_image_type(sniff_image_type(head)):
+                            raise ValueError("Upstream response is not a supported image")
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise ValueError(f"Upstream image is larger than {max_bytes} bytes")
+                    hasher.update(chunk)
+                    f.write(chunk)
+
+            content_type = sniff_image_type(head)
+            if not self.is_image_type(content_type):
+                raise ValueError("Upstream response is not a supported image")
+
+            digest = hasher.hexdigest()
+            path = self.path_for(digest)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+            return digest, content_type, size
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def put_file(self, file_path: str) -> Tuple[str, str, int]:
+        """
+        Move a finished file into the store (e.g. a rendered video)
+
+        The file is hashed in chunks and renamed into place, so it must be on
+        the same filesystem as the store (create it under self.root).
+
+        Returns:
+            Tuple of (digest, content type, size in bytes)
+
+        Raises:
+            ValueError: If the file is not a supported format
+        """
+        hasher = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            head = f.read(16)
+            hasher.update(head)
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(chunk)
+        content_type = sniff_image_type(head)
+        if content_type is None:
+            os.remove(file_path)
+            raise ValueError("File is not a supported image or video")
+
+        digest = hasher.hexdigest()
+        path = self.path_for(digest)
+        size = os.path.getsize(file_path)
+        if os.path.exists(path):
+            os.remove(file_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(file_path, path)
+        return digest, content_type, size
+
+    def content_type(self, digest: str) -> str:
+        with open(self.path_for(digest), "rb") as f:
+            head = f.read(16)
+        return sniff_image_type(head) or "application/octet-stream"
+
+
+_image_store: Optional[ImageStore] = None
+_image_store_lock = threading.Lock()
+
+
+def get_image_store() -> ImageStore:
+    """
+    Return the process-wide image store
+    """
+    global _image_store
+    if _image_store is None:
+        with _image_store_lock:
+            if _image_store is None:
+                _image_store = ImageStore()
+    return _image_store
@@ -0,0 +1,200 @@
+"""
+Image Variants
+Resized and re-encoded copies of stored images, made off the request thread
+"""
+from typing import Dict, Any, Iterable, Optional, Tuple
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+import threading
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.settings import IMAGE_VARIANT_SIZES, IMAGE_VARIANT_PRERENDER, IMAGE_VARIANT_QUALITY
+from services.image_store import get_image_store, ImageStore
+from services.image_pool import get_image_pool, resize_to_file, ImagePoolBusy
+
+# Variant encodings, in order of preference when the client accepts several
+VARIANT_FORMATS = {
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+    "png": "image/png"
+}
+
+# Source types variants can be made from (not GIF animations or videos)
+VARIANT_SOURCE_TYPES = {"image/png", "image/jpeg", "image/webp"}
+
+
+def choose_format(accept: Iterable[Tuple[str, float]]) -> str:
+    """
+    Pick a variant encoding from an Accept header
+
+    WebP is sent only to clients that list it explicitly (browsers do);
+    anything else, including a bare */*, gets JPEG.
+
+    Args:
+        accept: (mimetype, quality) pairs, e.g. Flask's request.accept_mimetypes
+
+    Returns:
+        'webp', 'jpeg' or 'png'
+    """
+    accepted = {mimetype: quality for mimetype, quality in accept}
+    for name, mimetype in VARIANT_FORMATS.items():
+        if accepted.get(mimetype, 0) > 0:
+            return name
+    return "jpeg"
+
+
+def variant_url(image_id: str, size: Optional[str] = None, output_format: Optional[str] = None) -> str:
+    """
+    URL of an image variant; without size or format, the original
+    """
+    params = [f"{key}={value}" for key, value in (("size", size), ("format", output_format)) if value]
+    return f"/api/images/{image_id}" + (f"?{'&'.join(params)}" if params else "")
+
+
+class ImageVariants:
+    """
+    Size / format variants of images in the image store
+
+    Variants live next to the store under variants/<hash>/<size>.<format>.
+    The source never changes, so neither does a variant, and any worker
+    process can serve a variant another one rendered. Rendering runs in the
+    image process pool; a request that needs a missing variant waits for it
+    briefly.
+    """
+
+    def __init__(self, store: Optional[ImageStore] = None, sizes: Optional[Dict[str, int]] = None,
+                 quality: int = IMAGE_VARIANT_QUALITY):
+        self.store = store or get_image_store()
+        self.sizes = IMAGE_VARIANT_SIZES if sizes is None else sizes
+        self.quality = quality
+        self._pending: Dict[Tuple[str, str, str], Future] = {}
+        self._lock = threading.Lock()
+        self.rendered = 0
+        self.failed = 0
+        self.ready_hits = 0
+        self.waited = 0
+        self.wait_timeouts = 0
+
+    def is_valid(self, size: str, output_format: str) -> bool:
+        return size in self.sizes and output_format in VARIANT_FORMATS
+
+    def path_for(self, image_id: str, size: str, output_format: str) -> str:
+        return os.path.join(self.store.root, "variants", image_id[:2], image_id, f"{size}.{output_format}")
+
+    def urls(self, image_id: str) -> Dict[str, str]:
+        """URL per size name, encoding left to content negotiation"""
+        return {size: variant_url(image_id, size) for size in self.sizes}
+
+    def schedule(self, image_id: str, size: str, output_format: str) -> Optional[Future]:
+        """
+        Start rendering a variant in the background
+
+        Returns:
+            Future resolving to the variant's (width, height), or None if it
+            already exists
+
+        Raises:
+            ImagePoolBusy: If the image pool's queue is full
+        """
+        key = (image_id, size, output_format)
+        path = self.path_for(*key)
+        if os.path.exists(path):
+            return None
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                return future
+            future = get_image_pool().submit(
+                resize_to_file, self.store.path_for(image_id), path,
+                self.sizes[size], output_format, self.quality
+            )
+            self._pending[key] = future
+        # Outside the lock: the callback runs at once if the render is done
+        future.add_done_callback(lambda f: self._finished(key, f))
+        return future
+
+    def _finished(self, key: Tuple[str, str, str], future: Future) -> None:
+        with self._lock:
+            self._pending.pop(key, None)
+            if future.exception() is None:
+                self.rendered += 1
+            else:
+                self.failed += 1
+
+    def prerender(self, image_id: str) -> None:
+        """
+        Queue the IMAGE_VARIANT_PRERENDER variants of a new image
+        """
+        if self.store.content_type(image_id) not in VARIANT_SOURCE_TYPES:
+            return
+        for spec in IMAGE_VARIANT_PRERENDER:
+            size, output_format = spec.split(":", 1)
+            if self.is_valid(size, output_format):
+                try:
+                    self.schedule(image_id, size, output_format)
+                except ImagePoolBusy:
+                    # Rendered on first request instead
+                    return
+
+    def get(self, image_id: str, size: str, output_format: str, wait: float) -> Optional[str]:
+        """
+        Path of a variant, rendering it if needed
+
+        Args:
+            wait: Seconds to wait for a variant that is not ready yet
+
+        Returns:
+            The variant's path, or None if it is not ready within wait
+            seconds or could not be rendered
+        """
+        path = self.path_for(image_id, size, output_format)
+        if os.path.exists(path):
+            with self._lock:
+                self.ready_hits += 1
+            return path
+        try:
+            future = self.schedule(image_id, size, output_format)
+        except ImagePoolBusy:
+            return None
+        if future is None:
+            return path
+        with self._lock:
+            self.waited += 1
+        try:
+            future.result(timeout=wait)
+            return path
+        except FutureTimeout:
+            with self._lock:
+                self.wait_timeouts += 1
+            return None
+        except Exception as e:
+            print(f"Image variant {size}.{output_format} of {image_id} failed: {str(e)}")
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "rendered": self.rendered,
+                "failed": self.failed,
+                "ready_hits": self.ready_hits,
+                "waited": self.waited,
+                "wait_timeouts": self.wait_timeouts
+            }
+
+
+_image_variants: Optional[ImageVariants] = None
+_image_variants_lock = threading.Lock()
+
+
+def get_image_variants() -> ImageVariants:
+    """
+    Return the process-wide image variant renderer
+    """
+    global _image_variants
+    if _image_variants is None:
+        with _image_variants_lock:
+            if _image_variants is None:
+                _image_variants = ImageVariants()
+    return _image_variants
@@ -0,0 +1,256 @@
+"""
+Job Queue
+Bounded background worker pool for long-running generation requests
+"""
+from typing import Dict, Any, Callable, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import json
+import threading
+import time
+import uuid
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.settings import (
+    JOB_QUEUE_WORKERS, JOB_QUEUE_MAX_PENDING, JOB_TTL,
+    JOB_STORE_BACKEND, JOB_STORE_PATH, JOB_STORE_MAX_BYTES, RESPONSE_CACHE_COMPACTION_INTERVAL
+)
+from services.metrics import job_duration, job_failures
+
+
+class QueueFullError(Exception):
+    """Raised when the queue already holds JOB_QUEUE_MAX_PENDING jobs"""
+
+
+class Job:
+    """
+    A unit of background work and its outcome
+
+    status moves from 'queued' to 'running' to 'succeeded' or 'failed'.
+    """
+
+    def __init__(self, kind: str, dedupe_key: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.dedupe_key = dedupe_key
+        self.status = "queued"
+        self.result: Optional[Dict[str, Any]] = None
+        self.status_code: Optional[int] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.done = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "result": self.result,
+            "status_code": self.status_code,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+class JobQueue:
+    """
+    Runs jobs on a bounded thread pool and keeps their results for a TTL
+
+    Submitting a job whose dedupe key matches a queued or running job returns
+    the existing job instead of doing the work twice. With a shared store
+    (see get_job_store) job state is also written there, so any gunicorn
+    worker can answer a status poll.
+
+    Finished jobs are pruned after the TTL by whichever call (submit, get,
+    wait or stats) comes along first, at most every cleanup_interval seconds.
+    """
+
+    # Seconds between store reads while waiting on another worker's job
+    REMOTE_POLL_INTERVAL = 0.5
+
+    def __init__(self, max_workers: int = JOB_QUEUE_WORKERS,
+                 max_pending: int = JOB_QUEUE_MAX_PENDING, ttl: float = JOB_TTL,
+                 store=None):
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.store = store
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._active_by_key: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._wait_times = deque(maxlen=1000)
+        self.cleanup_interval = min(60.0, ttl / 10)
+        self._next_cleanup = 0.0
+        self.submitted = 0
+        self.deduplicated = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def submit(self, kind: str, fn: Callable[[], Tuple[Dict[str, Any], int]],
+               dedupe_key: Optional[str] = None) -> Tuple[Job, bool]:
+        """
+        Queue a job
+
+        Args:
+            kind: Job type label (e.g. 'dream-cat')
+            fn: Callable returning (response payload, HTTP status code)
+            dedupe_key: Identical pending jobs share one execution
+
+        Returns:
+            Tuple of (job, True if a new job was created)
+
+        Raises:
+            QueueFullError: If too many jobs are already pending
+        """
+        self._cleanup()
+        with self._lock:
+            if dedupe_key is not None:
+                existing = self._active_by_key.get(dedupe_key)
+                if existing is not None and not existing.finished:
+                    self.deduplicated += 1
+                    return existing, False
+
+            pending = sum(1 for job in self._jobs.values() if not job.finished)
+            if pending >= self.max_pending:
+                self.rejected += 1
+                raise QueueFullError(f"Job queue is full ({pending} pending)")
+
+            job = Job(kind, dedupe_key)
+            self._jobs[job.id] = job
+            if dedupe_key is not None:
+                self._active_by_key[dedupe_key] = job
+            self.submitted += 1
+
+        self._publish(job)
+        self.executor.submit(self._run, job, fn)
+        return job, True
+
+    def _run(self, job: Job, fn: Callable[[], Tuple[Dict[str, Any], int]]) -> None:
+        job.started_at = time.time()
+        job.status = "running"
+        with self._lock:
+            self._wait_times.append(job.started_at - job.created_at)
+        self._publish(job)
+        try:
+            job.result, job.status_code = fn()
+            job.status = "succeeded"
+        except Exception as e:
+            job.error = str(e)
+            # Errors such as UpstreamThrottled carry their own HTTP status
+            job.status_code = getattr(e, "status_code", 500)
+            job.status = "failed"
+            job_failures.labels(job.kind, type(e).__name__).inc()
+        job.finished_at = time.time()
+        job_duration.labels(job.kind, job.status).observe(job.finished_at - job.started_at)
+        with self._lock:
+            if job.status == "succeeded":
+                self.succeeded += 1
+            else:
+                self.failed += 1
+            if job.dedupe_key is not None and self._active_by_key.get(job.dedupe_key) is job:
+                del self._active_by_key[job.dedupe_key]
+        self._publish(job)
+        job.done.set()
+
+    @property
+    def shared(self) -> bool:
+        """True if every worker can read this queue's job state"""
+        return self.store is not None
+
+    def _publish(self, job: Job) -> None:
+        if self.store is not None:
+            self.store.set(f"job:{job.id}", json.dumps(job.to_dict()), self.ttl)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the job's state, including jobs run by other workers when
+        the queue has a shared store
+        """
+        self._cleanup()
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if self.store is None:
+            return None
+        stored = self.store.get(f"job:{job_id}")
+        return json.loads(stored) if stored is not None else None
+
+    def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Long-poll: block until the job finishes or the timeout elapses
+
+        Jobs run by another worker are polled in the shared store.
+        """
+        self._cleanup()
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.done.wait(timeout)
+            return self.get(job_id)
+        deadline = time.monotonic() + timeout
+        while True:
+            state = self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if state is None or state["status"] in ("succeeded", "failed") or remaining <= 0:
+                return state
+            time.sleep(min(self.REMOTE_POLL_INTERVAL, remaining))
+
+    def _cleanup(self) -> None:
+        # Drop finished jobs once their TTL has passed
+        now = time.monotonic()
+        if now < self._next_cleanup:
+            return
+        self._next_cleanup = now + self.cleanup_interval
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def stats(self) -> Dict[str, Any]:
+        self._cleanup()
+        with self._lock:
+            queued = sum(1 for job in self._jobs.values() if job.status == "queued")
+            running = sum(1 for job in self._jobs.values() if job.status == "running")
+            waits = sorted(self._wait_times)
+        return {
+            "queued": queued,
+            "running": running,
+            "max_pending": self.max_pending,
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "wait_ms_p50": round(waits[len(waits) // 2] * 1000, 1) if waits else 0.0,
+            "wait_ms_p95": round(waits[int(len(waits) * 0.95)] * 1000, 1) if waits else 0.0,
+            "wait_ms_max": round(waits[-1] * 1000, 1) if waits else 0.0
+        }
+
+
+def get_job_store():
+    """
+    Store shared by all workers for job state, or None when jobs are only
+    known to the worker that runs them (JOB_STORE_BACKEND=memory)
+
+    It is a separate SQLite file from the response cache, so response churn
+    cannot evict a job while it runs.
+    """
+    if JOB_STORE_BACKEND != "sqlite":
+        return None
+    from services.persistent_cache import SQLiteResponseCache
+    return SQLiteResponseCache(
+        JOB_STORE_PATH, JOB_STORE_MAX_BYTES,
+        compaction_interval=RESPONSE_CACHE_COMPACTION_INTERVAL
+    )
@@ -0,0 +1,445 @@
+"""
+Metrics
+Counters, gauges and histograms exposed in the Prometheus text format
+"""
+from typing import Dict, Any, Callable, Iterator, List, Optional, Sequence, Tuple
+from contextlib import contextmanager
+from bisect import bisect_left
+import threading
+import time
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.settings import METRICS_ENABLED, METRICS_LATENCY_BUCKETS
+from services.tracing import record_upstream
+
+# Prefix of every metric name
+NAMESPACE = "catplatform"
+
+# Bucket bounds for prompt / response sizes (characters) and image sizes (bytes)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536)
+BYTE_BUCKETS = (16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# Circuit breaker states as gauge values
+STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_START_TIME = time.time()
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _NoopChild:
+    """Returned by labels() when metrics are disabled"""
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def dec(self, amount: float = 1) -> None:
+        pass
+
+    def set(self, value: float) -> None:
+        pass
+
+    def observe(self, value: float) -> None:
+        pass
+
+
+_NOOP = _NoopChild()
+
+
+class _Metric:
+    """
+    A metric family: one child per combination of label values
+
+    Children are created on first use and looked up without locking
+    afterwards, so recording costs a dict lookup plus one small lock.
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = f"{NAMESPACE}_{name}"
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._children: Dict[LabelValues, Any] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: Any):
+        if not METRICS_ENABLED:
+            return _NOOP
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.label_names):
+                raise ValueError(f"{self.name} takes labels {self.label_names}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self) -> Iterator[Tuple[str, LabelValues, Sequence[str], float]]:
+        """(sample name, label values, extra label pairs, value) per sample"""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, values, extra, value in self.samples():
+            names = self.label_names + tuple(extra[0::2])
+            lines.append(f"{name}{_label_text(names, values + tuple(extra[1::2]))} {_number(value)}")
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name + "_total", documentation, label_names)
+
+    def _new_child(self):
+        return _Value()
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            yield self.name, values, (), child.value
+
+
+class Gauge(_Metric):
+    """Value that goes up and down (e.g. requests in flight)"""
+
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            yield self.name, values, (), child.value
+
+    @contextmanager
+    def track(self, *values: Any) -> Iterator[None]:
+        """Add one while the block runs"""
+        child = self.labels(*values)
+        child.inc()
+        try:
+            yield
+        finally:
+            child.dec()
+
+
+class _HistogramChild:
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = METRICS_LATENCY_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.bounds = tuple(sorted(float(bound) for bound in buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", values, ("le", _number(bound)), cumulative
+            yield f"{self.name}_sum", values, (), total
+            yield f"{self.name}_count", values, (), cumulative
+
+    @contextmanager
+    def time(self, *values: Any) -> Iterator[None]:
+        """Observe the block's duration in seconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.labels(*values).observe(time.perf_counter() - started)
+
+
+# ========================================
+# Registry
+# ========================================
+
+_metrics: List[_Metric] = []
+_collectors: List[Tuple[str, Callable[[], Dict[str, Any]], Optional[str]]] = []
+
+
+def _register(metric: _Metric) -> Any:
+    _metrics.append(metric)
+    return metric
+
+
+def register_stats(name: str, stats: Callable[[], Dict[str, Any]], keyed_by: Optional[str] = None) -> None:
+    """
+    Export a component's stats() dict as gauges, read at scrape time
+
+    Numeric values become <namespace>_<name>_<key> gauges; nested dicts with
+    identifier keys extend the name, other keys (hosts, buckets) go into a
+    'key' label. Circuit breaker states map to 0 (closed), 1 (half open)
+    and 2 (open); other strings are skipped.
+
+    Args:
+        name: Component name, e.g. 'response_cache'
+        stats: Returns the component's stats
+        keyed_by: Label name when stats() returns one dict per instance
+                  (e.g. 'upstream' for the circuit breakers)
+    """
+    _collectors.append((name, stats, keyed_by))
+
+
+def _flatten(name: str, value: Any, labels: Tuple[Tuple[str, str], ...]
+             ) -> Iterator[Tuple[str, Tuple[Tuple[str, str], ...], float]]:
+    if isinstance(value, (bool, int, float)):
+        yield name, labels, float(value)
+    elif isinstance(value, str) and value in STATE_VALUES:
+        yield name, labels, STATE_VALUES[value]
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            if key.isidentifier():
+                yield from _flatten(f"{name}_{key}", item, labels)
+            else:
+                yield from _flatten(name, item, labels + (("key", key),))
+
+
+def _collect_stats() -> List[str]:
+    families: Dict[str, List[str]] = {}
+    for component, stats, keyed_by in _collectors:
+        try:
+            data = stats()
+        except Exception as e:
+            print(f"Metrics: could not read {component} stats: {str(e)}")
+            continue
+        instances = data.items() if keyed_by else [(None, data)]
+        for instance, instance_stats in instances:
+            labels = ((keyed_by, instance),) if keyed_by else ()
+            for name, sample_labels, value in _flatten(f"{NAMESPACE}_{component}", instance_stats, labels):
+                names = [label for label, _ in sample_labels]
+                values = [label_value for _, label_value in sample_labels]
+                families.setdefault(name, []).append(f"{name}{_label_text(names, values)} {_number(value)}")
+    lines = []
+    for name, samples in families.items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(samples)
+    return lines
+
+
+def _process_lines() -> List[str]:
+    lines = [
+        "# TYPE process_start_time_seconds gauge",
+        f"process_start_time_seconds {_number(round(_START_TIME, 3))}"
+    ]
+    try:
+        with open("/proc/self/statm") as f:
+            rss_pages = int(f.read().split()[1])
+        lines += [
+            "# TYPE process_resident_memory_bytes gauge",
+            f"process_resident_memory_bytes {rss_pages * os.sysconf('SC_PAGE_SIZE')}"
+        ]
+    except (OSError, ValueError, IndexError):
+        pass
+    return lines
+
+
+def render() -> str:
+    """
+    All metrics of this process in the Prometheus text format (0.0.4)
+
+    Metrics live in process memory: behind gunicorn each scrape reports the
+    worker that answered it, so scrape every worker (or run one per
+    container) and sum in the query.
+    """
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    lines.extend(_collect_stats())
+    lines.extend(_process_lines())
+    return "\n".join(lines) + "\n"
+
+
+# ========================================
+# Application metrics
+# ========================================
+
+http_requests = _register(Counter(
+    "http_requests", "HTTP requests by endpoint, method and status", ("endpoint", "method", "status")
+))
+http_request_duration = _register(Histogram(
+    "http_request_duration_seconds",
+    "Time to produce an HTTP response (streamed bodies excluded)",
+    ("endpoint", "method", "status")
+))
+http_requests_in_flight = _register(Gauge(
+    "http_requests_in_flight", "HTTP requests being handled", ("endpoint",)
+))
+
+agent_call_duration = _register(Histogram(
+    "agent_call_duration_seconds",
+    "Agent calls by outcome (ok, cache_hit, coalesced, error, throttled)",
+    ("agent", "operation", "outcome")
+))
+gemini_request_duration = _register(Histogram(
+    "gemini_request_duration_seconds",
+    "Gemini requests actually sent, one per attempt",
+    ("agent", "model", "outcome")
+))
+gemini_requests_in_flight = _register(Gauge(
+    "gemini_requests_in_flight", "Gemini requests awaiting a response", ("agent",)
+))
+gemini_prompt_chars = _register(Histogram(
+    "gemini_prompt_chars", "Prompt size sent to Gemini (characters)", ("agent",), buckets=SIZE_BUCKETS
+))
+gemini_response_chars = _register(Histogram(
+    "gemini_response_chars", "Response size from Gemini (characters)", ("agent",), buckets=SIZE_BUCKETS
+))
+gemini_tokens = _register(Counter(
+    "gemini_tokens", "Tokens reported in Gemini usage metadata", ("agent", "model", "type")
+))
+upstream_errors = _register(Counter(
+    "upstream_errors", "Failed upstream calls by exception class", ("upstream", "agent", "error")
+))
+image_fetch_duration = _register(Histogram(
+    "image_fetch_duration_seconds",
+    "Time to first byte of Pollinations image requests",
+    ("outcome",)
+))
+image_fetch_bytes = _register(Histogram(
+    "image_fetch_bytes", "Size of images fetched from Pollinations", (), buckets=BYTE_BUCKETS
+))
+pipeline_duration = _register(Histogram(
+    "pipeline_duration_seconds",
+    "Orchestrator runs by pipeline, mode and final status",
+    ("pipeline", "mode", "status")
+))
+job_duration = _register(Histogram(
+    "job_duration_seconds",
+    "Background jobs from start to finish by kind and final status",
+    ("kind", "status")
+))
+job_failures = _register(Counter(
+    "job_failures", "Failed background jobs by exception class", ("kind", "error")
+))
+
+# Gemini usage_metadata fields and their 'type' label
+TOKEN_FIELDS = (
+    ("prompt_token_count", "prompt"),
+    ("candidates_token_count", "response"),
+    ("total_token_count", "total")
+)
+
+
+def record_gemini_response(agent: str, model: str, response: Any, text: Optional[str] = None) -> None:
+    """
+    Record token usage and response size of a Gemini response
+
+    Args:
+        response: A GenerateContentResponse (or the last chunk of a stream,
+                  which carries the usage of the whole answer)
+        text: Response text, if already read
+    """
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        for field, token_type in TOKEN_FIELDS:
+            count = getattr(usage, field, 0)
+            if count:
+                gemini_tokens.labels(agent, model, token_type).inc(count)
+    if text is not None:
+        gemini_response_chars.labels(agent).observe(len(text))
+
+
+def outcome_of(error: BaseException) -> str:
+    """'throttled' for calls shed by admission control, else 'error'"""
+    # Imported here: rate_limiter does not depend on metrics
+    from services.rate_limiter import UpstreamThrottled
+    return "throttled" if isinstance(error, UpstreamThrottled) else "error"
+
+
+@contextmanager
+def track_gemini_request(agent: str, model: str, prompt_chars: int) -> Iterator[None]:
+    """
+    Time one Gemini request and count it in flight; errors are recorded by
+    class and re-raised. The time also counts as upstream wait on the
+    current trace span.
+    """
+    gemini_prompt_chars.labels(agent).observe(prompt_chars)
+    in_flight = gemini_requests_in_flight.labels(agent)
+    in_flight.inc()
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except GeneratorExit:
+        # A streamed answer the client stopped reading
+        outcome = "cancelled"
+        raise
+    except BaseException as e:
+        outcome = outcome_of(e)
+        upstream_errors.labels("gemini", agent, type(e).__name__).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        in_flight.dec()
+        gemini_request_duration.labels(agent, model, outcome).observe(elapsed)
+        record_upstream(elapsed)
@@ -0,0 +1,223 @@
+"""
+Persistent Response Cache
+SQLite (WAL mode) cache shared by every gunicorn worker on the host
+"""
+from typing import Dict, Any, Optional, Tuple
+import sqlite3
+import threading
+import time
+import os
+
+
+class SQLiteResponseCache:
+    """
+    Response cache stored in a local SQLite file
+
+    WAL mode lets all worker processes read concurrently while one writes, and
+    the file survives restarts and deploys so the cache comes back warm. Size
+    is bounded by evicting least recently used rows during compaction, which
+    runs on a background thread in each process.
+    """
+
+    # Reads refresh last_access at most this often (seconds) to avoid a
+    # write on every hit
+    ACCESS_RESOLUTION = 60
+
+    def __init__(self, path: str, max_bytes: int, compaction_interval: float = 300):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.compaction_interval = compaction_interval
+        self._local = threading.local()
+        self._compactor: Optional[threading.Thread] = None
+        self._compactor_pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread and per process (connections must not
+        # cross a fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _init_schema(self) -> None:
+        conn = self._connect()
+        # auto_vacuum has to be chosen before the first table is created
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_access ON cache(last_access)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_expires_at ON cache(expires_at)")
+
+    def lookup(self, key: str) -> Tuple[Optional[str], float]:
+        """
+        Return (value, seconds of TTL left), or (None, 0) on a miss
+        """
+        self._ensure_compactor()
+        now = time.time()
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                self.misses += 1
+                return None, 0.0
+            conn.execute(
+                "UPDATE cache SET last_access = ? WHERE key = ? AND last_access < ?",
+                (now, key, now - self.ACCESS_RESOLUTION)
+            )
+        except sqlite3.Error as e:
+            print(f"Persistent cache read failed: {e}")
+            self.misses += 1
+            return None, 0.0
+        self.hits += 1
+        return row[0], row[1] - now
+
+    def get(self, key: str) -> Optional[str]:
+        return self.lookup(key)[0]
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        size = len(key) + len(value.encode("utf-8"))
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        now = time.time()
+        try:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now + ttl, now)
+            )
+        except sqlite3.Error as e:
+            print(f"Persistent cache write failed: {e}")
+
+    def clear(self) -> None:
+        self._connect().execute("DELETE FROM cache")
+
+    def compact(self) -> Dict[str, int]:
+        """
+        Drop expired rows, evict LRU rows above max_bytes and reclaim space
+
+        Returns:
+            Dictionary with the number of expired and evicted rows
+        """
+        conn = self._connect()
+        expired = conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),)).rowcount
+        evicted = 0
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        while total > self.max_bytes:
+            # Evict in batches, oldest access first
+            rows = conn.execute(
+                "SELECT key, size FROM cache ORDER BY last_access LIMIT 256"
+            ).fetchall()
+            if not rows:
+                break
+            freed = 0
+            batch = []
+            for key, size in rows:
+                batch.append((key,))
+                freed += size
+                if total - freed <= self.max_bytes:
+                    break
+            conn.executemany("DELETE FROM cache WHERE key = ?", batch)
+            evicted += len(batch)
+            total -= freed
+        self.evictions += evicted
+        conn.execute("PRAGMA incremental_vacuum")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return {"expired": expired, "evicted": evicted}
+
+    def _ensure_compactor(self) -> None:
+        # Threads do not survive a fork, so each worker starts its own
+        if self.compaction_interval <= 0 or self._compactor_pid == os.getpid():
+            return
+        with self._lock:
+            if self._compactor_pid == os.getpid():
+                return
+            self._compactor_pid = os.getpid()
+            self._compactor = threading.Thread(
+                target=self._compaction_loop, name="cache-compactor", daemon=True
+            )
+            self._compactor.start()
+
+    def _compaction_loop(self) -> None:
+        while True:
+            time.sleep(self.compaction_interval)
+            try:
+                self.compact()
+            except sqlite3.Error as e:
+                print(f"Persistent cache compaction failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            entries, size = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+            ).fetchone()
+        except sqlite3.Error:
+            entries, size = None, None
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "entries": entries,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class TieredResponseCache:
+    """
+    In-process LRU in front of the shared persistent cache
+
+    Hits in the persistent tier are promoted into memory for the rest of
+    their TTL, so hot keys stop touching SQLite.
+    """
+
+    def __init__(self, memory, persistent: SQLiteResponseCache):
+        self.memory = memory
+        self.persistent = persistent
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+        value, ttl_left = self.persistent.lookup(key)
+        if value is not None:
+            self.memory.set(key, value, ttl_left)
+        return value
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        self.memory.set(key, value, ttl)
+        self.persistent.set(key, value, ttl)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        self.persistent.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "memory": self.memory.stats(),
+            "persistent": self.persistent.stats()
+        }
@@ -0,0 +1,372 @@
+"""
+Rate Limiter
+Client-side token buckets and adaptive concurrency in front of Gemini
+"""
+from typing import Dict, Any, Optional, Iterator, List
+from contextlib import contextmanager
+import threading
+import time
+import sys
+import os
+
+from google.api_core import exceptions as google_exceptions
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.settings import (
+    GEMINI_LIMITER_ENABLED, GEMINI_RATE_LIMIT_RPM, GEMINI_RATE_LIMIT_BURST,
+    GEMINI_AGENT_RATE_LIMITS, GEMINI_CONCURRENCY_INITIAL, GEMINI_CONCURRENCY_MIN,
+    GEMINI_CONCURRENCY_MAX, GEMINI_LIMITER_MAX_WAIT, GEMINI_LIMITER_MAX_QUEUE,
+    GEMINI_LATENCY_TOLERANCE, GEMINI_QUOTA_BACKOFF
+)
+
+
+class UpstreamThrottled(Exception):
+    """
+    Raised instead of calling Gemini when the request has to be shed
+
+    status_code and retry_after are what the Flask error handler sends back.
+    """
+
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimitExceeded(UpstreamThrottled):
+    """Quota exhausted, locally (token bucket) or reported by Gemini"""
+
+    status_code = 429
+
+
+class UpstreamOverloaded(UpstreamThrottled):
+    """Too many Gemini calls in flight and the wait queue is full or too slow"""
+
+    status_code = 503
+
+
+def is_quota_error(error: BaseException) -> bool:
+    """
+    True if a Gemini SDK error means we are over quota
+    """
+    return isinstance(error, (google_exceptions.ResourceExhausted,
+                              google_exceptions.TooManyRequests))
+
+
+class TokenBucket:
+    """
+    Requests-per-minute bucket that lets callers reserve future tokens
+
+    A caller that finds the bucket empty takes a token "on credit" and is
+    told how long to sleep, which queues callers in arrival order without a
+    separate queue. Reservations further out than the caller's wait budget
+    are refused.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        # Default burst: five seconds' worth of requests
+        self.capacity = burst if burst else max(1.0, self.rate * 5)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """
+        Take one token
+
+        Returns:
+            Seconds to wait before using it, or None if that would exceed
+            max_wait (nothing is taken in that case)
+        """
+        with self._lock:
+            self._refill()
+            self.tokens -= 1
+            wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+            if wait > max_wait:
+                self.tokens += 1
+                return None
+            return wait
+
+    def refund(self) -> None:
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Empty the bucket so no token is available for the next seconds
+        """
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+    def retry_after(self) -> float:
+        with self._lock:
+            self._refill()
+            return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Concurrency limit tuned by additive increase / multiplicative decrease
+
+    Each successful call at normal latency raises the limit by 1/limit
+    (about +1 per round trip at full load). A quota error halves it, and a
+    call much slower than the best recent latency trims it by 10%, at most
+    once per second so one burst of failures is one congestion signal.
+
+    The best recent latency is tracked per key (model and operation), so a
+    long batch or streamed answer is only compared with calls of its kind.
+    """
+
+    def __init__(self, initial: int = GEMINI_CONCURRENCY_INITIAL,
+                 minimum: int = GEMINI_CONCURRENCY_MIN, maximum: int = GEMINI_CONCURRENCY_MAX,
+                 max_queue: int = GEMINI_LIMITER_MAX_QUEUE,
+                 latency_tolerance: float = GEMINI_LATENCY_TOLERANCE):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.max_queue = max_queue
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.waiting = 0
+        self.baseline_latency: Dict[str, float] = {}
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: float) -> None:
+        """
+        Wait up to timeout seconds for a slot
+
+        Raises:
+            UpstreamOverloaded: If the wait queue is full or the wait timed out
+        """
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return
+            if self.waiting >= self.max_queue:
+                raise UpstreamOverloaded(
+                    f"Too many Gemini requests waiting ({self.waiting})", retry_after=1.0
+                )
+            deadline = time.monotonic() + timeout
+            self.waiting += 1
+            try:
+                while self.in_flight >= int(self.limit):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise UpstreamOverloaded(
+                            f"No Gemini capacity within {timeout:.1f}s", retry_after=1.0
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+
+    def release(self, latency: float, outcome: str, key: str = "default") -> None:
+        """
+        Return a slot and adjust the limit
+
+        Args:
+            latency: Seconds the call took
+            outcome: 'ok', 'throttled' (quota error) or 'error' (other
+                     failures, which do not move the limit)
+            key: Kind of call whose latency baseline the sample belongs to
+        """
+        with self._cond:
+            self.in_flight -= 1
+            if outcome == "throttled":
+                self._decrease(0.5)
+            elif outcome == "ok":
+                # Track the best recent latency, letting it drift up slowly
+                # so a permanently slower model does not look congested
+                baseline = self.baseline_latency.get(key)
+                if baseline is None or latency < baseline:
+                    baseline = latency
+                else:
+                    baseline += 0.01 * (latency - baseline)
+                self.baseline_latency[key] = baseline
+                if latency > self.latency_tolerance * baseline:
+                    self._decrease(0.9)
+                else:
+                    self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def _decrease(self, factor: float) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < 1.0:
+            return
+        self.limit = max(float(self.minimum), self.limit * factor)
+        self._last_decrease = now
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "baseline_latency_ms": {
+                    key: round(latency * 1000, 1) for key, latency in self.baseline_latency.items()
+                }
+            }
+
+
+class GeminiLimiter:
+    """
+    Process-wide admission control for Gemini calls
+
+    A call needs a token from its model's bucket, a token from its agent's
+    bucket (if that agent has a limit) and a concurrency slot. Callers wait
+    at most max_wait seconds in total; past that the call is shed with
+    RateLimitExceeded (429) or UpstreamOverloaded (503) instead of being
+    sent. A quota error from Gemini pauses the buckets for quota_backoff
+    seconds and halves concurrency, so clients are shed quickly instead of
+    piling retries onto an exhausted quota.
+    """
+
+    def __init__(self, model_rpm: float = GEMINI_RATE_LIMIT_RPM,
+                 burst: float = GEMINI_RATE_LIMIT_BURST,
+                 agent_rpm: Optional[Dict[str, float]] = None,
+                 max_wait: float = GEMINI_LIMITER_MAX_WAIT,
+                 quota_backoff: float = GEMINI_QUOTA_BACKOFF):
+        self.model_rpm = model_rpm
+        self.burst = burst
+        self.agent_rpm = GEMINI_AGENT_RATE_LIMITS if agent_rpm is None else agent_rpm
+        self.max_wait = max_wait
+        self.quota_backoff = quota_backoff
+        self.concurrency = AdaptiveConcurrencyLimiter()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.rate_limited = 0
+        self.overloaded = 0
+        self.quota_errors = 0
+
+    def _bucket(self, key: str, rpm: float) -> Optional[TokenBucket]:
+        if rpm <= 0:
+            return None
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.setdefault(key, TokenBucket(rpm, self.burst))
+        return bucket
+
+    def buckets_for(self, model: str, agent: str) -> List[TokenBucket]:
+        buckets = [
+            self._bucket(f"model:{model}", self.model_rpm),
+            self._bucket(f"agent:{agent}", self.agent_rpm.get(agent, 0))
+        ]
+        return [bucket for bucket in buckets if bucket is not None]
+
+    @contextmanager
+    def slot(self, model: str, agent: str, operation: str = "generate") -> Iterator[None]:
+        """
+        Hold admission for one Gemini call
+
+        Usage:
+            with limiter.slot(model_name, agent_type):
+                response = model.generate_content(...)
+
+        Args:
+            model: Model name (its token bucket)
+            agent: Agent making the call (its token bucket, if limited)
+            operation: Kind of call, e.g. 'generate', 'stream' or 'batch';
+                       latency is only compared between calls of one kind
+
+        Raises:
+            RateLimitExceeded: If no token is available within max_wait, or
+                               Gemini reported a quota error
+            UpstreamOverloaded: If no concurrency slot is free within max_wait
+        """
+        started = time.monotonic()
+        buckets = self.buckets_for(model, agent)
+        reserved: List[TokenBucket] = []
+        wait = 0.0
+        for bucket in buckets:
+            bucket_wait = bucket.reserve(self.max_wait)
+            if bucket_wait is None:
+                for taken in reserved:
+                    taken.refund()
+                with self._lock:
+                    self.rate_limited += 1
+                raise RateLimitExceeded(
+                    f"Gemini rate limit reached for {agent} on {model}",
+                    retry_after=bucket.retry_after()
+                )
+            reserved.append(bucket)
+            wait = max(wait, bucket_wait)
+        if wait > 0:
+            time.sleep(wait)
+
+        try:
+            self.concurrency.acquire(max(0.0, self.max_wait - (time.monotonic() - started)))
+        except UpstreamOverloaded:
+            # Never sent: give the tokens back
+            for bucket in reserved:
+                bucket.refund()
+            with self._lock:
+                self.overloaded += 1
+            raise
+        with self._lock:
+            self.admitted += 1
+
+        call_started = time.monotonic()
+        outcome = "error"
+        try:
+            yield
+            outcome = "ok"
+        except Exception as e:
+            if not is_quota_error(e):
+                raise
+            outcome = "throttled"
+            with self._lock:
+                self.quota_errors += 1
+            for bucket in buckets:
+                bucket.pause(self.quota_backoff)
+            raise RateLimitExceeded("Gemini quota exceeded", retry_after=self.quota_backoff) from e
+        finally:
+            self.concurrency.release(time.monotonic() - call_started, outcome, f"{model}:{operation}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            buckets = {key: round(bucket.tokens, 2) for key, bucket in self._buckets.items()}
+            counters = {
+                "admitted": self.admitted,
+                "rate_limited": self.rate_limited,
+                "overloaded": self.overloaded,
+                "quota_errors": self.quota_errors
+            }
+        return {**counters, "tokens": buckets, "concurrency": self.concurrency.stats()}
+
+
+class _NoLimiter:
+    """Stand-in used when GEMINI_LIMITER_ENABLED is off"""
+
+    @contextmanager
+    def slot(self, model: str, agent: str, operation: str = "generate") -> Iterator[None]:
+        yield
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": False}
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_gemini_limiter():
+    """
+    Return the process-wide Gemini limiter
+    """
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = GeminiLimiter() if GEMINI_LIMITER_ENABLED else _NoLimiter()
+    return _limiter
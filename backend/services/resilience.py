@@ -0,0 +1,373 @@
+"""
+Resilience
+Deadlines, retries, circuit breakers and hedged requests for upstream calls
+"""
+from typing import Dict, Any, Callable, Optional, TypeVar
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from contextvars import ContextVar, Token, copy_context
+from collections import deque
+import random
+import threading
+import time
+import sys
+import os
+
+import requests
+from google.api_core import exceptions as google_exceptions
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.settings import (
+    MIN_CALL_TIMEOUT, RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY,
+    CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT
+)
+from services.rate_limiter import UpstreamThrottled
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(UpstreamThrottled):
+    """Not enough of the request's time budget left to make the call"""
+
+    status_code = 504
+
+
+class CircuitOpenError(UpstreamThrottled):
+    """The upstream is marked unhealthy and the call was not attempted"""
+
+    status_code = 503
+
+
+# ========================================
+# Deadlines
+# ========================================
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(seconds: float):
+    """
+    Give the enclosed work a time budget (nested scopes only shrink it)
+    """
+    token = start_deadline(seconds)
+    try:
+        yield
+    finally:
+        end_deadline(token)
+
+
+def start_deadline(seconds: float) -> Token:
+    """
+    Open a deadline scope that outlives the current function (e.g. from a
+    Flask before_request hook); close it with end_deadline(token)
+    """
+    current = _deadline.get()
+    deadline = time.monotonic() + seconds
+    return _deadline.set(deadline if current is None else min(current, deadline))
+
+
+def end_deadline(token: Token) -> None:
+    _deadline.reset(token)
+
+
+def remaining_budget() -> Optional[float]:
+    """
+    Seconds left in the current deadline scope, or None if there is none
+    """
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def call_timeout(default: float) -> float:
+    """
+    Timeout for one upstream call: the default, cut to the remaining budget
+
+    Raises:
+        DeadlineExceeded: If less than MIN_CALL_TIMEOUT is left
+    """
+    remaining = remaining_budget()
+    if remaining is None:
+        return default
+    if remaining < MIN_CALL_TIMEOUT:
+        raise DeadlineExceeded("Request deadline exceeded", retry_after=1.0)
+    return min(default, remaining)
+
+
+def submit_in_context(executor: Executor, fn: Callable[..., T], *args, **kwargs) -> "Future[T]":
+    """
+    executor.submit that carries the caller's deadline into the worker thread
+    """
+    return executor.submit(copy_context().run, fn, *args, **kwargs)
+
+
+# ========================================
+# Retries
+# ========================================
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    True for upstream failures worth retrying: timeouts, connection errors
+    and 5xx responses. Quota errors are left to the rate limiter.
+    """
+    if isinstance(error, UpstreamThrottled):
+        return False
+    if isinstance(error, (google_exceptions.ServerError, google_exceptions.RetryError)):
+        return True
+    if isinstance(error, (requests.Timeout, requests.ConnectionError, TimeoutError, ConnectionError)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500
+    return False
+
+
+def backoff_delay(attempt: int, base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY) -> float:
+    """
+    Capped exponential backoff with full jitter for the given retry (0-based)
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+# Retries made on this thread's current call, read by callers for reporting
+_retry_state = threading.local()
+
+
+def retry_call(fn: Callable[[], T], is_retryable: Callable[[BaseException], bool] = is_transient_error,
+               attempts: int = RETRY_MAX_ATTEMPTS) -> T:
+    """
+    Call fn, retrying retryable errors with jittered backoff
+
+    A retry is skipped when the backoff would not leave time for another
+    call within the current deadline.
+
+    Args:
+        fn: The upstream call
+        is_retryable: Decides whether an error is worth another attempt
+        attempts: Total attempts including the first
+
+    Returns:
+        fn's result
+
+    Raises:
+        Exception: The last error once retries are exhausted
+    """
+    _retry_state.count = 0
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == attempts - 1 or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt)
+            remaining = remaining_budget()
+            if remaining is not None and remaining - delay < MIN_CALL_TIMEOUT:
+                raise
+            print(f"Retrying after {type(e).__name__} (attempt {attempt + 2}/{attempts}) in {delay:.2f}s")
+            _retry_state.count = attempt + 1
+            time.sleep(delay)
+
+
+def last_retry_count() -> int:
+    """Retries made by this thread's last retry_call"""
+    return getattr(_retry_state, "count", 0)
+
+
+# ========================================
+# Circuit breakers
+# ========================================
+
+class CircuitBreaker:
+    """
+    Per-upstream breaker: closed -> open -> half-open -> closed
+
+    After failure_threshold consecutive transient failures the breaker opens
+    and calls fail immediately with CircuitOpenError. After reset_timeout a
+    single probe call is let through (half-open); its success closes the
+    breaker, its failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_TIMEOUT,
+                 is_failure: Callable[[BaseException], bool] = is_transient_error):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.times_opened = 0
+
+    def _before_call(self) -> None:
+        with self._lock:
+            if self.state == "closed":
+                return
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            self.rejected += 1
+            retry_after = max(1.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+        raise CircuitOpenError(f"{self.name} is unavailable (circuit open)", retry_after=retry_after)
+
+    def _record(self, failed: bool) -> None:
+        with self._lock:
+            probe = self._probe_in_flight
+            self._probe_in_flight = False
+            if not failed:
+                self.consecutive_failures = 0
+                self.state = "closed"
+                return
+            self.consecutive_failures += 1
+            if probe or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                    print(f"Circuit for {self.name} opened after {self.consecutive_failures} failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    @contextmanager
+    def guard(self):
+        """
+        Wrap one upstream call
+
+        Raises:
+            CircuitOpenError: If the breaker is open
+        """
+        self._before_call()
+        try:
+            yield
+        except UpstreamThrottled:
+            # Shed before reaching the upstream: no verdict on its health
+            self._release_probe()
+            raise
+        except Exception as e:
+            self._record(self.is_failure(e))
+            raise
+        except BaseException:
+            # Interrupted (e.g. a closed generator): no verdict either
+            self._release_probe()
+            raise
+        else:
+            self._record(False)
+
+    def _release_probe(self) -> None:
+        with self._lock:
+            self._probe_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == "open" and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """
+    Return the process-wide breaker for an upstream (e.g. 'gemini')
+    """
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+
+def circuit_breaker_stats() -> Dict[str, Any]:
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: breaker.stats() for name, breaker in breakers.items()}
+
+
+# ========================================
+# Hedged requests
+# ========================================
+
+class LatencyTracker:
+    """
+    Recent latencies of an upstream, for picking a hedge delay
+    """
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.samples = deque(maxlen=size)
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        The p-th percentile, or None until enough samples were seen
+        """
+        with self._lock:
+            if len(self.samples) < self.min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+_hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+
+def hedged_call(fn: Callable[[], T], hedge_after: Optional[float],
+                discard: Optional[Callable[[T], None]] = None) -> T:
+    """
+    Call fn, and call it again if the first attempt is slower than hedge_after
+
+    The first successful result wins. The loser is left to finish in the
+    background and its result is passed to discard (e.g. to close a
+    streamed response).
+
+    Args:
+        fn: The upstream call
+        hedge_after: Seconds to wait before the second request; None
+                     disables hedging
+        discard: Cleanup for the losing result
+
+    Returns:
+        The first successful result
+
+    Raises:
+        Exception: The error of the last attempt if both fail
+    """
+    if hedge_after is None:
+        return fn()
+
+    futures = [submit_in_context(_hedge_executor, fn)]
+    done, _ = wait(futures, timeout=hedge_after)
+    if not done:
+        print(f"Hedging upstream call after {hedge_after:.2f}s")
+        futures.append(submit_in_context(_hedge_executor, fn))
+
+    error: Optional[BaseException] = None
+    while futures:
+        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+        for future in done:
+            futures.remove(future)
+            if future.exception() is not None:
+                error = future.exception()
+                continue
+            if discard is not None:
+                for loser in futures:
+                    loser.add_done_callback(
+                        lambda f: discard(f.result()) if f.exception() is None else None
+                    )
+            return future.result()
+    raise error
@@ -0,0 +1,137 @@
+"""
+Response Cache
+Bounded in-process LRU cache with per-entry TTL for agent responses
+"""
+from typing import Dict, Any, Optional
+from collections import OrderedDict
+import hashlib
+import json
+import threading
+import time
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.settings import (
+    RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_BACKEND,
+    RESPONSE_CACHE_PATH, RESPONSE_CACHE_PERSISTENT_MAX_BYTES,
+    RESPONSE_CACHE_COMPACTION_INTERVAL
+)
+
+
+def make_cache_key(agent_type: str, system_prompt: str, user_message: str,
+                   generation_config: Dict[str, Any]) -> str:
+    """
+    Build a cache key for one Gemini call
+
+    The system prompt is hashed separately so that editing an agent's prompt
+    invalidates its entries without having to store the prompt in every key.
+    """
+    prompt_hash = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+    payload = json.dumps(
+        [agent_type, prompt_hash, user_message, generation_config],
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache bounded by entry count and total value size
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return the cached value, or None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, size = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._bytes -= size
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        """
+        Store a value for ttl seconds, evicting least recently used entries
+        """
+        size = len(key) + len(value.encode("utf-8"))
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (value, time.monotonic() + ttl, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """
+    Return the process-wide response cache shared by all agents
+
+    With RESPONSE_CACHE_BACKEND=sqlite this is a TieredResponseCache whose
+    second tier is shared with the other worker processes.
+    """
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                if RESPONSE_CACHE_BACKEND == "sqlite":
+                    from services.persistent_cache import SQLiteResponseCache, TieredResponseCache
+                    _response_cache = TieredResponseCache(
+                        ResponseCache(),
+                        SQLiteResponseCache(
+                            RESPONSE_CACHE_PATH,
+                            max_bytes=RESPONSE_CACHE_PERSISTENT_MAX_BYTES,
+                            compaction_interval=RESPONSE_CACHE_COMPACTION_INTERVAL
+                        )
+                    )
+                else:
+                    _response_cache = ResponseCache()
+    return _response_cache
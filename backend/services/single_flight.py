@@ -0,0 +1,156 @@
+"""
+Single Flight
+Coalesces concurrent identical upstream calls into one
+"""
+from typing import Dict, Any, Callable, Optional, Tuple, TypeVar
+import threading
+import time
+
+T = TypeVar("T")
+
+
+class SingleFlightTimeout(TimeoutError):
+    """Raised to a waiter when the shared call does not finish in time"""
+
+
+class _Call:
+    """An upstream call in progress and the callers waiting on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Lets concurrent callers with the same key share one execution
+
+    The first caller for a key (the leader) runs the function on its own
+    thread; callers arriving while it runs wait for its outcome instead of
+    starting their own. If the function raises, every waiter gets the same
+    exception, unless share_error says the error was the leader's own (e.g.
+    it ran out of its request's time): then the waiters try again and one
+    of them becomes the new leader. Once the call finishes the key is
+    released, so later callers start a fresh call (results are cached
+    elsewhere, not here).
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.retried = 0
+
+    def do(self, key: str, fn: Callable[[], T], timeout: Optional[float] = None,
+           share_error: Optional[Callable[[BaseException], bool]] = None) -> Tuple[T, bool]:
+        """
+        Run fn once for all concurrent callers with this key
+
+        Args:
+            key: Identity of the call (e.g. a response cache key)
+            fn: Callable doing the upstream work
+            timeout: Seconds a waiter will wait for the shared call (None =
+                     no limit); the leader itself is not interrupted
+            share_error: Decides whether the leader's exception is also the
+                         waiters' answer (default: always); if not, waiters
+                         retry, one of them running its own fn
+
+        Returns:
+            Tuple of (result, True if it was shared from another caller)
+
+        Raises:
+            SingleFlightTimeout: If this caller waited longer than timeout
+            Exception: Whatever fn raised, for the leader and every waiter
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is not None:
+                    call.waiters += 1
+                    self.coalesced += 1
+                    leader = False
+                else:
+                    call = _Call()
+                    self._calls[key] = call
+                    self.executed += 1
+                    leader = True
+
+            if leader:
+                break
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not call.done.wait(remaining):
+                with self._lock:
+                    self.timeouts += 1
+                raise SingleFlightTimeout(
+                    f"Timed out after {timeout}s waiting for a shared {self.name} call"
+                )
+            if call.error is None:
+                return call.value, True
+            if share_error is None or share_error(call.error):
+                raise call.error
+            with self._lock:
+                self.retried += 1
+
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            # Release the key before waking waiters so that anyone arriving
+            # from now on starts a fresh call
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = len(self._calls)
+            waiting = sum(call.waiters for call in self._calls.values())
+        return {
+            "in_flight": in_flight,
+            "waiting": waiting,
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "retried": self.retried
+        }
+
+
+_groups: Dict[str, SingleFlight] = {}
+_groups_lock = threading.Lock()
+
+
+def get_single_flight(name: str) -> SingleFlight:
+    """
+    Return the process-wide single-flight group for an upstream (e.g.
+    'gemini' or 'image')
+    """
+    group = _groups.get(name)
+    if group is None:
+        with _groups_lock:
+            group = _groups.get(name)
+            if group is None:
+                group = SingleFlight(name)
+                _groups[name] = group
+    return group
+
+
+def single_flight_stats() -> Dict[str, Any]:
+    """
+    Stats for every single-flight group
+    """
+    with _groups_lock:
+        groups = dict(_groups)
+    return {name: group.stats() for name, group in groups.items()}
@@ -0,0 +1,158 @@
+"""
+Task Graph
+Runs request steps as a dependency graph so independent steps overlap
+"""
+from typing import Dict, Any, Callable, Iterable, Optional
+from concurrent.futures import Executor, Future, wait, FIRST_COMPLETED
+from contextvars import copy_context
+import time
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services import tracing
+
+
+class TaskResult:
+    """
+    Outcome of a single step in a TaskGraph
+
+    status is one of 'ok', 'error', 'timeout' or 'skipped'
+    """
+
+    def __init__(self, name: str, status: str, value: Any = None,
+                 error: Optional[str] = None, duration: float = 0.0,
+                 exception: Optional[BaseException] = None):
+        self.name = name
+        self.status = status
+        self.value = value
+        self.error = error
+        self.duration = duration
+        self.exception = exception  # the raised exception for 'error' steps
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "ok"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "step": self.name,
+            "status": self.status,
+            "error": self.error,
+            "duration_ms": round(self.duration * 1000, 1)
+        }
+
+
+class _Task:
+    def __init__(self, name, fn, depends_on, timeout, when):
+        self.name = name
+        self.fn = fn
+        self.depends_on = tuple(depends_on)
+        self.timeout = timeout
+        self.when = when
+        self.future: Optional[Future] = None
+        self.started = 0.0
+
+
+class TaskGraph:
+    """
+    Small dependency graph executor
+
+    Each step is a callable that receives the results of the steps it depends
+    on. A step starts as soon as all of its dependencies have settled, so steps
+    without a path between them run concurrently. Every step has its own
+    timeout; a step that overruns is reported as 'timeout' and its dependents
+    carry on without it (the worker thread itself cannot be interrupted and
+    finishes in the background). Each step runs in a trace span named after
+    it.
+    """
+
+    def __init__(self, executor: Executor):
+        self.executor = executor
+        self.tasks: Dict[str, _Task] = {}
+
+    def add(self, name: str, fn: Callable[[Dict[str, TaskResult]], Any],
+            depends_on: Iterable[str] = (), timeout: Optional[float] = None,
+            when: Optional[Callable[[Dict[str, TaskResult]], bool]] = None) -> "TaskGraph":
+        """
+        Register a step
+
+        Args:
+            name: Unique step name
+            fn: Callable receiving {dependency name: TaskResult}
+            depends_on: Names of steps that must settle first
+            timeout: Seconds the step may run once a worker has started it
+                     (None = no limit); time queued for a worker is not counted
+            when: Optional gate evaluated on the dependency results; the
+                  step is skipped if it returns False
+        """
+        for dep in depends_on:
+            if dep not in self.tasks:
+                raise ValueError(f"Unknown dependency '{dep}' for step '{name}'")
+        self.tasks[name] = _Task(name, fn, depends_on, timeout, when)
+        return self
+
+    def run(self) -> Dict[str, TaskResult]:
+        """
+        Execute all steps and wait for them to settle
+
+        Returns:
+            Dictionary mapping step name to its TaskResult
+        """
+        results: Dict[str, TaskResult] = {}
+        pending = dict(self.tasks)
+        running: Dict[Future, _Task] = {}
+
+        while pending or running:
+            # Start (or skip) every step whose dependencies have settled
+            for name, task in list(pending.items()):
+                if not all(dep in results for dep in task.depends_on):
+                    continue
+                del pending[name]
+                upstream = {dep: results[dep] for dep in task.depends_on}
+                if task.when is not None and not task.when(upstream):
+                    results[name] = TaskResult(name, "skipped")
+                    continue
+                # Steps run under the caller's deadline (see services.resilience)
+                # and trace
+                task.future = self.executor.submit(copy_context().run, self._run_step, task, upstream)
+                running[task.future] = task
+
+            if not running:
+                continue
+
+            # A step's timeout runs from when a worker picks it up, not from
+            # when it was queued. For steps still queued, wake up after their
+            # full timeout at the latest and look again.
+            now = time.monotonic()
+            deadlines = [(t.started or now) + t.timeout for t in running.values() if t.timeout is not None]
+            wait_for = max(0.0, min(deadlines) - now) if deadlines else None
+            done, _ = wait(list(running), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            now = time.monotonic()
+            for future, task in list(running.items()):
+                if future in done:
+                    error = future.exception()
+                    if error is None:
+                        results[task.name] = TaskResult(task.name, "ok", future.result(),
+                                                        duration=now - task.started)
+                    else:
+                        results[task.name] = TaskResult(task.name, "error", error=str(error),
+                                                        duration=now - task.started,
+                                                        exception=error)
+                elif task.timeout is not None and task.started and now - task.started >= task.timeout:
+                    future.cancel()
+                    results[task.name] = TaskResult(task.name, "timeout",
+                                                    error=f"Timed out after {task.timeout}s",
+                                                    duration=now - task.started)
+                else:
+                    continue
+                del running[future]
+
+        return results
+
+    @staticmethod
+    def _run_step(task: _Task, upstream: Dict[str, TaskResult]) -> Any:
+        task.started = time.monotonic()
+        with tracing.span(task.name):
+            return task.fn(upstream)
@@ -0,0 +1,256 @@
+"""
+Tracing
+Per-request spans with upstream / local time, cache hits and retries
+"""
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+import json
+import random
+import re
+import threading
+import time
+import uuid
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.settings import (
+    TRACING_ENABLED, TRACE_EXPORT_PATH, TRACE_SAMPLE_RATE, TRACE_EXPORT_SLOW
+)
+
+# Incoming request IDs we accept as-is; anything else gets a fresh one
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+
+class Span:
+    """
+    One timed unit of work (an agent call, a Gemini request, a task step)
+
+    upstream is time spent waiting on Gemini or Pollinations (or on another
+    caller's identical request). It and the retry count are added to the
+    span and every span above it, so local time (duration - upstream) is
+    what this process spent on its own.
+    """
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent = parent
+        self.attributes = dict(attributes or {})
+        self.started = time.perf_counter()
+        self.ended: Optional[float] = None
+        self.upstream = 0.0
+        self.cache_hit: Optional[bool] = None
+        self.retries = 0
+        self.status = "ok"
+
+    @property
+    def duration(self) -> float:
+        return (self.ended if self.ended is not None else time.perf_counter()) - self.started
+
+    def duration_ms(self) -> float:
+        return round(self.duration * 1000, 1)
+
+    def add_upstream(self, seconds: float) -> None:
+        span = self
+        while span is not None:
+            span.upstream += seconds
+            span = span.parent
+
+    def add_retries(self, count: int) -> None:
+        span = self
+        while span is not None:
+            span.retries += count
+            span = span.parent
+
+    def to_dict(self, trace_started: float) -> Dict[str, Any]:
+        duration = self.duration
+        # Concurrent children can wait on upstreams at the same time
+        upstream = min(self.upstream, duration)
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "name": self.name,
+            "start_ms": round((self.started - trace_started) * 1000, 1),
+            "duration_ms": round(duration * 1000, 1),
+            "upstream_ms": round(upstream * 1000, 1),
+            "local_ms": round((duration - upstream) * 1000, 1),
+            "cache_hit": self.cache_hit,
+            "retries": self.retries,
+            "status": self.status,
+            **self.attributes
+        }
+
+
+class Trace:
+    """The spans of one request, keyed by its request ID"""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.timestamp = time.time()
+        self.started = time.perf_counter()
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "request_id": self.request_id,
+            "spans": [span.to_dict(self.started) for span in spans]
+        }
+
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_span: ContextVar[Optional[Span]] = ContextVar("span", default=None)
+
+
+def request_id_from(header_value: Optional[str]) -> str:
+    """
+    The caller's request ID if it is a sane token, else a new one
+    """
+    if header_value and REQUEST_ID_PATTERN.match(header_value):
+        return header_value
+    return uuid.uuid4().hex
+
+
+def start_trace(request_id: str) -> Optional[Token]:
+    """
+    Open a trace for the current request (e.g. from a Flask before_request
+    hook); close it with end_trace(token). Spans started in this context,
+    and in threads given a copy of it, are recorded on the trace.
+
+    Returns:
+        Token for end_trace, or None if tracing is disabled
+    """
+    if not TRACING_ENABLED:
+        return None
+    return _trace.set(Trace(request_id))
+
+
+def end_trace(token: Optional[Token]) -> None:
+    if token is not None:
+        _trace.reset(token)
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+
+def current_span() -> Optional[Span]:
+    return _span.get()
+
+
+def start_span(name: str, **attributes: Any) -> Tuple[Span, Token]:
+    """
+    Start a child of the current span that outlives the current block;
+    finish it with end_span(span, token)
+
+    The span is timed even without an active trace (callers may read its
+    duration); it is only recorded when there is one.
+    """
+    current = Span(name, _span.get(), attributes)
+    trace = _trace.get()
+    if trace is not None:
+        trace.add(current)
+    return current, _span.set(current)
+
+
+def end_span(current: Span, token: Token) -> None:
+    current.ended = time.perf_counter()
+    _span.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span]:
+    """
+    Time the enclosed block as a child of the current span; an exception
+    marks it as an error and propagates
+    """
+    current, token = start_span(name, **attributes)
+    try:
+        yield current
+    except BaseException:
+        current.status = "error"
+        raise
+    finally:
+        end_span(current, token)
+
+
+def annotate(**fields: Any) -> None:
+    """
+    Set fields on the current span: cache_hit, status or any extra
+    attribute
+    """
+    current = _span.get()
+    if current is None:
+        return
+    for key, value in fields.items():
+        if key in ("cache_hit", "status"):
+            setattr(current, key, value)
+        else:
+            current.attributes[key] = value
+
+
+def record_upstream(seconds: float) -> None:
+    """Add upstream wait time to the current span and its parents"""
+    current = _span.get()
+    if current is not None:
+        current.add_upstream(seconds)
+
+
+def record_retries(count: int) -> None:
+    """Add upstream retries to the current span and its parents"""
+    current = _span.get()
+    if current is not None and count:
+        current.add_retries(count)
+
+
+# ========================================
+# Export
+# ========================================
+
+_export_lock = threading.Lock()
+
+
+def export(trace: Trace, **fields: Any) -> bool:
+    """
+    Append a trace to TRACE_EXPORT_PATH as one JSON line, if it is sampled
+
+    A TRACE_SAMPLE_RATE share of traces is written, plus every trace slower
+    than TRACE_EXPORT_SLOW seconds.
+
+    Args:
+        trace: The finished trace
+        **fields: Request details to store with it (method, path, status...)
+
+    Returns:
+        True if the trace was written
+    """
+    if not TRACE_EXPORT_PATH:
+        return False
+    duration = time.perf_counter() - trace.started
+    slow = TRACE_EXPORT_SLOW > 0 and duration >= TRACE_EXPORT_SLOW
+    if not slow and random.random() >= TRACE_SAMPLE_RATE:
+        return False
+    record = {
+        "timestamp": trace.timestamp,
+        "duration_ms": round(duration * 1000, 1),
+        "pid": os.getpid(),
+        **fields,
+        **trace.to_dict()
+    }
+    line = json.dumps(record, default=str) + "\n"
+    try:
+        with _export_lock:
+            with open(TRACE_EXPORT_PATH, "a", encoding="utf-8") as f:
+                f.write(line)
+    except OSError as e:
+        print(f"Could not export trace {trace.request_id}: {str(e)}")
+        return False
+    return True
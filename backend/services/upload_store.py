@@ -0,0 +1,270 @@
+"""
+Upload Store
+Uploaded images streamed to disk and stored under their content hash
+"""
+from typing import Optional, Any
+import hashlib
+import tempfile
+import threading
+import time
+import sys
+import os
+
+from PIL import Image
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.settings import UPLOAD_DIR, MAX_UPLOAD_PIXELS, UPLOAD_RETENTION
+from services.image_store import sniff_image_type, DIGEST_PATTERN
+from services.image_pool import get_image_pool, resize_to_file
+
+# Bytes copied per read when an upload was not spooled by spool()
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+class UploadRejected(ValueError):
+    """The upload is not an image we accept"""
+
+
+def check_decodes(image: Image.Image) -> None:
+    """
+    Raise if the image data is truncated or corrupt
+
+    PNGs are checked with verify() (every chunk CRC, no pixel decode); other
+    formats decode their first frame, JPEGs in draft mode at 1/8 scale, so
+    the check costs a fraction of a full decode.
+    """
+    if image.format == "PNG":
+        image.verify()
+    else:
+        image.draft("RGB", (max(1, image.width // 8), max(1, image.height // 8)))
+        image.load()
+
+
+class HashingSpoolFile:
+    """
+    Temp file in the upload directory that hashes bytes as they are written
+
+    Werkzeug writes each multipart file into one of these chunk by chunk
+    (see spool()), so an upload is hashed and on disk by the time the route
+    runs, without ever being held in memory. Unless ingest() moved it into
+    the store, the temp file is removed when it is closed, which Flask does
+    at the end of the request.
+
+    The file is created with delete=False and only reopened or moved once
+    its handle is closed, since Windows allows neither on an open
+    NamedTemporaryFile.
+    """
+
+    def __init__(self, root: str):
+        self.file = tempfile.NamedTemporaryFile(dir=root, prefix=".upload-", delete=False)
+        self.hasher = hashlib.sha256()
+        self.head = b""
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        if len(self.head) < 16:
+            self.head += data[:16 - len(self.head)]
+        self.hasher.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def close(self) -> None:
+        self.file.close()
+        try:
+            os.remove(self.file.name)
+        except OSError:
+            # Already moved into the store (or removed)
+            pass
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.file, name)
+
+
+class StoredUpload:
+    """
+    An uploaded image on disk
+
+    Nothing is decoded until an agent asks for pixels with downscaled_jpeg.
+    """
+
+    def __init__(self, digest: str, path: str, size: int, content_type: str, duplicate: bool):
+        self.digest = digest
+        self.path = path
+        self.size = size
+        self.content_type = content_type
+        self.duplicate = duplicate
+
+    def downscaled_jpeg(self, max_side: int, wait: float = 0.0) -> bytes:
+        """
+        The image re-encoded as a JPEG that fits max_side x max_side
+
+        Decoding runs in the image process pool (JPEGs in draft mode, which
+        is several times faster than a full decode); only the small result
+        is read back.
+
+        Raises:
+            ImagePoolBusy: If the image pool stays saturated for wait seconds
+        """
+        fd, output_path = tempfile.mkstemp(dir=os.path.dirname(self.path), prefix=".tmp-")
+        os.close(fd)
+        try:
+            get_image_pool().run(resize_to_file, self.path, output_path, max_side, "jpeg", 85, wait=wait)
+            with open(output_path, "rb") as f:
+                return f.read()
+        finally:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+
+    def to_dict(self):
+        return {
+            "upload_id": self.digest,
+            "bytes": self.size,
+            "content_type": self.content_type,
+            "duplicate": self.duplicate
+        }
+
+
+class UploadStore:
+    """
+    Stores uploads under the SHA-256 of their bytes
+
+    The same picture uploaded twice is stored once; the second upload just
+    refreshes the file's retention. Files not uploaded again within
+    retention seconds are pruned.
+    """
+
+    def __init__(self, root: str = UPLOAD_DIR, retention: float = UPLOAD_RETENTION):
+        self.root = root
+        self.retention = retention
+        self._last_prune = 0.0
+        self._prune_lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def spool(self) -> HashingSpoolFile:
+        """
+        New spool file for an incoming upload (a Werkzeug stream factory)
+        """
+        return HashingSpoolFile(self.root)
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def ingest(self, file_storage) -> StoredUpload:
+        """
+        Store an uploaded file
+
+        Args:
+            file_storage: Werkzeug FileStorage, ideally spooled by spool()
+
+        Returns:
+            The stored upload
+
+        Raises:
+            UploadRejected: If the file is not a supported image, is
+                            truncated or corrupt, or has too many pixels
+        """
+        spool = file_storage.stream
+        if not isinstance(spool, HashingSpoolFile):
+            # Not parsed through our stream factory: copy it in chunks
+            spool = self.spool()
+            for chunk in iter(lambda: file_storage.stream.read(COPY_CHUNK_SIZE), b""):
+                spool.write(chunk)
+
+        try:
+            spool.flush()
+            content_type = sniff_image_type(spool.head)
+            if content_type is None or not content_type.startswith("image/"):
+                raise UploadRejected("Upload is not a supported image (PNG, JPEG, GIF or WebP)")
+
+            # Read from the open handle: the header for the pixel limit, then
+            # a cheap integrity check so a truncated file is never stored
+            try:
+                spool.seek(0)
+                with Image.open(spool.file) as image:
+                    width, height = image.size
+                    if width * height > MAX_UPLOAD_PIXELS:
+                        raise UploadRejected(f"Uploaded image is too large ({width}x{height})")
+                    check_decodes(image)
+            except UploadRejected:
+                raise
+            except Exception:
+                raise UploadRejected("Uploaded image could not be read (truncated or corrupt)")
+
+            digest = spool.hasher.hexdigest()
+            path = self.path_for(digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Close before moving: Windows cannot move an open file
+            spool.file.close()
+            duplicate = os.path.exists(path)
+            if duplicate:
+                os.utime(path)
+            else:
+                # Atomic; a concurrent upload of the same bytes just
+                # replaces the file with an identical one
+                os.replace(spool.name, path)
+        finally:
+            # Removes the temp file unless it was moved into the store
+            spool.close()
+
+        self.prune_expired()
+        return StoredUpload(digest, path, spool.size, content_type, duplicate)
+
+    def get(self, digest: str) -> Optional[StoredUpload]:
+        """
+        Look up an earlier upload by its hash
+        """
+        if not DIGEST_PATTERN.match(digest):
+            return None
+        path = self.path_for(digest)
+        try:
+            with open(path, "rb") as f:
+                head = f.read(16)
+            size = os.path.getsize(path)
+        except OSError:
+            return None
+        return StoredUpload(digest, path, size, sniff_image_type(head), duplicate=True)
+
+    def prune_expired(self) -> int:
+        """
+        Remove uploads older than the retention period (at most every ten
+        minutes, by whichever request gets here first)
+
+        Returns:
+            Number of files removed
+        """
+        now = time.time()
+        if now - self._last_prune < 600 or not self._prune_lock.acquire(blocking=False):
+            return 0
+        removed = 0
+        try:
+            self._last_prune = now
+            for directory, _, files in os.walk(self.root):
+                for name in files:
+                    if not DIGEST_PATTERN.match(name):
+                        continue
+                    path = os.path.join(directory, name)
+                    try:
+                        if now - os.path.getmtime(path) > self.retention:
+                            os.remove(path)
+                            removed += 1
+                    except OSError:
+                        continue
+        finally:
+            self._prune_lock.release()
+        return removed
+
+
+_upload_store: Optional[UploadStore] = None
+_upload_store_lock = threading.Lock()
+
+
+def get_upload_store() -> UploadStore:
+    """
+    Return the process-wide upload store
+    """
+    global _upload_store
+    if _upload_store is None:
+        with _upload_store_lock:
+            if _upload_store is None:
+                _upload_store = UploadStore()
+    return _upload_store
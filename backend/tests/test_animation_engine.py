@@ -0,0 +1,90 @@
+import os
+import stat
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+from agents import animation_engine
+from agents.animation_engine import encode_with_ffmpeg, frame_params, output_size
+
+# Stands in for ffmpeg: drains stdin, then writes it to the output path (the
+# last argument), or fails if FAKE_FFMPEG_FAIL is set
+FAKE_FFMPEG = """#!{python}
+import os, sys
+data = sys.stdin.buffer.read()
+if os.environ.get("FAKE_FFMPEG_FAIL"):
+    sys.stderr.write("Unknown encoder")
+    sys.exit(1)
+with open(sys.argv[-1], "wb") as fp:
+    fp.write(data)
+"""
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    path = tmp_path / "ffmpeg"
+    path.write_text(FAKE_FFMPEG.format(python=sys.executable))
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(animation_engine, "FFMPEG_PATH", str(path))
+    return path
+
+
+def frames(count, fail_after=None):
+    for i in range(count):
+        if i == fail_after:
+            raise OSError("image file is truncated")
+        yield np.full((4, 6, 3), i, dtype=np.uint8)
+
+
+def encode_in_thread(frame_iter, output_path):
+    """Run encode_with_ffmpeg, failing the test instead of hanging"""
+    outcome = {}
+
+    def run():
+        try:
+            encode_with_ffmpeg(frame_iter, output_path, fps=10, width=6, height=4, container="mp4")
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive(), "encode_with_ffmpeg hung"
+    return outcome.get("error")
+
+
+@pytest.mark.skipif(os.name != "posix", reason="fake ffmpeg is a script")
+def test_frames_are_piped_to_ffmpeg(fake_ffmpeg, tmp_path):
+    output = tmp_path / "clip.mp4"
+
+    assert encode_in_thread(frames(3), str(output)) is None
+    assert output.read_bytes() == b"".join(frame.tobytes() for frame in frames(3))
+
+
+@pytest.mark.skipif(os.name != "posix", reason="fake ffmpeg is a script")
+def test_render_failure_propagates_instead_of_hanging(fake_ffmpeg, tmp_path):
+    error = encode_in_thread(frames(3, fail_after=1), str(tmp_path / "clip.mp4"))
+
+    assert isinstance(error, OSError)
+    assert str(error) == "image file is truncated"
+
+
+@pytest.mark.skipif(os.name != "posix", reason="fake ffmpeg is a script")
+def test_ffmpeg_errors_are_reported(fake_ffmpeg, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_FFMPEG_FAIL", "1")
+    error = encode_in_thread(frames(2), str(tmp_path / "clip.mp4"))
+
+    assert isinstance(error, RuntimeError)
+    assert "Unknown encoder" in str(error)
+
+
+def test_output_size_fits_max_side_with_even_dimensions():
+    assert output_size(1000, 750, 512) == (512, 384)
+    assert output_size(301, 201, 1024) == (300, 200)
+
+
+def test_frame_params_loop_seamlessly():
+    effects = ["zoom", "pan", "wiggle"]
+    assert frame_params(0.0, effects) == pytest.approx(frame_params(1.0, effects))
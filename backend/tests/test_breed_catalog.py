@@ -0,0 +1,99 @@
+import pytest
+
+from agents.breed_catalog import BreedCatalog
+from agents.breed_match_agent import BreedMatchAgent
+from services.rate_limiter import RateLimitExceeded, UpstreamOverloaded
+from services.resilience import CircuitOpenError
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    return BreedCatalog()
+
+
+@pytest.fixture
+def agent():
+    return BreedMatchAgent()
+
+
+def names(matches):
+    return [match.breed["name"] for match in matches]
+
+
+def test_a_phrase_signals_every_feature_it_is_listed_under(catalog):
+    assert catalog.extract_features("an athletic cat") == {"build_muscular", "temper_active"}
+
+
+def test_longer_phrases_win_at_the_same_position(catalog):
+    assert catalog.extract_features("blue eyes") == {"eyes_blue"}
+    assert catalog.extract_features("a devon rex") == {"name:Devon Rex"}
+
+
+def test_contradicting_features_count_against_a_breed(catalog):
+    matches = catalog.match("short hair, flat face, chubby cheeks")
+
+    assert names(matches)[0] == "Exotic Shorthair"
+
+
+def test_nothing_recognised_gives_no_matches(catalog):
+    assert catalog.match("a cat") == []
+
+
+def test_signature_features_settle_look_alikes(catalog):
+    matches = catalog.match("fluffy big cat with tufted ears")
+
+    assert names(matches)[:2] == ["Maine Coon", "Norwegian Forest Cat"]
+    assert matches[0].matched == ["coat_long", "ears_tufted", "size_large"]
+    assert matches[0].confidence > matches[1].confidence
+
+
+@pytest.mark.parametrize("description, breed", [
+    ("fluffy big cat with tufted ears", "Maine Coon"),
+    ("hairless wrinkly cat that loves warm laps", "Sphynx"),
+    ("slim cat with blue eyes, cream coat and dark points", "Siamese"),
+    ("my scottish fold", "Scottish Fold"),
+])
+def test_clear_descriptions_are_answered_locally(agent, monkeypatch, description, breed):
+    monkeypatch.setattr(agent, "call_gemini", pytest.fail)
+
+    result = agent.process(description)
+
+    assert result["decided_by"] == "catalog"
+    assert result["matches"][0]["breed"] == breed
+
+
+@pytest.mark.parametrize("description", ["an orange cat", "tufted ears", "blue eyes pointed long hair"])
+def test_near_ties_and_thin_evidence_go_to_gemini(agent, monkeypatch, description):
+    monkeypatch.setattr(agent, "call_gemini", lambda user_message, **kwargs: "**Breed**: Gemini's pick")
+    monkeypatch.setattr(agent, "last_call_failed", lambda: False)
+
+    assert not agent.is_decisive(agent.catalog.match(description))
+    assert agent.process(description)["decided_by"] == "llm"
+
+
+@pytest.mark.parametrize("error", [
+    CircuitOpenError("circuit open"),
+    RateLimitExceeded("Gemini rate limit reached"),
+    UpstreamOverloaded("Gemini is overloaded"),
+])
+def test_throttled_gemini_falls_back_to_the_catalog(agent, monkeypatch, error):
+    def throttled(user_message, **kwargs):
+        raise error
+
+    monkeypatch.setattr(agent, "call_gemini", throttled)
+
+    result = agent.process("tufted ears")
+
+    assert result["decided_by"] == "catalog"
+    assert result["matches"][0]["breed"] == "Maine Coon"
+    assert result["fallback_reason"] == str(error)
+
+
+def test_throttled_gemini_without_a_catalog_guess_raises(agent, monkeypatch):
+    def throttled(user_message, **kwargs):
+        raise RateLimitExceeded("Gemini rate limit reached")
+
+    monkeypatch.setattr(agent, "call_gemini", throttled)
+
+    with pytest.raises(RateLimitExceeded):
+        agent.process("a cat")
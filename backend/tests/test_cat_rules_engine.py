@@ -0,0 +1,154 @@
+import threading
+
+import pytest
+
+from agents import cat_translator_agent
+from agents.cat_rules_engine import LocalCatTranslator, detect_mood, EMOJI, SOUNDS
+from agents.cat_translator_agent import CatTranslatorAgent
+
+CAT_SOUNDS = {sound for sounds in SOUNDS.values() for sound in sounds}
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return LocalCatTranslator()
+
+
+def words_of(translation):
+    return [word.strip(".,!?").lower() for word in translation.rsplit(" ", 1)[0].replace("...", " ").split()]
+
+
+@pytest.mark.parametrize("text, mood", [
+    ("thanks, great work", "happy"),
+    ("we finally shipped the launch!", "excited"),
+    ("I love this cute team", "love"),
+    ("sorry, I missed the meeting", "sad"),
+    ("I hate this broken build", "angry"),
+    ("lol that was hilarious", "funny"),
+    ("wait, really?!", "surprised"),
+    ("the report is on the desk", "neutral"),
+])
+def test_detect_mood(text, mood):
+    assert detect_mood(text.replace(",", "").replace("!", "").replace("?", "").split(), text) == mood
+
+
+def test_every_word_becomes_a_cat_sound(engine):
+    translation = engine.translate("Hello, how are you today?")
+
+    # All short words, so no sound gets its vowel stretched
+    words = words_of(translation)
+    assert len(words) == 5
+    assert set(words) <= CAT_SOUNDS
+    assert "," in translation and "?" in translation
+    assert translation.endswith(EMOJI["neutral"])
+
+
+def test_translation_is_deterministic(engine):
+    assert engine.translate("See you at the standup") == engine.translate("See you at the standup")
+
+
+def test_sentences_start_with_a_capital(engine):
+    translation = engine.translate("the report is done. the slides are next.")
+
+    first, second = translation.split(". ")[:2]
+    assert first[0].isupper() and second[0].isupper()
+
+
+def test_long_words_get_a_stretched_sound(engine):
+    assert words_of(engine.translate("documentation"))[0] not in CAT_SOUNDS
+
+
+def test_capitals_and_excitement_come_out_shouted(engine):
+    assert engine.translate("please read the FAQ").split()[3].isupper()
+    assert engine.translate("we finally shipped!") == engine.translate("we finally shipped!").upper()
+
+
+def test_sad_text_trails_off(engine):
+    translation = engine.translate("sorry I missed it")
+
+    assert "... " in translation
+    assert translation.endswith("... " + EMOJI["sad"])
+
+
+def test_text_without_words(engine):
+    assert engine.translate("?!") == "Mrow? 😿"
+
+
+@pytest.fixture
+def translator(monkeypatch):
+    translator = CatTranslatorAgent()
+    gemini_calls = []
+
+    def call_gemini(user_message, **kwargs):
+        gemini_calls.append(user_message)
+        return "Meow meow 😺"
+
+    monkeypatch.setattr(translator, "call_gemini", call_gemini)
+    monkeypatch.setattr(translator, "last_call_failed", lambda: False)
+    translator.gemini_calls = gemini_calls
+    return translator
+
+
+def test_always_mode_never_calls_gemini(translator):
+    translator.local_mode = "always"
+
+    result = translator.process("hello team")
+
+    assert result["engine"] == "local"
+    assert result["fallback_reason"] == "local mode"
+    assert translator.gemini_calls == []
+
+
+@pytest.mark.parametrize("mode", ["never", "fallback", "load"])
+def test_other_modes_ask_gemini_first(translator, mode):
+    translator.local_mode = mode
+
+    result = translator.process("hello team")
+
+    assert result["engine"] == "gemini"
+    assert result["cat_translation"] == "Meow meow 😺"
+    assert len(translator.gemini_calls) == 1
+
+
+@pytest.mark.parametrize("mode, engine", [("never", "gemini"), ("fallback", "local"), ("load", "local")])
+def test_gemini_errors_fall_back_unless_mode_is_never(translator, monkeypatch, mode, engine):
+    translator.local_mode = mode
+    monkeypatch.setattr(translator, "call_gemini", lambda user_message, **kwargs: "Error calling Gemini API: 500")
+    monkeypatch.setattr(translator, "last_call_failed", lambda: True)
+
+    result = translator.process("hello team")
+
+    assert result["engine"] == engine
+    if engine == "local":
+        assert result["fallback_reason"] == "Error calling Gemini API: 500"
+        assert result["cat_translation"] == LocalCatTranslator().translate("hello team")
+
+
+def test_load_mode_goes_local_once_enough_translations_are_in_flight(translator, monkeypatch):
+    monkeypatch.setattr(cat_translator_agent, "TRANSLATOR_LOAD_THRESHOLD", 2)
+    translator.local_mode = "load"
+    inside = threading.Barrier(3)
+    release = threading.Event()
+
+    def slow_gemini(user_message, **kwargs):
+        inside.wait(2)
+        release.wait(2)
+        return "Meow 😺"
+
+    monkeypatch.setattr(translator, "call_gemini", slow_gemini)
+    threads = [threading.Thread(target=translator.process, args=("hello team",)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    inside.wait(2)
+    try:
+        result = translator.process("hello team")
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+
+    assert result["engine"] == "local"
+    assert result["fallback_reason"] == "under load"
+    # Back under the threshold once they finish
+    monkeypatch.setattr(translator, "call_gemini", lambda user_message, **kwargs: "Meow 😺")
+    assert translator.process("hello team")["engine"] == "gemini"
@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import pytest
+
+from services import gemini_registry
+from services.gemini_registry import GeminiRegistry
+
+
+class FakeGenai:
+    def __init__(self, model_error=None):
+        self.configured = []
+        self.built = []
+        self.model_error = model_error
+
+    def configure(self, **kwargs):
+        self.configured.append(kwargs)
+
+    def GenerativeModel(self, model_name, generation_config=None):
+        model = SimpleNamespace(model_name=model_name, generation_config=generation_config)
+        self.built.append(model)
+        return model
+
+    def get_model(self, model_name):
+        if self.model_error is not None:
+            raise self.model_error
+        return SimpleNamespace(name=model_name)
+
+
+@pytest.fixture
+def genai(monkeypatch):
+    fake = FakeGenai()
+    monkeypatch.setattr(gemini_registry, "genai", fake)
+    return fake
+
+
+def test_handles_are_built_once_per_model_and_config(genai):
+    registry = GeminiRegistry(api_key="key", api_endpoint="")
+
+    first = registry.get_model("model-a", {"temperature": 0.3, "top_p": 1})
+    again = registry.get_model("model-a", {"top_p": 1, "temperature": 0.3})
+    other_config = registry.get_model("model-a", {"temperature": 0.9})
+    other_model = registry.get_model("model-b")
+
+    assert first is again
+    assert len({id(first), id(other_config), id(other_model)}) == 3
+    assert len(genai.built) == 3
+    assert genai.configured == [{"api_key": "key"}]
+
+
+def test_a_custom_endpoint_uses_rest(genai):
+    GeminiRegistry(api_key="key", api_endpoint="http://127.0.0.1:9000").configure()
+
+    assert genai.configured == [
+        {"api_key": "key", "transport": "rest", "client_options": {"api_endpoint": "http://127.0.0.1:9000"}}
+    ]
+
+
+@pytest.mark.parametrize("error, status", [(None, "healthy"), (PermissionError("bad key"), "unhealthy")])
+def test_health_check(genai, error, status):
+    genai.model_error = error
+    registry = GeminiRegistry(api_key="key", api_endpoint="")
+    registry.warm_up(["model-a"])
+
+    health = registry.health_check("model-a")
+
+    assert health["status"] == status
+    assert health["error"] == (None if error is None else "bad key")
+    assert health["models_loaded"] == 1
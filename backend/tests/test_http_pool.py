@@ -0,0 +1,87 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from services import http_pool
+from services.http_pool import PooledSession
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"meow"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_repeat_requests_reuse_one_connection(server):
+    session = PooledSession(pool_connections=2, pool_maxsize=2)
+
+    for _ in range(3):
+        assert session.get(f"{server}/ping").text == "meow"
+
+    stats = session.stats()
+    assert (stats["requests"], stats["errors"]) == (3, 0)
+    host = stats["hosts"][server]
+    assert (host["connections_opened"], host["requests"], host["max_size"]) == (1, 3, 2)
+
+
+def test_failed_requests_are_counted():
+    session = PooledSession()
+
+    with pytest.raises(requests.ConnectionError):
+        session.get(f"http://127.0.0.1:{closed_port()}/")
+
+    assert (session.stats()["requests"], session.stats()["errors"]) == (1, 1)
+
+
+def test_requests_get_the_default_timeout(monkeypatch):
+    timeouts = []
+
+    def send(self, request, **kwargs):
+        timeouts.append(kwargs["timeout"])
+        raise requests.ConnectionError("not sent")
+
+    monkeypatch.setattr(requests.adapters.HTTPAdapter, "send", send)
+    session = PooledSession()
+
+    with pytest.raises(requests.ConnectionError):
+        session.get("http://example.invalid/")
+    with pytest.raises(requests.ConnectionError):
+        session.get("http://example.invalid/", timeout=1)
+
+    assert timeouts == [http_pool.DEFAULT_TIMEOUT, 1]
+
+
+def test_a_forked_worker_gets_its_own_session(monkeypatch):
+    session = http_pool.get_http_session()
+    assert http_pool.get_http_session() is session
+
+    monkeypatch.setattr(http_pool.os, "getpid", lambda: -1)
+
+    assert http_pool.get_http_session() is not session
@@ -0,0 +1,76 @@
+import time
+
+import pytest
+from PIL import Image
+
+from services.image_pool import ImagePoolBusy, ImageProcessPool, resize_to_file
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.001)
+
+
+def settled(pool):
+    # Counts are updated by a done callback that may run just after result()
+    wait_until(lambda: pool.stats()["outstanding"] == 0)
+    return pool.stats()
+
+
+@pytest.fixture
+def pool():
+    pool = ImageProcessPool(workers=1, max_queue=1)
+    yield pool
+    if pool._executor is not None:
+        pool._executor.shutdown(wait=True)
+
+
+def test_resize_to_file_fits_the_longest_side(tmp_path):
+    source = tmp_path / "source.png"
+    Image.new("RGBA", (300, 150), (0, 0, 0, 0)).save(source)
+
+    size = resize_to_file(str(source), str(tmp_path / "out" / "small.jpeg"), 100, "jpeg")
+
+    assert size == (100, 50)
+    with Image.open(tmp_path / "out" / "small.jpeg") as image:
+        assert (image.format, image.mode, image.size) == ("JPEG", "RGB", (100, 50))
+    assert [path.name for path in (tmp_path / "out").iterdir()] == ["small.jpeg"]
+
+
+def test_without_workers_transforms_run_inline():
+    pool = ImageProcessPool(workers=0)
+
+    assert pool.run(max, 3, 7) == 7
+    with pytest.raises(ValueError):
+        pool.run(int, "not a number")
+    assert pool._executor is None
+
+
+def test_a_full_queue_sheds_work(pool):
+    running = pool.submit(time.sleep, 1.0)
+
+    with pytest.raises(ImagePoolBusy) as info:
+        pool.submit(time.sleep, 0, wait=0.05)
+
+    assert info.value.status_code == 503
+    running.result(timeout=30)
+    assert pool.run(max, 1, 2, wait=1) == 2
+    stats = settled(pool)
+    assert (stats["submitted"], stats["completed"], stats["rejected"], stats["outstanding"]) == (2, 2, 1, 0)
+
+
+def test_a_queued_submit_waits_for_room(pool):
+    pool.submit(time.sleep, 0.2)
+
+    assert pool.run(max, 1, 2, wait=30) == 2
+    assert pool.stats()["rejected"] == 0
+
+
+def test_failed_transforms_are_counted(pool):
+    with pytest.raises(ValueError):
+        pool.run(int, "not a number", timeout=30)
+
+    assert settled(pool)["failed"] == 1
@@ -0,0 +1,100 @@
+import hashlib
+import os
+
+import pytest
+
+from services.image_store import ImageStore, sniff_image_type
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 56
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 60
+MP4 = b"\x00\x00\x00\x18ftypmp42" + b"\x00" * 52
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ImageStore(root=str(tmp_path))
+
+
+def stored_files(store):
+    return sorted(name for _, _, files in os.walk(store.root) for name in files)
+
+
+def chunked(data, size=16, consumed=None):
+    for start in range(0, len(data), size):
+        if consumed is not None:
+            consumed.append(start)
+        yield data[start:start + size]
+
+
+@pytest.mark.parametrize("head, content_type", [
+    (PNG, "image/png"),
+    (JPEG, "image/jpeg"),
+    (b"GIF89a" + b"\x00" * 10, "image/gif"),
+    (b"RIFF\x00\x00\x00\x00WEBPVP8 ", "image/webp"),
+    (MP4, "video/mp4"),
+    (b"<html><body>", None),
+])
+def test_sniff_image_type(head, content_type):
+    assert sniff_image_type(head) == content_type
+
+
+def test_identical_images_are_stored_once(store):
+    digest = store.put(PNG)
+
+    assert digest == hashlib.sha256(PNG).hexdigest()
+    assert store.put_stream(chunked(PNG)) == (digest, "image/png", len(PNG))
+    assert store.put(PNG) == digest
+    assert stored_files(store) == [digest]
+    assert store.content_type(digest) == "image/png"
+
+
+def test_put_stream_rejects_videos(store):
+    with pytest.raises(ValueError, match="not a supported image"):
+        store.put_stream(chunked(MP4))
+
+    assert stored_files(store) == []
+
+
+def test_put_stream_stops_reading_a_non_image_after_its_header(store):
+    consumed = []
+
+    with pytest.raises(ValueError, match="not a supported image"):
+        store.put_stream(chunked(b"<html>" + b"x" * 1000, consumed=consumed))
+
+    assert consumed == [0]
+    assert stored_files(store) == []
+
+
+def test_put_stream_aborts_oversized_downloads_while_streaming(store):
+    consumed = []
+
+    with pytest.raises(ValueError, match="larger than 64 bytes"):
+        store.put_stream(chunked(PNG + b"\x00" * 10_000, consumed=consumed), max_bytes=64)
+
+    # The 64-byte limit is crossed by the fifth 16-byte chunk
+    assert len(consumed) == 5
+    assert stored_files(store) == []
+
+
+def test_put_stream_accepts_an_image_of_exactly_max_bytes(store):
+    digest, _, size = store.put_stream(chunked(PNG), max_bytes=len(PNG))
+
+    assert size == len(PNG)
+    assert store.exists(digest)
+
+
+def test_put_file_keeps_videos(store):
+    path = os.path.join(store.root, "render.mp4")
+    with open(path, "wb") as f:
+        f.write(MP4)
+
+    digest, content_type, size = store.put_file(path)
+
+    assert (content_type, size) == ("video/mp4", len(MP4))
+    assert not os.path.exists(path)
+    assert store.content_type(digest) == "video/mp4"
+
+
+@pytest.mark.parametrize("digest", ["", "../etc/passwd", "A" * 64, "a" * 63])
+def test_invalid_digests_never_exist(store, digest):
+    assert not store.exists(digest)
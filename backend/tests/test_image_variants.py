@@ -0,0 +1,80 @@
+import io
+
+import pytest
+from PIL import Image
+
+from services import image_variants
+from services.image_pool import ImageProcessPool
+from services.image_store import ImageStore
+from services.image_variants import ImageVariants, choose_format, variant_url
+
+
+def encode(size, image_format="PNG"):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (200, 120, 40)).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def variants(tmp_path, monkeypatch):
+    # No workers: transforms run inline, in the calling thread
+    pool = ImageProcessPool(workers=0)
+    monkeypatch.setattr(image_variants, "get_image_pool", lambda: pool)
+    store = ImageStore(root=str(tmp_path))
+    return ImageVariants(store=store, sizes={"thumbnail": 64, "full": 512}, quality=80)
+
+
+@pytest.mark.parametrize("accept, chosen", [
+    ([("image/webp", 1), ("image/*", 0.8)], "webp"),
+    ([("image/png", 1)], "png"),
+    ([("*/*", 1)], "jpeg"),
+    ([("image/webp", 0), ("image/png", 1)], "png"),
+    ([], "jpeg"),
+])
+def test_choose_format(accept, chosen):
+    assert choose_format(accept) == chosen
+
+
+def test_variant_urls(variants):
+    assert variant_url("abc") == "/api/images/abc"
+    assert variant_url("abc", "thumbnail", "webp") == "/api/images/abc?size=thumbnail&format=webp"
+    assert variants.urls("abc") == {"thumbnail": "/api/images/abc?size=thumbnail", "full": "/api/images/abc?size=full"}
+
+
+def test_get_renders_a_resized_variant_once(variants):
+    image_id = variants.store.put(encode((200, 100)))
+
+    path = variants.get(image_id, "thumbnail", "webp", wait=1)
+
+    with Image.open(path) as image:
+        assert image.format == "WEBP"
+        assert image.size == (64, 32)
+    assert variants.get(image_id, "thumbnail", "webp", wait=1) == path
+    stats = variants.stats()
+    assert (stats["rendered"], stats["ready_hits"], stats["pending"]) == (1, 1, 0)
+
+
+def test_small_images_are_not_upscaled(variants):
+    image_id = variants.store.put(encode((200, 100), "JPEG"))
+
+    with Image.open(variants.get(image_id, "full", "png", wait=1)) as image:
+        assert image.size == (200, 100)
+
+
+def test_failed_renders_return_none(variants, tmp_path):
+    image_id = variants.store.put(b"\x89PNG\r\n\x1a\n" + b"\x00" * 32)
+
+    assert variants.get(image_id, "thumbnail", "jpeg", wait=1) is None
+    assert variants.stats()["failed"] == 1
+
+
+def test_prerender_skips_sources_it_cannot_resize(variants, monkeypatch):
+    monkeypatch.setattr(image_variants, "IMAGE_VARIANT_PRERENDER", ["thumbnail:webp", "huge:webp"])
+    gif_id = variants.store.put(encode((80, 80), "GIF"))
+    png_id = variants.store.put(encode((80, 80)))
+
+    variants.prerender(gif_id)
+    variants.prerender(png_id)
+
+    assert variants.get(png_id, "thumbnail", "webp", wait=1) == variants.path_for(png_id, "thumbnail", "webp")
+    assert variants.stats()["rendered"] == 1
@@ -0,0 +1,168 @@
+import threading
+import time
+
+import pytest
+
+from services import job_queue
+from services.job_queue import JobQueue, QueueFullError
+from services.rate_limiter import RateLimitExceeded
+from services.response_cache import ResponseCache
+
+
+@pytest.fixture
+def store():
+    return ResponseCache(max_entries=100, max_bytes=100_000)
+
+
+@pytest.fixture
+def queue(store):
+    jobs = JobQueue(max_workers=2, max_pending=2, ttl=100, store=store)
+    yield jobs
+    jobs.executor.shutdown(wait=False)
+
+
+@pytest.fixture
+def other_worker(store):
+    jobs = JobQueue(max_workers=1, max_pending=1, ttl=100, store=store)
+    yield jobs
+    jobs.executor.shutdown(wait=False)
+
+
+def blocking_job(release, payload=None):
+    def run():
+        release.wait(2)
+        return payload or {"ok": True}, 200
+    return run
+
+
+def test_identical_pending_jobs_share_one_execution(queue):
+    release = threading.Event()
+    first, created = queue.submit("dream-cat", blocking_job(release), dedupe_key="same")
+    second, created_again = queue.submit("dream-cat", blocking_job(release), dedupe_key="same")
+
+    assert created and not created_again
+    assert second is first
+    release.set()
+    assert queue.wait(first.id, timeout=2)["status"] == "succeeded"
+
+    # Once finished, the key starts a fresh job
+    third, created = queue.submit("dream-cat", blocking_job(release), dedupe_key="same")
+    assert created and third is not first
+    assert queue.stats()["deduplicated"] == 1
+
+
+def test_submit_rejects_when_too_many_jobs_are_pending(queue):
+    release = threading.Event()
+    queue.submit("dream-cat", blocking_job(release))
+    queue.submit("dream-cat", blocking_job(release))
+
+    with pytest.raises(QueueFullError):
+        queue.submit("dream-cat", blocking_job(release))
+    assert queue.stats()["rejected"] == 1
+    release.set()
+
+
+def test_failed_job_keeps_the_error_and_its_status_code(queue):
+    def throttled():
+        raise RateLimitExceeded("Gemini quota exceeded")
+
+    job, _ = queue.submit("cat-video", throttled)
+    state = queue.wait(job.id, timeout=2)
+
+    assert state["status"] == "failed"
+    assert state["status_code"] == 429
+    assert state["error"] == "Gemini quota exceeded"
+    assert queue.stats()["failed"] == 1
+
+
+def test_wait_returns_the_current_state_when_the_timeout_elapses(queue):
+    release = threading.Event()
+    job, _ = queue.submit("dream-cat", blocking_job(release))
+
+    assert queue.wait(job.id, timeout=0.05)["status"] in ("queued", "running")
+    release.set()
+    assert queue.wait(job.id, timeout=2)["result"] == {"ok": True}
+
+
+def test_finished_jobs_expire_after_the_ttl(queue, monkeypatch):
+    job, _ = queue.submit("dream-cat", lambda: ({"ok": True}, 200))
+    assert job.done.wait(2)
+    assert queue.get(job.id)["status"] == "succeeded"
+
+    later_wall, later_mono = time.time() + 101, time.monotonic() + 101
+    monkeypatch.setattr(job_queue.time, "time", lambda: later_wall)
+    monkeypatch.setattr(job_queue.time, "monotonic", lambda: later_mono)
+
+    assert queue.get(job.id) is None
+    assert job.id not in queue._jobs
+
+
+def test_cleanup_runs_at_most_once_per_interval(queue, monkeypatch):
+    job, _ = queue.submit("dream-cat", lambda: ({"ok": True}, 200))
+    assert job.done.wait(2)
+    queue.stats()  # a cleanup has just run
+
+    start_mono = time.monotonic()
+    monkeypatch.setattr(job_queue.time, "time", lambda: job.finished_at + 101)
+    monkeypatch.setattr(job_queue.time, "monotonic", lambda: start_mono)
+    queue.stats()
+    assert job.id in queue._jobs
+
+    monkeypatch.setattr(job_queue.time, "monotonic", lambda: start_mono + queue.cleanup_interval)
+    queue.stats()
+    assert job.id not in queue._jobs
+
+
+def test_other_workers_read_job_state_from_the_shared_store(queue, other_worker):
+    job, _ = queue.submit("dream-cat", lambda: ({"ok": True}, 200))
+    assert job.done.wait(2)
+
+    assert queue.shared
+    assert other_worker.get(job.id)["status"] == "succeeded"
+    assert other_worker.get("missing") is None
+
+
+def test_other_workers_can_wait_on_a_job_they_did_not_run(queue, other_worker, monkeypatch):
+    monkeypatch.setattr(JobQueue, "REMOTE_POLL_INTERVAL", 0.01)
+    release = threading.Event()
+    job, _ = queue.submit("dream-cat", blocking_job(release))
+
+    assert other_worker.wait(job.id, timeout=0.05)["status"] in ("queued", "running")
+    threading.Timer(0.05, release.set).start()
+    assert other_worker.wait(job.id, timeout=2)["status"] == "succeeded"
+
+
+def test_without_a_store_job_state_stays_in_the_worker():
+    jobs = JobQueue(max_workers=1, max_pending=1, ttl=100)
+    try:
+        job, _ = jobs.submit("dream-cat", lambda: ({"ok": True}, 200))
+        assert job.done.wait(2)
+        assert not jobs.shared
+        assert jobs.get(job.id)["status"] == "succeeded"
+        assert JobQueue(max_workers=1, ttl=100).get(job.id) is None
+    finally:
+        jobs.executor.shutdown(wait=False)
+
+
+def test_sqlite_job_store_is_separate_from_the_response_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_STORE_BACKEND", "sqlite")
+    monkeypatch.setattr(job_queue, "JOB_STORE_PATH", str(tmp_path / "jobs.db"))
+    store = job_queue.get_job_store()
+    store.compaction_interval = 0
+    store.set("job:1", "{}", ttl=60)
+
+    assert store.path == str(tmp_path / "jobs.db")
+    assert store.get("job:1") == "{}"
+    monkeypatch.setattr(job_queue, "JOB_STORE_BACKEND", "memory")
+    assert job_queue.get_job_store() is None
+
+
+@pytest.mark.parametrize("available, expected", [(True, True), (False, False)])
+def test_async_requests_run_synchronously_without_shared_job_state(monkeypatch, available, expected):
+    import app as backend_app
+    monkeypatch.setattr(backend_app, "ASYNC_JOBS_AVAILABLE", available)
+
+    with backend_app.app.test_request_context("/api/dream-cat/generate?mode=async", method="POST"):
+        assert backend_app.is_async_request() is expected
+    with backend_app.app.test_request_context("/api/dream-cat/generate", method="POST"):
+        assert backend_app.is_async_request() is False
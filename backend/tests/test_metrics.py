@@ -0,0 +1,116 @@
+import pytest
+
+from services import metrics
+from services.metrics import Counter, Gauge, Histogram
+
+
+@pytest.fixture
+def collectors(monkeypatch):
+    registered = []
+    monkeypatch.setattr(metrics, "_collectors", registered)
+    return registered
+
+
+def test_counter_renders_help_type_and_labelled_samples():
+    counter = Counter("widgets", "Widgets made", ("kind",))
+    counter.labels("round").inc()
+    counter.labels("round").inc(2)
+    counter.labels('say "hi"\n').inc()
+
+    assert counter.render() == [
+        "# HELP catplatform_widgets_total Widgets made",
+        "# TYPE catplatform_widgets_total counter",
+        'catplatform_widgets_total{kind="round"} 3',
+        'catplatform_widgets_total{kind="say \\"hi\\"\\n"} 1',
+    ]
+
+
+def test_gauge_track_counts_while_the_block_runs():
+    gauge = Gauge("busy", "Busy things")
+
+    with gauge.track():
+        assert gauge.render()[-1] == "catplatform_busy 1"
+    assert gauge.render()[-1] == "catplatform_busy 0"
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("wait_seconds", "Waits", ("queue",), buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.labels("jobs").observe(value)
+
+    assert histogram.render()[2:] == [
+        'catplatform_wait_seconds_bucket{queue="jobs",le="0.1"} 2',
+        'catplatform_wait_seconds_bucket{queue="jobs",le="1"} 3',
+        'catplatform_wait_seconds_bucket{queue="jobs",le="+Inf"} 4',
+        'catplatform_wait_seconds_sum{queue="jobs"} 3.65',
+        'catplatform_wait_seconds_count{queue="jobs"} 4',
+    ]
+
+
+def test_wrong_label_count_is_an_error():
+    with pytest.raises(ValueError):
+        Counter("widgets", "Widgets made", ("kind",)).labels("round", "blue")
+
+
+def test_disabled_metrics_record_nothing(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", False)
+    counter = Counter("widgets", "Widgets made")
+
+    counter.labels().inc()
+
+    assert counter.render() == [
+        "# HELP catplatform_widgets_total Widgets made",
+        "# TYPE catplatform_widgets_total counter",
+    ]
+
+
+def test_component_stats_become_gauges(collectors):
+    metrics.register_stats("cache", lambda: {
+        "hits": 3, "enabled": True, "name": "memory", "per_host": {"api.example.com": 2}
+    })
+    metrics.register_stats("breaker", lambda: {"gemini": {"state": "open"}}, keyed_by="upstream")
+
+    assert metrics._collect_stats() == [
+        "# TYPE catplatform_cache_hits gauge",
+        "catplatform_cache_hits 3",
+        "# TYPE catplatform_cache_enabled gauge",
+        "catplatform_cache_enabled 1",
+        "# TYPE catplatform_cache_per_host gauge",
+        'catplatform_cache_per_host{key="api.example.com"} 2',
+        "# TYPE catplatform_breaker_state gauge",
+        'catplatform_breaker_state{upstream="gemini"} 2',
+    ]
+
+
+def test_a_failing_collector_does_not_break_the_scrape(collectors):
+    def broken():
+        raise RuntimeError("gone")
+
+    metrics.register_stats("broken", broken)
+    metrics.register_stats("fine", lambda: {"value": 1})
+
+    assert metrics._collect_stats() == ["# TYPE catplatform_fine_value gauge", "catplatform_fine_value 1"]
+
+
+def test_track_gemini_request_records_errors_by_class():
+    with pytest.raises(KeyError):
+        with metrics.track_gemini_request("MetricsTestAgent", "test-model", 12):
+            raise KeyError("boom")
+
+    text = metrics.render()
+    assert 'catplatform_upstream_errors_total{upstream="gemini",agent="MetricsTestAgent",error="KeyError"} 1' in text
+    assert 'catplatform_gemini_requests_in_flight{agent="MetricsTestAgent"} 0' in text
+    assert 'catplatform_gemini_request_duration_seconds_count{agent="MetricsTestAgent",model="test-model",outcome="error"} 1' in text
+
+
+def test_metrics_endpoint_serves_the_text_format():
+    import app as backend_app
+
+    response = backend_app.app.test_client().get("/metrics")
+
+    assert response.status_code == 200
+    assert response.content_type == metrics.CONTENT_TYPE
+    text = response.get_data(as_text=True)
+    assert "# TYPE catplatform_http_requests_total counter" in text
+    assert "# TYPE catplatform_response_cache_hits gauge" in text
+    assert "process_start_time_seconds" in text
@@ -0,0 +1,67 @@
+import pytest
+
+from agents import content_moderator_agent, simple_agent
+from agents.content_moderator_agent import ContentModeratorAgent
+from agents.moderation_prefilter import ModerationPrefilter
+from services.rate_limiter import RateLimitExceeded, UpstreamOverloaded
+from services.resilience import CircuitOpenError, DeadlineExceeded
+
+
+@pytest.fixture
+def prefilter():
+    return ModerationPrefilter(blocklist=["idiot"], allowlist=["thanks", "for", "the", "update"])
+
+
+@pytest.fixture
+def moderator():
+    moderator = ContentModeratorAgent()
+    moderator.prefilter = None
+    return moderator
+
+
+@pytest.mark.parametrize("error", [
+    CircuitOpenError("circuit open"),
+    DeadlineExceeded("out of time"),
+    RateLimitExceeded("Gemini rate limit reached"),
+    UpstreamOverloaded("Gemini is overloaded"),
+])
+@pytest.mark.parametrize("fail_open", [True, False])
+def test_throttled_gemini_falls_back_to_the_policy(moderator, monkeypatch, error, fail_open):
+    def throttled(*args, **kwargs):
+        raise error
+
+    monkeypatch.setattr(simple_agent, "generate_shared", throttled)
+    monkeypatch.setattr(content_moderator_agent, "MODERATION_FAIL_OPEN", fail_open)
+
+    result = moderator.process("quarterly numbers look interesting")
+
+    assert result["appropriate"] is fail_open
+    assert result["decided_by"] == "policy"
+    assert result["status"] == "unverified"
+    assert result["analysis"] == str(error)
+
+
+def test_prefilter_verdicts_skip_gemini(moderator, prefilter, monkeypatch):
+    monkeypatch.setattr(simple_agent, "generate_shared", pytest.fail)
+    moderator.prefilter = prefilter
+
+    assert moderator.process("you idiot")["decided_by"] == "prefilter"
+    assert moderator.process("thanks for the update")["appropriate"] is True
+
+
+def test_batch_sends_only_undecided_texts(moderator, prefilter, monkeypatch):
+    prompts = []
+
+    def generate(agent_type, model, model_name, contents, **kwargs):
+        prompts.append(contents)
+        return '[{"id": 0, "appropriate": true, "reason": "fine", "severity": "none"}]', "ok"
+
+    monkeypatch.setattr(simple_agent, "generate_shared", generate)
+    moderator.prefilter = prefilter
+
+    verdicts = moderator.moderate_batch(["you idiot", "quarterly numbers look interesting", "thanks"])
+
+    assert [verdict["decided_by"] for verdict in verdicts] == ["prefilter", "llm", "prefilter"]
+    assert [verdict["appropriate"] for verdict in verdicts] == [False, True, True]
+    assert len(prompts) == 1
+    assert "quarterly numbers" in prompts[0] and "idiot" not in prompts[0]
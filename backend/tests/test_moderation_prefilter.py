@@ -0,0 +1,64 @@
+import pytest
+
+from agents.moderation_prefilter import ModerationPrefilter, load_word_list
+
+
+@pytest.fixture
+def prefilter():
+    return ModerationPrefilter(
+        blocklist=["idiot", "shut up"],
+        allowlist=["thanks", "for", "the", "update", "see", "you", "at", "meeting"],
+        max_allow_words=8
+    )
+
+
+@pytest.mark.parametrize("text, term", [
+    ("You idiot", "idiot"),
+    ("what an 1d10t", "idiot"),
+    ("please SHUT   UP", "shut   up"),
+])
+def test_prefilter_blocks_listed_terms(prefilter, text, term):
+    verdict = prefilter.check(text)
+
+    assert verdict["appropriate"] is False
+    assert verdict["severity"] == "high"
+    assert term in verdict["reason"]
+
+
+def test_prefilter_only_blocks_whole_words(prefilter):
+    assert prefilter.check("idiotic") is None
+
+
+@pytest.mark.parametrize("text", ["Thanks for the update!", "see you at the meeting 🙂", "THANKS"])
+def test_prefilter_allows_short_everyday_text(prefilter, text):
+    verdict = prefilter.check(text)
+
+    assert verdict["appropriate"] is True
+    assert verdict["severity"] == "none"
+
+
+@pytest.mark.parametrize("text", [
+    "thanks for the update, meet me later",   # a word outside the allowlist
+    "thanks " * 9,                            # over max_allow_words
+    "THANKS FOR THE UPDATE",                  # shouting
+    "thanks password: hunter",                # looks confidential
+    "see you 4111 1111 1111 1111",            # card-like number
+    "!!!",                                    # no words at all
+])
+def test_prefilter_leaves_ambiguous_text_to_gemini(prefilter, text):
+    assert prefilter.check(text) is None
+
+
+def test_load_word_list_skips_comments_and_blank_lines(tmp_path):
+    path = tmp_path / "words.txt"
+    path.write_text("# heading\nFoo\n\n  bar baz  \n  # indented comment\n", encoding="utf-8")
+
+    assert load_word_list(str(path)) == ["foo", "bar baz"]
+    assert load_word_list(str(tmp_path / "missing.txt")) == []
+
+
+def test_shipped_word_lists():
+    prefilter = ModerationPrefilter()
+
+    assert prefilter.check("this is bullsh1t")["appropriate"] is False
+    assert prefilter.check("Thanks for the update about the agenda")["appropriate"] is True
@@ -0,0 +1,153 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from agents import orchestrator as orchestrator_module
+from agents import simple_agent
+from agents.orchestrator import MultiAgentOrchestrator
+from services.rate_limiter import RateLimitExceeded
+from services.resilience import deadline_scope, remaining_budget
+
+
+class StubAgent:
+    def __init__(self, agent_type, process, **methods):
+        self.agent_type = agent_type
+        self.process = process
+        for name, method in methods.items():
+            setattr(self, name, method)
+
+
+class EchoModel:
+    def generate_content(self, contents, generation_config=None, request_options=None):
+        return SimpleNamespace(text=contents, usage_metadata=None)
+
+
+def send_to_gemini(text):
+    """One uncached, uncoalesced request through the shared Gemini layers"""
+    return simple_agent.generate_shared(
+        "TestAgent", EchoModel(), "test-model", text,
+        cache_key=None, flight_key=None, cache_ttl=0
+    )[0]
+
+
+@pytest.fixture
+def orchestrator():
+    return MultiAgentOrchestrator()
+
+
+@pytest.mark.parametrize("configured, override, requested, expected", [
+    ("concurrent", False, None, "concurrent"),
+    ("concurrent", False, "Sequential", "sequential"),
+    ("sequential", False, "concurrent", "sequential"),
+    ("sequential", True, "concurrent", "concurrent"),
+    ("sequential", False, "sequential", "sequential"),
+])
+def test_resolve_mode(monkeypatch, configured, override, requested, expected):
+    monkeypatch.setattr(orchestrator_module, "PIPELINE_MODE", configured)
+    monkeypatch.setattr(orchestrator_module, "PIPELINE_MODE_OVERRIDE", override)
+
+    assert MultiAgentOrchestrator.resolve_mode(requested) == expected
+
+
+@pytest.mark.parametrize("requested", ["concurent", "", 1, ["concurrent"]])
+def test_unknown_modes_are_rejected(requested):
+    with pytest.raises(ValueError):
+        MultiAgentOrchestrator.resolve_mode(requested)
+
+
+@pytest.mark.parametrize("path", ["/api/text-to-cat", "/api/text-to-cat/stream", "/api/agents/pipeline"])
+@pytest.mark.parametrize("mode", ["concurent", 7])
+def test_routes_answer_400_for_a_bad_pipeline_mode(path, mode):
+    import app as backend_app
+
+    response = backend_app.app.test_client().post(path, json={"text": "hello team", "pipeline_mode": mode})
+    assert response.status_code == 400
+    assert "pipeline_mode" in response.get_json()["error"]
+
+
+def test_speculative_translation_is_cancelled_when_moderation_raises(orchestrator):
+    translated = []
+
+    def shed(text):
+        raise RateLimitExceeded("Gemini rate limit reached")
+
+    orchestrator.cat_translator = StubAgent("CatTranslatorAgent", translated.append)
+    orchestrator.moderator = StubAgent("ContentModeratorAgent", shed)
+    # Keep the only pipeline worker busy so the translation is still queued
+    busy = threading.Event()
+    orchestrator.executor = ThreadPoolExecutor(max_workers=1)
+    orchestrator.executor.submit(busy.wait, 2)
+    try:
+        with pytest.raises(RateLimitExceeded):
+            orchestrator.process_pipeline("hello team", mode="concurrent")
+    finally:
+        busy.set()
+        orchestrator.executor.shutdown(wait=True)
+    assert translated == []
+
+
+def batch_orchestrator(orchestrator, translate_batch, moderate_batch=None, translate=None):
+    approve = {"appropriate": True}
+    orchestrator.moderator = StubAgent(
+        "ContentModeratorAgent", lambda text: approve,
+        moderate_batch=moderate_batch or (lambda texts: [approve] * len(texts))
+    )
+    orchestrator.cat_translator = StubAgent(
+        "CatTranslatorAgent", translate or (lambda text: {"cat_translation": send_to_gemini(text)}),
+        translate_batch=translate_batch
+    )
+    return orchestrator
+
+
+def test_batch_counts_only_requests_sent(orchestrator):
+    def translate_batch(texts):
+        if "shed" in texts:
+            raise RateLimitExceeded("Gemini rate limit reached")
+        send_to_gemini("pack")
+        # The second item comes back garbled and is retried on its own
+        return [texts[0], None]
+
+    batch_orchestrator(orchestrator, translate_batch)
+
+    result = orchestrator.process_batch(["a", "b", "shed", "c"], pack_size=2)
+
+    # The moderation stub answers locally (a cache or prefilter hit), the
+    # first pack sends its batch request plus one retry and the shed pack
+    # sends nothing
+    assert result["llm_calls"] == 2
+    assert result["retried_items"] == 1
+    assert result["failed_items"] == 2
+    assert [item["status"] for item in result["results"]] == ["completed", "completed", "error", "error"]
+
+
+def test_shed_retries_are_not_counted(orchestrator):
+    def shed(text):
+        raise RateLimitExceeded("Gemini rate limit reached")
+
+    batch_orchestrator(orchestrator, lambda texts: [None] * len(texts), translate=shed)
+
+    result = orchestrator.process_batch(["a", "b"], skip_moderation=True)
+
+    assert result["llm_calls"] == 0
+    assert result["retried_items"] == 2
+    assert result["failed_items"] == 2
+
+
+def test_packs_run_under_the_request_deadline(orchestrator):
+    budgets = []
+
+    def translate_batch(texts):
+        budgets.append(remaining_budget())
+        return list(texts)
+
+    batch_orchestrator(orchestrator, translate_batch)
+
+    with deadline_scope(30):
+        orchestrator.process_batch(["a", "b", "c"], pack_size=1)
+    orchestrator.process_batch(["d"])
+
+    assert len(budgets) == 4
+    assert all(budget is not None and 0 < budget <= 30 for budget in budgets[:3])
+    assert budgets[3] is None
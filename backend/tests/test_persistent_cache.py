@@ -0,0 +1,86 @@
+import pytest
+
+from services import persistent_cache
+from services.persistent_cache import SQLiteResponseCache, TieredResponseCache
+from services.response_cache import ResponseCache
+
+
+@pytest.fixture
+def store(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(persistent_cache.time, "time", clock)
+    return SQLiteResponseCache(str(tmp_path / "cache.db"), max_bytes=10_000, compaction_interval=0)
+
+
+def test_lookup_reports_remaining_ttl_and_expires(store, clock):
+    store.set("key", "value", ttl=30)
+    clock.advance(10)
+
+    value, ttl_left = store.lookup("key")
+    assert value == "value"
+    assert ttl_left == pytest.approx(20)
+
+    clock.advance(20)
+    assert store.lookup("key") == (None, 0.0)
+    assert store.stats()["hits"] == 1
+    assert store.stats()["misses"] == 1
+
+
+def test_entries_survive_a_new_instance_on_the_same_file(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(persistent_cache.time, "time", clock)
+    path = str(tmp_path / "cache.db")
+    SQLiteResponseCache(path, max_bytes=10_000, compaction_interval=0).set("key", "value", ttl=60)
+
+    reopened = SQLiteResponseCache(path, max_bytes=10_000, compaction_interval=0)
+    assert reopened.get("key") == "value"
+
+
+def test_compact_drops_expired_rows_and_evicts_least_recently_used(store, clock):
+    store.max_bytes = 25
+    store.set("old", "x" * 7, ttl=1)
+    store.set("a", "x" * 9, ttl=600)
+    clock.advance(1)
+    store.set("b", "x" * 9, ttl=600)
+    clock.advance(SQLiteResponseCache.ACCESS_RESOLUTION + 1)
+    assert store.get("a") is not None  # a is now more recent than b
+    store.set("c", "x" * 9, ttl=600)
+
+    assert store.compact() == {"expired": 1, "evicted": 1}
+    assert store.get("a") is not None
+    assert store.get("b") is None
+    assert store.get("c") is not None
+    assert store.stats()["bytes"] == 20
+
+
+def test_oversized_values_and_non_positive_ttls_are_not_stored(store):
+    store.set("big", "x" * 20_000, ttl=60)
+    store.set("zero", "x", ttl=0)
+
+    assert store.stats()["entries"] == 0
+
+
+def test_tiered_cache_promotes_persistent_hits_for_their_remaining_ttl(store, clock, monkeypatch):
+    from services import response_cache
+    monkeypatch.setattr(response_cache.time, "monotonic", clock)
+    store.set("key", "value", ttl=30)
+    clock.advance(10)
+    memory = ResponseCache(max_entries=10, max_bytes=10_000)
+    tiered = TieredResponseCache(memory, store)
+
+    assert tiered.get("key") == "value"
+    assert memory.get("key") == "value"
+
+    clock.advance(20)
+    assert memory.get("key") is None
+    assert tiered.get("key") is None
+
+
+def test_tiered_cache_writes_and_clears_both_tiers(store):
+    memory = ResponseCache(max_entries=10, max_bytes=10_000)
+    tiered = TieredResponseCache(memory, store)
+    tiered.set("key", "value", ttl=60)
+
+    assert memory.get("key") == "value"
+    assert store.get("key") == "value"
+
+    tiered.clear()
+    assert tiered.get("key") is None
@@ -0,0 +1,138 @@
+import json
+import threading
+import time
+
+import pytest
+
+from agents import orchestrator as orchestrator_module
+from agents.orchestrator import MultiAgentOrchestrator, BLOCKED_OUTPUT
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.001)
+
+
+class StubModerator:
+    agent_type = "ContentModeratorAgent"
+
+    def __init__(self, appropriate=True):
+        self.appropriate = appropriate
+
+    def process(self, text):
+        return {"appropriate": self.appropriate, "analysis": "checked", "status": "analyzed"}
+
+
+class StubTranslator:
+    agent_type = "CatTranslatorAgent"
+
+    def __init__(self, pieces, error=None, gate=None):
+        self.pieces = pieces
+        self.error = error
+        self.gate = gate
+        self.sent = []
+        self.closed = threading.Event()
+
+    def process_stream(self, text):
+        try:
+            for piece in self.pieces:
+                if self.gate is not None and self.sent:
+                    self.gate.wait(2)
+                self.sent.append(piece)
+                yield piece
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.closed.set()
+
+    def last_call_cached(self):
+        return False
+
+
+@pytest.fixture
+def orchestrator():
+    return MultiAgentOrchestrator()
+
+
+def read_events(body):
+    events = []
+    for message in body.split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in message.splitlines() if not line.startswith(":"))
+        if lines:
+            events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def client(monkeypatch):
+    import app as backend_app
+
+    def use(moderator, translator):
+        monkeypatch.setattr(backend_app.orchestrator, "moderator", moderator)
+        monkeypatch.setattr(backend_app.orchestrator, "cat_translator", translator)
+        return backend_app.app.test_client()
+    return use
+
+
+@pytest.mark.parametrize("mode", ["concurrent", "sequential"])
+def test_stream_sends_the_verdict_then_pieces_then_the_result(client, monkeypatch, mode):
+    monkeypatch.setattr(orchestrator_module, "PIPELINE_MODE", mode)
+
+    response = client(StubModerator(), StubTranslator(["Meow ", "mrrp ", "😺"])).post(
+        "/api/text-to-cat/stream", json={"text": "hello team"}
+    )
+
+    assert response.mimetype == "text/event-stream"
+    events = read_events(response.get_data(as_text=True))
+    assert [name for name, _ in events] == ["moderation", "translation", "translation", "translation", "done"]
+    assert [data["text"] for name, data in events if name == "translation"] == ["Meow ", "mrrp ", "😺"]
+    done = events[-1][1]
+    assert (done["final_output"], done["status"]) == ("Meow mrrp 😺", "completed")
+    assert [step["agent"] for step in done["pipeline"]] == ["ContentModeratorAgent", "CatTranslatorAgent"]
+    assert "trace" in done
+
+
+def test_blocked_text_gets_no_translation(client):
+    events = read_events(client(StubModerator(appropriate=False), StubTranslator(["Meow"])).post(
+        "/api/text-to-cat/stream", json={"text": "hello team"}
+    ).get_data(as_text=True))
+
+    assert [name for name, _ in events] == ["moderation", "done"]
+    assert (events[-1][1]["final_output"], events[-1][1]["status"]) == (BLOCKED_OUTPUT, "blocked")
+
+
+def test_a_failing_translation_ends_with_an_error_event(client):
+    translator = StubTranslator(["Meow "], error=RuntimeError("stream reset"))
+
+    events = read_events(client(StubModerator(), translator).post(
+        "/api/text-to-cat/stream", json={"text": "hello team"}
+    ).get_data(as_text=True))
+
+    assert [name for name, _ in events] == ["moderation", "translation", "error", "done"]
+    assert "stream reset" in events[2][1]["error"]
+    assert events[-1][1]["status"] == "error"
+
+
+def test_missing_text_is_a_400(client):
+    response = client(StubModerator(), StubTranslator([])).post("/api/text-to-cat/stream", json={})
+
+    assert response.status_code == 400
+
+
+def test_closing_the_stream_stops_the_translation(orchestrator):
+    gate = threading.Event()
+    translator = StubTranslator(["Meow ", "mrrp ", "purr"], gate=gate)
+    orchestrator.moderator = StubModerator()
+    orchestrator.cat_translator = translator
+
+    events = orchestrator.process_pipeline_stream("hello team", mode="sequential")
+    assert next(events)[0] == "moderation"
+    assert next(events) == ("translation", {"text": "Meow "})
+    events.close()
+    gate.set()
+
+    wait_until(translator.closed.is_set)
+    assert translator.sent == ["Meow ", "mrrp "]
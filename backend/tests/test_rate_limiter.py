@@ -0,0 +1,232 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from services import rate_limiter
+from services.rate_limiter import (
+    AdaptiveConcurrencyLimiter, GeminiLimiter, RateLimitExceeded, TokenBucket,
+    UpstreamOverloaded
+)
+from services.resilience import CircuitOpenError, DeadlineExceeded
+
+
+@pytest.fixture
+def fake_time(clock, monkeypatch):
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock)
+    return clock
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.001)
+
+
+def make_limiter(**kwargs):
+    options = {"model_rpm": 60, "burst": 1, "agent_rpm": {}, "max_wait": 0, "quota_backoff": 30}
+    options.update(kwargs)
+    limiter = GeminiLimiter(**options)
+    limiter.concurrency = AdaptiveConcurrencyLimiter(initial=2, minimum=1, maximum=8, max_queue=0)
+    return limiter
+
+
+def test_token_bucket_queues_within_max_wait_and_refuses_beyond(fake_time):
+    bucket = TokenBucket(rate_per_minute=60, burst=1)
+
+    assert bucket.reserve(max_wait=5) == 0.0
+    assert bucket.reserve(max_wait=5) == pytest.approx(1.0)
+    assert bucket.reserve(max_wait=1.5) is None  # would have to wait 2s
+    fake_time.advance(2)
+    assert bucket.reserve(max_wait=0) == 0.0
+
+
+def test_token_bucket_pause_blocks_for_the_given_time(fake_time):
+    bucket = TokenBucket(rate_per_minute=60, burst=5)
+    bucket.pause(10)
+
+    assert bucket.retry_after() == pytest.approx(11)
+    fake_time.advance(11)
+    assert bucket.reserve(max_wait=0) == 0.0
+
+
+def test_limiter_sheds_with_rate_limit_exceeded_when_out_of_tokens(fake_time):
+    limiter = make_limiter()
+    with limiter.slot("model", "Agent"):
+        pass
+
+    with pytest.raises(RateLimitExceeded) as info:
+        with limiter.slot("model", "Agent"):
+            pytest.fail("a shed call must not run")
+    assert info.value.status_code == 429
+    assert info.value.retry_after == pytest.approx(1.0)
+    assert limiter.stats()["admitted"] == 1
+    assert limiter.stats()["rate_limited"] == 1
+
+
+def test_agent_bucket_refusal_refunds_the_model_token(fake_time):
+    limiter = make_limiter(model_rpm=60, burst=2, agent_rpm={"Chatty": 60})
+    limiter._bucket("agent:Chatty", 60).tokens = 0
+
+    with pytest.raises(RateLimitExceeded):
+        with limiter.slot("model", "Chatty"):
+            pass
+    assert limiter._buckets["model:model"].tokens == pytest.approx(2)
+
+
+def test_concurrency_limiter_sheds_when_the_queue_is_full():
+    limiter = AdaptiveConcurrencyLimiter(initial=1, minimum=1, maximum=4, max_queue=0)
+    limiter.acquire(timeout=1)
+
+    with pytest.raises(UpstreamOverloaded) as info:
+        limiter.acquire(timeout=1)
+    assert info.value.status_code == 503
+
+
+def test_concurrency_limiter_sheds_when_no_slot_frees_in_time():
+    limiter = AdaptiveConcurrencyLimiter(initial=1, minimum=1, maximum=4, max_queue=5)
+    limiter.acquire(timeout=1)
+
+    with pytest.raises(UpstreamOverloaded):
+        limiter.acquire(timeout=0.01)
+    assert limiter.stats()["waiting"] == 0
+
+
+def test_limiter_counts_overloaded_calls(fake_time):
+    limiter = make_limiter(burst=5)
+    limiter.concurrency = AdaptiveConcurrencyLimiter(initial=1, minimum=1, maximum=4, max_queue=0)
+
+    with limiter.slot("model", "Agent"):
+        with pytest.raises(UpstreamOverloaded):
+            with limiter.slot("model", "Agent"):
+                pass
+    assert limiter.stats()["overloaded"] == 1
+    assert limiter.concurrency.in_flight == 0
+
+
+def test_quota_error_halves_concurrency_and_pauses_buckets(fake_time):
+    limiter = make_limiter(burst=5)
+    limiter.concurrency = AdaptiveConcurrencyLimiter(initial=8, minimum=1, maximum=16, max_queue=0)
+
+    with pytest.raises(RateLimitExceeded) as info:
+        with limiter.slot("model", "Agent"):
+            raise google_exceptions.ResourceExhausted("quota")
+    assert info.value.retry_after == 30
+    assert limiter.concurrency.limit == 4
+    assert limiter.stats()["quota_errors"] == 1
+
+    with pytest.raises(RateLimitExceeded):
+        with limiter.slot("model", "Agent"):
+            pass
+
+
+def test_other_errors_pass_through_without_moving_the_limit(fake_time):
+    limiter = make_limiter(burst=5)
+
+    with pytest.raises(ValueError):
+        with limiter.slot("model", "Agent"):
+            raise ValueError("bad prompt")
+    assert limiter.concurrency.limit == 2
+    assert limiter.concurrency.in_flight == 0
+
+
+def test_aimd_increases_on_success_and_backs_off_on_slow_calls(fake_time):
+    limiter = AdaptiveConcurrencyLimiter(initial=4, minimum=1, maximum=8,
+                                         max_queue=0, latency_tolerance=2.0)
+    limiter.acquire(timeout=0)
+    limiter.release(latency=1.0, outcome="ok")
+    assert limiter.limit == pytest.approx(4.25)
+
+    limiter.acquire(timeout=0)
+    limiter.release(latency=5.0, outcome="ok")
+    assert limiter.limit == pytest.approx(4.25 * 0.9)
+
+    # A second congestion signal within a second is the same burst
+    limiter.acquire(timeout=0)
+    limiter.release(latency=0.1, outcome="throttled")
+    assert limiter.limit == pytest.approx(4.25 * 0.9)
+
+    fake_time.advance(1)
+    limiter.acquire(timeout=0)
+    limiter.release(latency=0.1, outcome="throttled")
+    assert limiter.limit == pytest.approx(4.25 * 0.9 * 0.5)
+
+
+@pytest.mark.parametrize("error, status, retry_after", [
+    (RateLimitExceeded("over quota", retry_after=2.2), 429, 3),
+    (UpstreamOverloaded("no capacity", retry_after=0.2), 503, 1),
+    (CircuitOpenError("circuit open", retry_after=5), 503, 5),
+    (DeadlineExceeded("out of time", retry_after=1.0), 504, 1),
+])
+def test_shed_calls_map_to_status_and_retry_after(error, status, retry_after):
+    import app as backend_app
+
+    with backend_app.app.test_request_context():
+        response = backend_app.app.make_response(
+            backend_app.app.handle_user_exception(error)
+        )
+    assert response.status_code == status
+    assert response.headers["Retry-After"] == str(retry_after)
+    assert response.get_json() == {"error": str(error), "retry_after": retry_after}
+
+
+def test_overloaded_call_refunds_its_tokens(fake_time):
+    limiter = make_limiter(burst=2)
+    limiter.concurrency = AdaptiveConcurrencyLimiter(initial=1, minimum=1, maximum=4, max_queue=0)
+
+    with limiter.slot("model", "Agent"):
+        with pytest.raises(UpstreamOverloaded):
+            with limiter.slot("model", "Agent"):
+                pass
+    # Only the admitted call spent a token
+    assert limiter._buckets["model:model"].tokens == pytest.approx(1)
+
+
+def test_latency_baselines_are_kept_per_model_and_operation(fake_time):
+    limiter = make_limiter(burst=10)
+    limiter.concurrency.latency_tolerance = 2.0
+
+    def call(operation, seconds):
+        with limiter.slot("model", "Agent", operation):
+            fake_time.advance(seconds)
+
+    call("generate", 0.5)
+    limit = limiter.concurrency.limit
+    # A long batch answer is not compared with short calls
+    call("batch", 20)
+    assert limiter.concurrency.limit > limit
+    assert limiter.stats()["concurrency"]["baseline_latency_ms"] == {
+        "model:generate": 500.0, "model:batch": 20000.0
+    }
+
+    fake_time.advance(1)
+    limit = limiter.concurrency.limit
+    call("generate", 5)
+    assert limiter.concurrency.limit == pytest.approx(limit * 0.9)
+
+
+class StreamingModel:
+    def __init__(self, pieces):
+        self.pieces = pieces
+
+    def generate_content(self, contents, generation_config=None, stream=False, request_options=None):
+        return [SimpleNamespace(text=piece, usage_metadata=None) for piece in self.pieces]
+
+
+def test_stream_releases_its_slot_when_gemini_is_done_not_the_reader(monkeypatch):
+    from agents import simple_agent
+    limiter = make_limiter(burst=10)
+    monkeypatch.setattr(simple_agent, "get_gemini_limiter", lambda: limiter)
+    agent = simple_agent.BaseAgent("You are a test agent.", "StreamTestAgent")
+    agent.model = StreamingModel(["Meow ", "mrow"])
+
+    stream = agent.stream_gemini("hello", temperature=1.0)
+    assert next(stream) == "Meow "
+    wait_until(lambda: limiter.concurrency.in_flight == 0 and limiter.stats()["admitted"] == 1)
+    assert list(stream) == ["mrow"]
+    assert set(limiter.stats()["concurrency"]["baseline_latency_ms"]) == {
+        f"{simple_agent.GEMINI_MODEL}:stream"
+    }
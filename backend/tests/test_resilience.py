@@ -0,0 +1,182 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from services import resilience
+from services.rate_limiter import RateLimitExceeded
+from services.resilience import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceeded, call_timeout, deadline_scope,
+    last_retry_count, remaining_budget, retry_call, submit_in_context
+)
+
+
+@pytest.fixture
+def fake_time(clock, monkeypatch):
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    monkeypatch.setattr(resilience.time, "sleep", clock.advance)
+    monkeypatch.setattr(resilience, "backoff_delay", lambda attempt: 0.5)
+    return clock
+
+
+def fail_with(error):
+    def call():
+        raise error
+    return call
+
+
+def trip(breaker, times):
+    for _ in range(times):
+        with pytest.raises(requests.ConnectionError):
+            with breaker.guard():
+                raise requests.ConnectionError("down")
+
+
+def test_breaker_opens_after_consecutive_transient_failures(fake_time):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=10)
+    trip(breaker, 2)
+    assert breaker.state == "closed"
+    trip(breaker, 1)
+    assert breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError) as info:
+        with breaker.guard():
+            pytest.fail("an open circuit must not call the upstream")
+    assert info.value.status_code == 503
+    assert info.value.retry_after == pytest.approx(10)
+    assert breaker.stats()["rejected"] == 1
+    assert breaker.stats()["times_opened"] == 1
+
+
+def test_success_resets_the_failure_count(fake_time):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=10)
+    trip(breaker, 1)
+    with breaker.guard():
+        pass
+    trip(breaker, 1)
+    assert breaker.state == "closed"
+
+
+def test_non_transient_errors_and_shed_calls_do_not_count(fake_time):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=10)
+    with pytest.raises(ValueError):
+        with breaker.guard():
+            raise ValueError("bad prompt")
+    with pytest.raises(RateLimitExceeded):
+        with breaker.guard():
+            raise RateLimitExceeded("over quota")
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_one_probe_through_and_closes_on_success(fake_time):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=10)
+    trip(breaker, 1)
+    fake_time.advance(10)
+
+    with breaker.guard():
+        assert breaker.state == "half_open"
+        with pytest.raises(CircuitOpenError):
+            with breaker.guard():
+                pass
+    assert breaker.state == "closed"
+    with breaker.guard():
+        pass
+
+
+def test_failed_probe_reopens_the_circuit(fake_time):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=10)
+    trip(breaker, 3)
+    fake_time.advance(10)
+    trip(breaker, 1)
+
+    assert breaker.state == "open"
+    assert breaker.stats()["times_opened"] == 2
+    with pytest.raises(CircuitOpenError):
+        with breaker.guard():
+            pass
+
+
+def test_shed_probe_releases_the_half_open_slot(fake_time):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=10)
+    trip(breaker, 1)
+    fake_time.advance(10)
+    with pytest.raises(RateLimitExceeded):
+        with breaker.guard():
+            raise RateLimitExceeded("over quota")
+
+    with breaker.guard():
+        pass
+    assert breaker.state == "closed"
+
+
+def test_retry_call_retries_transient_errors_until_success(fake_time):
+    outcomes = [requests.Timeout("slow"), requests.ConnectionError("reset"), "ok"]
+
+    def call():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert retry_call(call, attempts=3) == "ok"
+    assert last_retry_count() == 2
+
+
+def test_retry_call_gives_up_after_the_last_attempt(fake_time):
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise requests.Timeout("slow")
+
+    with pytest.raises(requests.Timeout):
+        retry_call(call, attempts=3)
+    assert len(calls) == 3
+
+
+def test_retry_call_does_not_retry_permanent_or_shed_errors(fake_time):
+    for error in (ValueError("bad prompt"), RateLimitExceeded("over quota")):
+        calls = []
+
+        def call():
+            calls.append(1)
+            raise error
+
+        with pytest.raises(type(error)):
+            retry_call(call, attempts=3)
+        assert len(calls) == 1
+
+
+def test_retry_call_stops_when_the_deadline_leaves_no_time(fake_time):
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise requests.Timeout("slow")
+
+    with deadline_scope(resilience.MIN_CALL_TIMEOUT + 0.1):
+        with pytest.raises(requests.Timeout):
+            retry_call(call, attempts=3)
+    assert len(calls) == 1
+
+
+def test_call_timeout_is_cut_to_the_remaining_budget(fake_time):
+    assert call_timeout(30) == 30
+    with deadline_scope(10):
+        assert call_timeout(30) == pytest.approx(10)
+        with deadline_scope(60):
+            # Nested scopes only shrink the budget
+            assert call_timeout(30) == pytest.approx(10)
+        fake_time.advance(10)
+        with pytest.raises(DeadlineExceeded) as info:
+            call_timeout(30)
+    assert info.value.status_code == 504
+
+
+def test_submit_in_context_carries_the_deadline_into_the_worker(fake_time):
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        with deadline_scope(10):
+            fake_time.advance(4)
+            assert submit_in_context(executor, remaining_budget).result() == pytest.approx(6)
+            # A plain submit runs without one
+            assert executor.submit(remaining_budget).result() is None
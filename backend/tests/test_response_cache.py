@@ -0,0 +1,68 @@
+from services import response_cache
+from services.response_cache import ResponseCache, make_cache_key
+
+
+def test_get_returns_value_until_ttl_expires(clock, monkeypatch):
+    monkeypatch.setattr(response_cache.time, "monotonic", clock)
+    cache = ResponseCache(max_entries=10, max_bytes=10_000)
+    cache.set("key", "value", ttl=5)
+
+    clock.advance(4.9)
+    assert cache.get("key") == "value"
+    clock.advance(0.1)
+    assert cache.get("key") is None
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["bytes"] == 0
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = ResponseCache(max_entries=2, max_bytes=10_000)
+    cache.set("a", "1", ttl=60)
+    cache.set("b", "2", ttl=60)
+    cache.get("a")  # b is now the least recently used
+    cache.set("c", "3", ttl=60)
+
+    assert cache.get("a") == "1"
+    assert cache.get("b") is None
+    assert cache.get("c") == "3"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_budget_evicts_until_it_fits():
+    cache = ResponseCache(max_entries=100, max_bytes=25)
+    cache.set("a", "x" * 9, ttl=60)   # 10 bytes with the key
+    cache.set("b", "x" * 9, ttl=60)
+    cache.set("c", "x" * 9, ttl=60)   # 30 bytes: a goes
+
+    assert cache.get("a") is None
+    assert cache.get("b") is not None and cache.get("c") is not None
+    assert cache.stats()["bytes"] == 20
+
+
+def test_oversized_values_and_non_positive_ttls_are_not_stored():
+    cache = ResponseCache(max_entries=10, max_bytes=10)
+    cache.set("a", "x" * 50, ttl=60)
+    cache.set("b", "x", ttl=0)
+
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_overwriting_a_key_keeps_the_byte_count_right():
+    cache = ResponseCache(max_entries=10, max_bytes=1000)
+    cache.set("a", "x" * 10, ttl=60)
+    cache.set("a", "x" * 20, ttl=60)
+
+    assert cache.get("a") == "x" * 20
+    assert cache.stats()["bytes"] == 21
+
+
+def test_cache_key_covers_agent_prompt_message_and_config():
+    base = make_cache_key("Agent", "system", "hello", {"temperature": 0.3})
+
+    assert base == make_cache_key("Agent", "system", "hello", {"temperature": 0.3})
+    assert base != make_cache_key("Other", "system", "hello", {"temperature": 0.3})
+    assert base != make_cache_key("Agent", "edited system", "hello", {"temperature": 0.3})
+    assert base != make_cache_key("Agent", "system", "hello!", {"temperature": 0.3})
+    assert base != make_cache_key("Agent", "system", "hello", {"temperature": 0.4})
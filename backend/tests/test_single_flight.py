@@ -0,0 +1,263 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from agents import simple_agent
+from services.response_cache import ResponseCache
+from services.resilience import DeadlineExceeded
+from services.single_flight import SingleFlight, SingleFlightTimeout
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.001)
+
+
+def run_concurrently(count, target):
+    """Start count threads calling target(); return (results, errors, threads)"""
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(target())
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return results, errors, threads
+
+
+def test_concurrent_callers_share_one_execution():
+    group = SingleFlight("test")
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(2)
+        return "value"
+
+    results, errors, threads = run_concurrently(5, lambda: group.do("key", fn))
+    wait_until(lambda: group.stats()["waiting"] == 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(calls) == 1
+    assert sorted(results) == [("value", False)] + [("value", True)] * 4
+    assert group.stats() == {
+        "in_flight": 0, "waiting": 0, "executed": 1,
+        "coalesced": 4, "errors": 0, "timeouts": 0, "retried": 0
+    }
+
+
+def test_leader_error_is_raised_to_every_waiter():
+    group = SingleFlight("test")
+    release = threading.Event()
+    failure = RuntimeError("upstream failed")
+
+    def fn():
+        release.wait(2)
+        raise failure
+
+    results, errors, threads = run_concurrently(3, lambda: group.do("key", fn))
+    wait_until(lambda: group.stats()["waiting"] == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == []
+    assert errors == [failure] * 3
+    assert group.stats()["errors"] == 1
+
+
+def test_waiters_retry_when_the_leader_error_is_its_own():
+    group = SingleFlight("test")
+    release = threading.Event()
+    leader_error = DeadlineExceeded("leader out of time")
+    calls = []
+
+    def leader_fn():
+        calls.append("leader")
+        release.wait(2)
+        raise leader_error
+
+    retry_release = threading.Event()
+
+    def waiter_fn():
+        calls.append("waiter")
+        retry_release.wait(2)
+        return "value"
+
+    def not_shared(error):
+        return not isinstance(error, DeadlineExceeded)
+
+    leader = run_concurrently(1, lambda: group.do("key", leader_fn, share_error=not_shared))
+    wait_until(lambda: group.stats()["in_flight"] == 1)
+    waiters = run_concurrently(3, lambda: group.do("key", waiter_fn, share_error=not_shared))
+    wait_until(lambda: group.stats()["waiting"] == 3)
+    release.set()
+    wait_until(lambda: group.stats()["retried"] == 3 and group.stats()["waiting"] == 2)
+    retry_release.set()
+    for thread in leader[2] + waiters[2]:
+        thread.join()
+
+    assert leader[1] == [leader_error]
+    # One waiter became the new leader, the others shared its answer
+    assert calls == ["leader", "waiter"]
+    assert sorted(waiters[0]) == [("value", False), ("value", True), ("value", True)]
+    assert group.stats()["retried"] == 3
+
+
+def test_key_is_released_once_the_call_finishes():
+    group = SingleFlight("test")
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return len(calls)
+
+    assert group.do("key", fn) == (1, False)
+    assert group.do("key", fn) == (2, False)
+    assert group.stats()["in_flight"] == 0
+
+
+def test_waiter_times_out_without_interrupting_the_leader():
+    group = SingleFlight("test")
+    release = threading.Event()
+    leader = threading.Thread(target=lambda: group.do("key", lambda: release.wait(2)))
+    leader.start()
+    wait_until(lambda: group.stats()["in_flight"] == 1)
+
+    with pytest.raises(SingleFlightTimeout):
+        group.do("key", lambda: "unused", timeout=0.01)
+
+    release.set()
+    leader.join()
+    assert group.stats()["timeouts"] == 1
+    assert group.stats()["executed"] == 1
+
+
+class FakeModel:
+    def __init__(self, text="answer", error=None):
+        self.text = text
+        self.error = error
+        self.release = threading.Event()
+        self.calls = 0
+
+    def generate_content(self, contents, generation_config=None, request_options=None):
+        self.calls += 1
+        self.release.wait(2)
+        if self.error is not None:
+            raise self.error
+        return SimpleNamespace(text=self.text, usage_metadata=None)
+
+
+@pytest.fixture
+def shared_cache(monkeypatch):
+    cache = ResponseCache(max_entries=100, max_bytes=100_000)
+    monkeypatch.setattr(simple_agent, "get_response_cache", lambda: cache)
+    monkeypatch.setattr(simple_agent, "SINGLE_FLIGHT_ENABLED", True)
+    return cache
+
+
+def generate(model, key):
+    return simple_agent.generate_shared(
+        "TestAgent", model, "test-model", "prompt",
+        cache_key=key, flight_key=key, cache_ttl=60
+    )
+
+
+def test_generate_shared_coalesces_then_serves_from_cache(shared_cache):
+    model = FakeModel()
+    key = "coalesce-" + str(time.monotonic())
+
+    results, errors, threads = run_concurrently(4, lambda: generate(model, key))
+    wait_until(lambda: simple_agent.get_single_flight("gemini").stats()["waiting"] >= 3)
+    model.release.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert model.calls == 1
+    assert sorted(outcome for _, outcome in results) == ["coalesced"] * 3 + ["ok"]
+    assert generate(model, key) == ("answer", "cache_hit")
+    assert model.calls == 1
+
+
+def test_generate_shared_propagates_errors_and_caches_nothing(shared_cache):
+    model = FakeModel(error=ValueError("blocked prompt"))
+    key = "error-" + str(time.monotonic())
+
+    results, errors, threads = run_concurrently(3, lambda: generate(model, key))
+    wait_until(lambda: simple_agent.get_single_flight("gemini").stats()["waiting"] >= 2)
+    model.release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == []
+    assert len(errors) == 3 and all(e is errors[0] for e in errors)
+    assert isinstance(errors[0], ValueError)
+    assert model.calls == 1
+    assert shared_cache.get(key) is None
+
+
+
+def test_leader_deadline_is_not_shared_with_coalesced_callers(shared_cache):
+    model = FakeModel()
+    original = model.generate_content
+    leader_release = threading.Event()
+
+    def out_of_time_once(*args, **kwargs):
+        # The leader's call overruns the leader's own (client-set) budget
+        if model.calls == 0:
+            model.calls += 1
+            leader_release.wait(2)
+            raise DeadlineExceeded("Request deadline exceeded")
+        return original(*args, **kwargs)
+
+    model.generate_content = out_of_time_once
+    key = "deadline-" + str(time.monotonic())
+    group = simple_agent.get_single_flight("gemini")
+
+    leader = run_concurrently(1, lambda: generate(model, key))
+    wait_until(lambda: model.calls == 1)
+    waiters = run_concurrently(2, lambda: generate(model, key))
+    wait_until(lambda: group.stats()["waiting"] >= 2)
+    leader_release.set()
+    # One waiter retries as the new leader, the other joins it
+    wait_until(lambda: model.calls == 2 and group.stats()["waiting"] >= 1)
+    model.release.set()
+    for thread in leader[2] + waiters[2]:
+        thread.join()
+
+    assert [type(e) for e in leader[1]] == [DeadlineExceeded]
+    assert waiters[1] == []
+    assert sorted(waiters[0]) == [("answer", "coalesced"), ("answer", "ok")]
+    assert model.calls == 2
+
+
+def test_high_temperature_calls_are_not_coalesced(monkeypatch):
+    monkeypatch.setattr(simple_agent, "SINGLE_FLIGHT_ENABLED", True)
+    monkeypatch.setattr(simple_agent, "RESPONSE_CACHE_ALLOW_HIGH_TEMPERATURE", False)
+    agent = simple_agent.BaseAgent("You are a test agent.", "SampleTestAgent")
+    agent.model = FakeModel()
+
+    results, errors, threads = run_concurrently(
+        3, lambda: agent.call_gemini("same prompt", temperature=1.0)
+    )
+    wait_until(lambda: agent.model.calls == 3)
+    agent.model.release.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert results == ["answer"] * 3
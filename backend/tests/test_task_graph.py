@@ -0,0 +1,103 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services.task_graph import TaskGraph
+
+
+@pytest.fixture
+def executor():
+    pool = ThreadPoolExecutor(max_workers=4)
+    yield pool
+    pool.shutdown(wait=False)
+
+
+def test_steps_receive_their_dependency_results(executor):
+    graph = TaskGraph(executor)
+    graph.add("a", lambda up: 1)
+    graph.add("b", lambda up: up["a"].value + 1, depends_on=["a"])
+    graph.add("c", lambda up: sorted(up), depends_on=["a", "b"])
+
+    results = graph.run()
+    assert [results[name].status for name in "abc"] == ["ok", "ok", "ok"]
+    assert results["b"].value == 2
+    assert results["c"].value == ["a", "b"]
+
+
+def test_independent_steps_run_concurrently(executor):
+    both_started = threading.Barrier(2, timeout=2)
+    graph = TaskGraph(executor)
+    graph.add("left", lambda up: both_started.wait())
+    graph.add("right", lambda up: both_started.wait())
+
+    results = graph.run()
+    assert results["left"].ok and results["right"].ok
+
+
+def test_unknown_dependency_is_rejected(executor):
+    with pytest.raises(ValueError):
+        TaskGraph(executor).add("b", lambda up: None, depends_on=["a"])
+
+
+def test_gated_step_is_skipped_and_dependents_still_run(executor):
+    calls = []
+    graph = TaskGraph(executor)
+    graph.add("check", lambda up: False)
+    graph.add("gated", lambda up: calls.append("gated"), depends_on=["check"],
+              when=lambda up: up["check"].value)
+    graph.add("after", lambda up: up["gated"].status, depends_on=["gated"])
+
+    results = graph.run()
+    assert results["gated"].status == "skipped"
+    assert results["after"].value == "skipped"
+    assert calls == []
+
+
+def test_step_errors_are_captured_and_passed_to_dependents(executor):
+    failure = RuntimeError("upstream failed")
+
+    def broken(up):
+        raise failure
+
+    graph = TaskGraph(executor)
+    graph.add("broken", broken)
+    graph.add("after", lambda up: up["broken"].status, depends_on=["broken"])
+
+    results = graph.run()
+    assert results["broken"].status == "error"
+    assert results["broken"].error == "upstream failed"
+    assert results["broken"].exception is failure
+    assert results["after"].value == "error"
+
+
+def test_overrunning_step_times_out_and_dependents_carry_on(executor):
+    release = threading.Event()
+    graph = TaskGraph(executor)
+    graph.add("slow", lambda up: release.wait(2), timeout=0.05)
+    graph.add("after", lambda up: up["slow"].status, depends_on=["slow"])
+
+    started = time.monotonic()
+    results = graph.run()
+    release.set()
+
+    assert time.monotonic() - started < 1
+    assert results["slow"].status == "timeout"
+    assert results["slow"].error == "Timed out after 0.05s"
+    assert results["after"].value == "timeout"
+
+
+def test_time_queued_for_a_worker_does_not_count_against_the_timeout():
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        graph = TaskGraph(executor)
+        graph.add("busy", lambda up: time.sleep(0.3))
+        graph.add("quick", lambda up: "done", timeout=0.2)
+
+        results = graph.run()
+    finally:
+        executor.shutdown(wait=False)
+    assert results["busy"].ok
+    assert results["quick"].status == "ok"
+    assert results["quick"].value == "done"
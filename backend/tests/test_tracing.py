@@ -0,0 +1,118 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services import tracing
+from services.resilience import submit_in_context
+
+
+@pytest.fixture
+def trace():
+    token = tracing.start_trace("test-request")
+    yield tracing.current_trace()
+    tracing.end_trace(token)
+
+
+@pytest.fixture
+def executor():
+    executor = ThreadPoolExecutor(max_workers=1)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def spans_by_name(trace):
+    return {span["name"]: span for span in trace.to_dict()["spans"]}
+
+
+def test_child_spans_add_upstream_time_and_retries_to_their_parents(trace):
+    with tracing.span("request") as request_span:
+        with tracing.span("agent"):
+            tracing.record_upstream(0.25)
+            tracing.record_retries(2)
+            tracing.annotate(cache_hit=False, model="test-model")
+
+    spans = spans_by_name(trace)
+    assert spans["agent"]["parent_id"] == request_span.span_id
+    assert spans["agent"]["model"] == "test-model"
+    assert spans["agent"]["cache_hit"] is False
+    for name in ("request", "agent"):
+        assert spans[name]["retries"] == 2
+        # upstream is capped at the span's own duration
+        assert spans[name]["upstream_ms"] == spans[name]["duration_ms"]
+        assert spans[name]["local_ms"] == 0
+
+
+def test_a_failing_block_marks_its_span(trace):
+    with pytest.raises(ValueError):
+        with tracing.span("agent"):
+            raise ValueError("bad answer")
+
+    assert spans_by_name(trace)["agent"]["status"] == "error"
+
+
+def test_spans_in_submit_in_context_threads_join_the_request_trace(trace, executor):
+    def work():
+        with tracing.span("pool_step"):
+            tracing.record_upstream(0.01)
+        return tracing.current_trace()
+
+    with tracing.span("request") as request_span:
+        seen = submit_in_context(executor, work).result()
+
+    assert seen is trace
+    spans = spans_by_name(trace)
+    assert spans["pool_step"]["parent_id"] == request_span.span_id
+    assert request_span.upstream == pytest.approx(0.01)
+
+
+def test_plain_submit_loses_the_trace(trace, executor):
+    assert executor.submit(tracing.current_trace).result() is None
+
+
+def test_spans_without_a_trace_are_timed_but_not_recorded():
+    with tracing.span("orphan") as orphan:
+        pass
+
+    assert tracing.current_trace() is None
+    assert orphan.duration >= 0
+
+
+@pytest.mark.parametrize("header, kept", [
+    ("abc-123.def:4_5", True),
+    ("", False),
+    ("has spaces", False),
+    ("x" * 129, False),
+])
+def test_request_id_from(header, kept):
+    request_id = tracing.request_id_from(header)
+
+    assert (request_id == header) is kept
+    assert tracing.REQUEST_ID_PATTERN.match(request_id)
+
+
+def test_export_writes_sampled_and_slow_traces(trace, tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracing, "TRACE_EXPORT_PATH", str(path))
+    with tracing.span("agent"):
+        pass
+
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(tracing, "TRACE_EXPORT_SLOW", 0)
+    assert not tracing.export(trace, status=200)
+
+    monkeypatch.setattr(tracing, "TRACE_EXPORT_SLOW", 1e-9)
+    assert tracing.export(trace, status=200)
+
+    record = json.loads(path.read_text(encoding="utf-8"))
+    assert record["request_id"] == "test-request"
+    assert record["status"] == 200
+    assert [span["name"] for span in record["spans"]] == ["agent"]
+
+
+def test_requests_echo_the_callers_request_id():
+    import app as backend_app
+
+    response = backend_app.app.test_client().get("/", headers={"X-Request-ID": "abc-123"})
+
+    assert response.headers["X-Request-ID"] == "abc-123"
@@ -0,0 +1,71 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from services import upload_store
+from services.upload_store import UploadRejected, UploadStore
+
+
+def image_bytes(fmt="PNG", size=(64, 48)):
+    buffer = io.BytesIO()
+    Image.effect_noise(size, 40).convert("RGB").save(buffer, fmt)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadStore(root=str(tmp_path), retention=3600)
+
+
+def spooled(store, data):
+    """An upload as Werkzeug hands it over when spool() is the stream factory"""
+    spool = store.spool()
+    spool.write(data)
+    return FileStorage(stream=spool, filename="cat.png")
+
+
+def leftover_temp_files(root):
+    return [name for _, _, files in os.walk(root) for name in files if name.startswith(".")]
+
+
+def test_identical_uploads_are_stored_once(store, tmp_path):
+    data = image_bytes()
+    first = store.ingest(spooled(store, data))
+    second = store.ingest(FileStorage(stream=io.BytesIO(data)))
+
+    assert first.digest == second.digest
+    assert not first.duplicate and second.duplicate
+    assert first.content_type == "image/png"
+    assert open(first.path, "rb").read() == data
+    assert store.get(first.digest).size == len(data)
+    assert leftover_temp_files(tmp_path) == []
+
+
+def test_non_images_are_rejected_and_not_kept(store, tmp_path):
+    with pytest.raises(UploadRejected):
+        store.ingest(spooled(store, b"%PDF-1.7 not a cat"))
+    assert leftover_temp_files(tmp_path) == []
+
+
+@pytest.mark.parametrize("fmt", ["PNG", "JPEG", "GIF", "WEBP"])
+def test_truncated_images_are_rejected(store, tmp_path, fmt):
+    data = image_bytes(fmt, size=(200, 150))
+
+    with pytest.raises(UploadRejected, match="truncated or corrupt"):
+        store.ingest(spooled(store, data[:len(data) // 2]))
+    assert not any(files for _, _, files in os.walk(tmp_path))
+
+
+def test_images_over_the_pixel_limit_are_rejected(store, monkeypatch):
+    monkeypatch.setattr(upload_store, "MAX_UPLOAD_PIXELS", 1000)
+
+    with pytest.raises(UploadRejected, match="too large"):
+        store.ingest(spooled(store, image_bytes(size=(40, 30))))
+
+
+def test_get_ignores_malformed_and_unknown_digests(store):
+    assert store.get("../../etc/passwd") is None
+    assert store.get("0" * 64) is None
@@ -6,6 +6,7 @@ function CatVideoGenerator() {
   const [imagePreview, setImagePreview] = useState(null)
   const [loading, setLoading] = useState(false)
   const [result, setResult] = useState(null)
+  const [format, setFormat] = useState('mp4')
 
   const handleImageUpload = (e) => {
     const file = e.target.files[0]
@@ -28,6 +29,7 @@ function CatVideoGenerator() {
     try {
       const formData = new FormData()
       formData.append('image', imageFile)
+      formData.append('format', format)
 
       const response = await generateCatVideo(formData)
       setResult(response)
@@ -77,11 +79,11 @@ function CatVideoGenerator() {
               <h3>Video Options</h3>
               <div className="option-group">
                 <label>
-                  <input type="radio" name="format" value="video" defaultChecked />
+                  <input type="radio" name="format" value="mp4" checked={format === 'mp4'} onChange={() => setFormat('mp4')} />
                   <span>🎥 Video (MP4)</span>
                 </label>
                 <label>
-                  <input type="radio" name="format" value="gif" />
+                  <input type="radio" name="format" value="gif" checked={format === 'gif'} onChange={() => setFormat('gif')} />
                   <span>🌀 Animated GIF</span>
                 </label>
               </div>
@@ -110,10 +112,16 @@ function CatVideoGenerator() {
             <div className="video-result">
               {result.video_url ? (
                 <>
-                  <video controls className="generated-video" autoPlay loop>
-                    <source src={result.video_url} type="video/mp4" />
-                    Your browser does not support video playback.
-                  </video>
+                  {result.content_type && result.content_type.startsWith('image/') ? (
+                    // GIF / animated WebP (also the fallback when the server cannot encode MP4)
+                    <img src={result.video_url} alt="Animated cat" className="generated-video" />
+                  ) : (
+                    <video controls className="generated-video" autoPlay loop muted>
+                      <source src={result.video_url} type={result.content_type || 'video/mp4'} />
+                      Your browser does not support video playback.
+                    </video>
+                  )}
+                  {result.message && <p className="video-message">{result.message}</p>}
                   <div className="result-actions">
                     <button className="download-btn">⬇️ Download</button>
                     <button className="share-btn">🔗 Share</button>
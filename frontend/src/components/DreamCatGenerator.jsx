@@ -15,6 +15,8 @@ function DreamCatGenerator() {
     try {
       const formData = new FormData()
       formData.append('prompt', prompt)
+      // A preview-sized image (WebP where supported) instead of the full PNG
+      formData.append('size', 'preview')
       if (imageFile) {
         formData.append('image', imageFile)
       }
@@ -111,7 +113,15 @@ function DreamCatGenerator() {
                 </div>
               ) : result.image_url ? (
                 <>
-                  <img src={result.image_url} alt="Generated Cat" className="generated-image" />
+                  <img
+                    src={result.image_url}
+                    srcSet={result.variants
+                      ? `${result.variants.thumbnail} 256w, ${result.variants.preview} 512w, ${result.variants.full} 1024w`
+                      : undefined}
+                    sizes="(max-width: 600px) 90vw, 512px"
+                    alt="Generated Cat"
+                    className="generated-image"
+                  />
                   <div className="result-info">
                     <h3>😻 Your Dream Cat!</h3>
                     {result.enhanced_prompt && (
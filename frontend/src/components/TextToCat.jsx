@@ -1,5 +1,5 @@
 import React, { useState, useRef, useEffect } from 'react'
-import { speechToCat, textToSpeech } from '../services/api'
+import { speechToCat, streamSpeechToCat, textToSpeech } from '../services/api'
 
 function TextToCat() {
   const [input, setInput] = useState('')
@@ -40,12 +40,40 @@ function TextToCat() {
     }
   }, [])
 
+  // Show the verdict and the translation as they arrive; resolves with the
+  // same result the non-streaming endpoint returns
+  const translateStreaming = async (text) => {
+    let partial = { original_text: text, cat_translation: '' }
+    setResult(partial)
+    const final = await streamSpeechToCat(text, (event, data) => {
+      if (event === 'moderation') {
+        partial = { ...partial, moderation: data }
+      } else if (event === 'translation') {
+        partial = { ...partial, cat_translation: partial.cat_translation + data.text }
+      } else {
+        return
+      }
+      setResult(partial)
+    })
+    if (!final) throw new Error('Stream closed before the translation finished')
+    return { original_text: text, ...final }
+  }
+
   const handleTextSubmit = async () => {
     if (!input.trim()) return
 
     setLoading(true)
+    setAudioUrl(null)
     try {
-      const response = await speechToCat(input, 'text')
+      let response
+      try {
+        response = await translateStreaming(input)
+      } catch (streamError) {
+        // No streaming support or the stream broke off: fetch the whole
+        // result in one request instead
+        console.warn('Streaming failed, falling back:', streamError)
+        response = await speechToCat(input, 'text')
+      }
       setResult(response)
 
       // Generate audio if available
@@ -15,6 +15,12 @@ const api = axios.create({
   timeout: 90000, // 90 second timeout for AI image generation
 })
 
+/**
+ * Turn a backend-relative path (e.g. /api/images/<id>) into an absolute URL
+ */
+export const resolveApiUrl = (path) =>
+  path && path.startsWith('/') ? `${API_BASE_URL}${path}` : path
+
 // ========================================
 // Text/Speech to Cat Module
 // ========================================
@@ -27,6 +33,47 @@ export const speechToCat = async (text, type = 'text') => {
   return response.data
 }
 
+/**
+ * Stream a text-to-cat translation as it is generated
+ * Calls onEvent(event, data) for 'moderation', 'translation', 'error' and
+ * 'done' events and resolves with the final result
+ */
+export const streamSpeechToCat = async (text, onEvent, type = 'text') => {
+  const response = await fetch(`${API_BASE_URL}/api/text-to-cat/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ text, type }),
+  })
+  if (!response.ok) {
+    throw new Error(`Request failed with status ${response.status}`)
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  let result = null
+  while (true) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    const messages = buffer.split('\n\n')
+    buffer = messages.pop()
+    for (const message of messages) {
+      let event = 'message'
+      let data = ''
+      for (const line of message.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice(7)
+        else if (line.startsWith('data: ')) data += line.slice(6)
+      }
+      if (!data) continue
+      const payload = JSON.parse(data)
+      if (event === 'done') result = payload
+      onEvent(event, payload)
+    }
+  }
+  return result
+}
+
 /**
  * Convert text to speech audio
  */
@@ -39,17 +86,60 @@ export const textToSpeech = async (text) => {
 // Dream Cat Generator Module
 // ========================================
 
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms))
+
+/**
+ * Wait for a background generation job and return its result payload
+ * Short-polls /api/jobs/<id>, backing off from 1s to 3s, so no request
+ * holds a server worker while the job runs
+ */
+export const waitForJob = async (jobId, { deadlineMs = 180000 } = {}) => {
+  const deadline = Date.now() + deadlineMs
+  let delay = 1000
+  while (Date.now() < deadline) {
+    const response = await api.get(`/api/jobs/${jobId}`)
+    const job = response.data
+    if (job.status === 'succeeded') {
+      return job.result
+    }
+    if (job.status === 'failed') {
+      return { error: job.error || 'Generation failed' }
+    }
+    await sleep(delay)
+    delay = Math.min(delay * 1.5, 3000)
+  }
+  return { error: 'Generation is taking too long. Please try again.' }
+}
+
+/**
+ * Result of a generation request sent with mode=async
+ * The backend answers 202 with a job to poll, or runs the request inline
+ * (200) when job status could not be polled from every worker
+ */
+const generationResult = async (response) =>
+  response.status === 202 ? waitForJob(response.data.job_id) : response.data
+
 /**
  * Generate AI cat image from prompt and/or reference image
+ * Runs as a background job (when the backend supports it) so the request
+ * does not hold a server worker
  */
 export const generateDreamCat = async (formData) => {
+  formData.append('mode', 'async')
   const response = await api.post('/api/dream-cat/generate', formData, {
     headers: {
       'Content-Type': 'multipart/form-data',
     },
-    timeout: 120000, // 2 minutes for image generation (first time can be slow)
   })
-  return response.data
+  const data = await generationResult(response)
+  // Images are served by the backend, not inlined as data URLs
+  data.image_url = resolveApiUrl(data.image_url)
+  if (data.variants) {
+    data.variants = Object.fromEntries(
+      Object.entries(data.variants).map(([size, url]) => [size, resolveApiUrl(url)])
+    )
+  }
+  return data
 }
 
 // ========================================
@@ -60,12 +150,17 @@ export const generateDreamCat = async (formData) => {
  * Generate animated video/GIF from cat image
  */
 export const generateCatVideo = async (formData) => {
+  formData.append('mode', 'async')
   const response = await api.post('/api/cat-video/generate', formData, {
     headers: {
       'Content-Type': 'multipart/form-data',
     },
   })
-  return response.data
+  const data = await generationResult(response)
+  if (data.video_url) {
+    data.video_url = resolveApiUrl(data.video_url)
+  }
+  return data
 }
 
 // ========================================